@@ -0,0 +1,305 @@
+"""
+Benchmark suite for the backtest and tick hot paths.
+
+Runs fully offline on synthetic data (see synthetic.py): wide option tables, tick streams
+and an instrument master. Each case runs in a fresh process so its peak RSS is its own,
+and reports throughput, p50/p99 latency and peak RSS. Results are appended to
+history.jsonl; with a baseline.json present, any case whose throughput drops or whose p99
+rises by more than --tolerance is flagged and the exit code is 1.
+
+    python benchmarks/run_benchmarks.py                 # run all cases
+    python benchmarks/run_benchmarks.py --quick         # smaller inputs
+    python benchmarks/run_benchmarks.py --only ticks    # cases whose name contains 'ticks'
+    python benchmarks/run_benchmarks.py --save-baseline # make this run the new baseline
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+HISTORY_PATH = os.path.join(HERE, 'history.jsonl')
+BASELINE_PATH = os.path.join(HERE, 'baseline.json')
+
+for _sub in ('python-tetst', 'kite-testing', 'kite_connect_project'):
+    _p = os.path.join(ROOT, _sub)
+    if _p not in sys.path:
+        sys.path.append(_p)
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+import synthetic  # noqa: E402
+
+SIZES = {
+    'full': {'tables': 5, 'rows': 375, 'strikes': 81, 'ticks': 200_000, 'requests': 200},
+    'quick': {'tables': 2, 'rows': 375, 'strikes': 41, 'ticks': 20_000, 'requests': 40},
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if the platform can't tell."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def _stats(latencies_ns, units, elapsed_s, unit_name):
+    lat_ms = np.asarray(latencies_ns, dtype=float) / 1e6
+    return {
+        'throughput': units / elapsed_s if elapsed_s > 0 else None,
+        'unit': unit_name,
+        'p50_ms': float(np.percentile(lat_ms, 50)),
+        'p99_ms': float(np.percentile(lat_ms, 99)),
+        'calls': len(lat_ms),
+    }
+
+
+def _timed(fn, items, units_per_item=1):
+    """Call fn(item) for each item; returns (latencies_ns, total_units, elapsed_s)."""
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter_ns()
+        fn(item)
+        latencies.append(time.perf_counter_ns() - t0)
+    return latencies, len(items) * units_per_item, time.perf_counter() - start
+
+
+# --- cases -----------------------------------------------------------------
+
+def bench_process_option_data(size):
+    from process_option_data import process_option_data
+    tables = [synthetic.wide_option_table(size['rows'], size['strikes'], seed=i) for i in range(size['tables'])]
+    jobs = []
+    for i, df in enumerate(tables):
+        # every contract column, not just the two OTM ones, to load the loop
+        cols = [c for c in df.columns if c[:1] in ('C', 'P') and c[1:].isdigit()]
+        jobs.append((df, f'bench_{i}', cols))
+    rows = sum(len(df) * len(cols) for df, _, cols in jobs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        lat, _, elapsed = _timed(lambda j: process_option_data(j[0], j[1], j[2], save_details=False), jobs)
+    return _stats(lat, rows, elapsed, 'rows/s')
+
+
+def bench_exit_stoploss(size):
+    from exit_and_stoploss import manage_position_with_exit_stoploss
+    df = synthetic.wide_option_table(size['rows'], size['strikes'])
+    series = [(df[c], 'long' if c[0] == 'C' else 'short', float(df[c].iloc[0]), c)
+              for c in df.columns if c[:1] in ('C', 'P') and c[1:].isdigit()]
+    with contextlib.redirect_stdout(io.StringIO()):
+        lat, _, elapsed = _timed(lambda s: manage_position_with_exit_stoploss(*s), series)
+    return _stats(lat, len(series) * len(df), elapsed, 'rows/s')
+
+
+def bench_select_option_columns(size):
+    from main import OptionAlgoMain
+    from strike_index import StrikeIndex
+    df = synthetic.wide_option_table(size['rows'], size['strikes'])
+    spots = df['BANKNIFTY'].to_numpy(dtype=float)
+    index = StrikeIndex.from_df(df)
+    # select_option_columns doesn't touch instance state, so skip the DB connection in __init__
+    algo = OptionAlgoMain.__new__(OptionAlgoMain)
+    with contextlib.redirect_stdout(io.StringIO()):
+        lat, units, elapsed = _timed(lambda s: algo.select_option_columns(df, s, index), spots)
+    return _stats(lat, units, elapsed, 'calls/s')
+
+
+def bench_db_get_tables(size):
+    from sqlalchemy import create_engine
+    from db_connector import DBConnector
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'market_data.db')}"
+        engine = create_engine(url)
+        rows = 0
+        for i in range(size['tables']):
+            df = synthetic.wide_option_table(size['rows'], size['strikes'], seed=i)
+            df.to_sql(f'2024_01_{i + 1:02d}', engine, index=False)
+            rows += len(df)
+        engine.dispose()
+        db = DBConnector({'url': url})
+        names = db.list_tables()
+        # per-table latency is the wait between consecutive tables from iter_tables
+        latencies = []
+        start = time.perf_counter()
+        prev = time.perf_counter_ns()
+        for _ in db.iter_tables(names):
+            now = time.perf_counter_ns()
+            latencies.append(now - prev)
+            prev = now
+        elapsed = time.perf_counter() - start
+        db.engine.dispose()
+    return _stats(latencies, rows, elapsed, 'rows/s')
+
+
+def bench_api_symbols(size):
+    import app as flask_app
+    instruments = synthetic.instrument_master()
+
+    class _StubClient:
+        kite = object()   # stands in for a live KiteConnect session
+
+        def get_instruments_df(self):
+            return instruments.copy()
+
+    flask_app.get_kc = lambda: _StubClient()
+    client = flask_app.app.test_client()
+    queries = ['BANKNIFTY', 'NIFTY', 'EQ01', 'FUT', ''] * (size['requests'] // 5)
+
+    def call(q):
+        resp = client.get('/api/symbols', query_string={'q': q})
+        if resp.status_code != 200:
+            raise RuntimeError(f'/api/symbols returned {resp.status_code}: {resp.get_data(as_text=True)[:200]}')
+
+    lat, units, elapsed = _timed(call, queries)
+    return _stats(lat, units, elapsed, 'requests/s')
+
+
+def bench_tick_ingest(size):
+    from option_chain import OptionChainService
+    from tick_journal import TickRecorder
+    instruments = synthetic.instrument_master(underlyings=('BANKNIFTY',), expiries=1, equities=0)
+    service = OptionChainService(kc=None, underlying='BANKNIFTY', expiry=datetime.date(2024, 1, 4),
+                                 underlying_token=260105)
+    tokens = service.build(instruments)
+    ticks = synthetic.tick_stream(size['ticks'], tokens)
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = TickRecorder(tmp)
+        on_tick = recorder.wrap(service.on_tick)
+        lat, units, elapsed = _timed(on_tick, ticks)
+        recorder.close()
+    stats = _stats(lat, units, elapsed, 'ticks/s')
+    t0 = time.perf_counter()
+    stats['greeks_cells'] = service.refresh_greeks(datetime.datetime(2024, 1, 3, 12, 0))
+    stats['greeks_refresh_ms'] = (time.perf_counter() - t0) * 1000
+    return stats
+
+
+CASES = {
+    'process_option_data': bench_process_option_data,
+    'exit_stoploss': bench_exit_stoploss,
+    'select_option_columns': bench_select_option_columns,
+    'db_get_tables': bench_db_get_tables,
+    'api_symbols': bench_api_symbols,
+    'ticks_chain_journal': bench_tick_ingest,
+}
+
+
+def _run_case(name, size):
+    """Worker entry point: run one case and attach this process's peak RSS."""
+    try:
+        result = CASES[name](size)
+    except ImportError as e:
+        return {'skipped': f'missing dependency: {e}'}
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_cases(names, size, isolate=True) -> dict:
+    results = {}
+    for name in names:
+        print(f'{name} ...', end=' ', flush=True)
+        if isolate:
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                res = pool.submit(_run_case, name, size).result()
+        else:
+            res = _run_case(name, size)
+        results[name] = res
+        if 'skipped' in res or 'error' in res:
+            print(res.get('skipped') or f"FAILED {res['error']}")
+        else:
+            print(f"{res['throughput']:,.0f} {res['unit']}  p50 {res['p50_ms']:.3f} ms  "
+                  f"p99 {res['p99_ms']:.3f} ms  peak RSS {res['peak_rss_mb'] or 0:.0f} MB")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Cases that got slower than the baseline by more than `tolerance` (fraction)."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base or 'throughput' not in res or 'throughput' not in base:
+            continue
+        if base.get('throughput') and res['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {res['throughput']:,.0f} < baseline "
+                               f"{base['throughput']:,.0f} {res['unit']}")
+        if base.get('p99_ms') and res['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {res['p99_ms']:.3f} ms > baseline {base['p99_ms']:.3f} ms")
+    return regressions
+
+
+def _git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--only', action='append', help='run cases whose name contains this (repeatable)')
+    parser.add_argument('--quick', action='store_true', help='smaller inputs for a fast check')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs baseline (0.2 = 20%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run to baseline.json')
+    parser.add_argument('--no-isolate', action='store_true', help='run cases in this process')
+    args = parser.parse_args(argv)
+
+    names = [n for n in CASES if not args.only or any(o in n for o in args.only)]
+    mode = 'quick' if args.quick else 'full'
+    results = run_cases(names, SIZES[mode], isolate=not args.no_isolate)
+
+    record = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_rev': _git_rev(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'mode': mode,
+        'results': results,
+    }
+    with open(HISTORY_PATH, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+    status = 1 if any('error' in r for r in results.values()) else 0
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({'mode': mode, 'git_rev': record['git_rev'], 'results': results}, f, indent=2)
+        print(f'Baseline saved to {BASELINE_PATH}')
+    elif os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        if baseline.get('mode') != mode:
+            print(f"Baseline was recorded in {baseline.get('mode')} mode; skipping comparison")
+        else:
+            regressions = compare(results, baseline['results'], args.tolerance)
+            for r in regressions:
+                print(f'REGRESSION {r}')
+            status = 1 if regressions else status
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
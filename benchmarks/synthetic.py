@@ -0,0 +1,77 @@
+"""Synthetic data generators for the benchmarks (no database or Kite session needed)."""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+
+def wide_option_table(rows=375, strikes=81, base=48000.0, step=100, seed=0) -> pd.DataFrame:
+    """One day table shaped like market_data: BANKNIFTY column plus C<strike>/P<strike> premiums."""
+    rng = np.random.default_rng(seed)
+    spot = base + np.cumsum(rng.normal(0, 15, rows))
+    first = int(base - step * (strikes // 2))
+    cols = {'time': pd.date_range('2024-01-03 09:15', periods=rows, freq='min').strftime('%H:%M'),
+            'BANKNIFTY': spot}
+    for k in range(first, first + step * strikes, step):
+        noise_c = np.cumsum(rng.normal(0, 2, rows))
+        noise_p = np.cumsum(rng.normal(0, 2, rows))
+        cols[f'C{k}'] = np.maximum(np.maximum(spot - k, 0) + 150 + noise_c, 0.05)
+        cols[f'P{k}'] = np.maximum(np.maximum(k - spot, 0) + 150 + noise_p, 0.05)
+    return pd.DataFrame(cols)
+
+
+def tick_stream(n=200_000, tokens=200, seed=0) -> list:
+    """KiteTicker-style FULL mode tick dicts; `tokens` is an instrument count or a list of tokens."""
+    rng = np.random.default_rng(seed)
+    if isinstance(tokens, int):
+        token_ids = 10_000_000 + np.arange(tokens)
+    else:
+        token_ids = np.asarray(tokens)
+    picks = rng.integers(0, len(token_ids), n)
+    prices = 100 + np.cumsum(rng.normal(0, 0.05, n))
+    start = datetime.datetime(2024, 1, 3, 9, 15)
+    ticks = []
+    for i in range(n):
+        p = float(prices[i])
+        ticks.append({
+            'instrument_token': int(token_ids[picks[i]]),
+            'mode': 'full',
+            'last_price': p,
+            'volume_traded': i,
+            'oi': 1000 + i % 50,
+            'exchange_timestamp': start + datetime.timedelta(milliseconds=50 * i),
+            'depth': {'buy': [{'price': p - 0.05, 'quantity': 25, 'orders': 1}],
+                      'sell': [{'price': p + 0.05, 'quantity': 25, 'orders': 1}]},
+        })
+    return ticks
+
+
+def instrument_master(underlyings=('BANKNIFTY', 'NIFTY', 'FINNIFTY'), expiries=8, strikes=120,
+                      equities=2000, seed=0) -> pd.DataFrame:
+    """Instrument master with NSE equities/indices and NFO option chains, like kite.instruments()."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    token = 100_000
+    for i in range(equities):
+        rows.append((token, token // 256, f'EQ{i:05d}', f'EQ{i:05d}', 0.0, None, 0.0, 0.05, 1, 'EQ', 'NSE', 'NSE'))
+        token += 1
+    base = datetime.date(2024, 1, 4)
+    lots = {'BANKNIFTY': 15, 'NIFTY': 50, 'FINNIFTY': 40}
+    spots = {'BANKNIFTY': 48000, 'NIFTY': 21500, 'FINNIFTY': 21000}
+    for name in underlyings:
+        spot = spots.get(name, 10000)
+        step = 100 if spot > 30000 else 50
+        for e in range(expiries):
+            expiry = base + datetime.timedelta(days=7 * e)
+            rows.append((token, token // 256, f'{name}{expiry:%y%b}FUT'.upper(), name, 0.0, expiry, 0.0,
+                         0.05, lots.get(name, 25), 'FUT', 'NFO-FUT', 'NFO'))
+            token += 1
+            for k in range(spot - step * (strikes // 2), spot + step * (strikes // 2), step):
+                for t in ('CE', 'PE'):
+                    rows.append((token, token // 256, f'{name}{expiry:%y%b}{k}{t}'.upper(), name,
+                                 float(rng.uniform(1, 500)), expiry, float(k), 0.05, lots.get(name, 25),
+                                 t, 'NFO-OPT', 'NFO'))
+                    token += 1
+    return pd.DataFrame(rows, columns=['instrument_token', 'exchange_token', 'tradingsymbol', 'name',
+                                       'last_price', 'expiry', 'strike', 'tick_size', 'lot_size',
+                                       'instrument_type', 'segment', 'exchange'])
@@ -0,0 +1,228 @@
+"""
+Event-driven bar backtester with a simulated fill model.
+
+Bars for many instruments (KiteHistClient.get_historical frames, or bars built from a
+recorded tick journal) are aligned on one timestamp grid and held as T x N numpy arrays.
+A strategy produces target positions in lots, either for the whole grid at once
+(`target_positions(bt)`) or bar by bar (`on_bar(i, bt, position)`). An order decided on
+bar t's close is filled at bar t+1's open, so there is no lookahead. Each fill pays
+slippage and brokerage, and quantities are multiplied by the instrument's lot size.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class FillModel:
+    """Slippage and brokerage applied to every simulated fill.
+
+    slippage_bps: adverse price move in basis points of the fill price
+    slippage_ticks: adverse price move in ticks of tick_size (added to slippage_bps)
+    brokerage_per_order: flat charge per order (e.g. 20 INR)
+    brokerage_pct: charge as a fraction of traded value (e.g. 0.0003 for 0.03%)
+    """
+
+    def __init__(self, slippage_bps: float = 0.0, slippage_ticks: float = 0.0, tick_size: float = 0.05,
+                 brokerage_per_order: float = 20.0, brokerage_pct: float = 0.0):
+        self.slippage_bps = slippage_bps
+        self.slippage_ticks = slippage_ticks
+        self.tick_size = tick_size
+        self.brokerage_per_order = brokerage_per_order
+        self.brokerage_pct = brokerage_pct
+
+    def fill_prices(self, price: np.ndarray, side: np.ndarray) -> np.ndarray:
+        """Fill price for each order; side is +1 for buys, -1 for sells, 0 for no order."""
+        slip = price * self.slippage_bps / 10000.0 + self.slippage_ticks * self.tick_size
+        return price + side * slip
+
+    def costs(self, traded_value: np.ndarray, orders: np.ndarray) -> np.ndarray:
+        return orders * self.brokerage_per_order + np.abs(traded_value) * self.brokerage_pct
+
+
+def lot_sizes_from_instruments(instruments: pd.DataFrame) -> Dict[int, int]:
+    """Map instrument_token -> lot_size from the instrument master (kite.instruments() or CSV)."""
+    if instruments is None or instruments.empty or 'lot_size' not in instruments.columns:
+        return {}
+    lots = instruments[['instrument_token', 'lot_size']].dropna()
+    return {int(t): max(int(l), 1) for t, l in zip(lots['instrument_token'], lots['lot_size'])}
+
+
+def bars_from_ticks(ticks: np.ndarray, interval: str = '1min') -> Dict[int, pd.DataFrame]:
+    """Build OHLCV bars per token from a tick journal block (fields token, exch_ns/recv_ns, ltp, volume)."""
+    ts = np.where(ticks['exch_ns'] > 0, ticks['exch_ns'], ticks['recv_ns'])
+    df = pd.DataFrame({
+        'date': pd.to_datetime(ts, unit='ns'),
+        'token': ticks['token'],
+        'ltp': ticks['ltp'],
+        'volume': ticks['volume'],
+    })
+    frames = {}
+    for token, grp in df.groupby('token', sort=False):
+        g = grp.set_index('date').sort_index()
+        bars = g['ltp'].resample(interval).ohlc()
+        # volume_traded is cumulative for the day; bar volume is its increase
+        bars['volume'] = g['volume'].resample(interval).last().diff().clip(lower=0)
+        frames[int(token)] = bars.dropna(subset=['close']).reset_index()
+    return frames
+
+
+class BacktestResult:
+    def __init__(self, index, tokens, equity, positions, pnl_by_instrument, orders, costs, trades):
+        self.index = index
+        self.tokens = tokens
+        self.equity = equity
+        self.positions = positions
+        self.pnl_by_instrument = pnl_by_instrument
+        self.orders = orders
+        self.costs = costs
+        self.trades = trades
+
+    @property
+    def total_pnl(self) -> float:
+        return float(self.equity[-1]) if len(self.equity) else 0.0
+
+    @property
+    def max_drawdown(self) -> float:
+        if not len(self.equity):
+            return 0.0
+        return float((np.maximum.accumulate(self.equity) - self.equity).max())
+
+    def summary(self) -> Dict:
+        closed = [t['pnl'] for ts in self.trades.values() for t in ts]
+        wins = [p for p in closed if p > 0]
+        return {
+            'instruments': len(self.tokens),
+            'bars': len(self.index),
+            'total_pnl': self.total_pnl,
+            'max_drawdown': self.max_drawdown,
+            'orders': int(self.orders),
+            'costs': float(self.costs),
+            'closed_trades': len(closed),
+            'win_rate': len(wins) / len(closed) if closed else None,
+        }
+
+
+class EventBacktester:
+    def __init__(self, fill_model: Optional[FillModel] = None, lot_sizes: Optional[Dict[int, int]] = None,
+                 default_lot_size: int = 1):
+        self.fill_model = fill_model or FillModel()
+        self.lot_sizes = lot_sizes or {}
+        self.default_lot_size = default_lot_size
+        self.index = None
+        self.tokens: List[int] = []
+
+    def load_bars(self, frames: Dict[int, pd.DataFrame]) -> 'EventBacktester':
+        """Align per-instrument bar frames (columns date, open, high, low, close) on one grid."""
+        self.tokens = list(frames)
+        fields = {}
+        for field in ('open', 'high', 'low', 'close'):
+            fields[field] = pd.concat(
+                {tok: df.set_index('date')[field] for tok, df in frames.items() if not df.empty},
+                axis=1,
+            ).reindex(columns=self.tokens).sort_index()
+        self.index = fields['close'].index.to_numpy()
+        # prices carry forward over gaps; before an instrument's first bar they stay NaN
+        self.close = fields['close'].ffill().to_numpy(dtype=float)
+        self.open = fields['open'].to_numpy(dtype=float)
+        self.open = np.where(np.isnan(self.open), self.close, self.open)
+        self.high = fields['high'].ffill().to_numpy(dtype=float)
+        self.low = fields['low'].ffill().to_numpy(dtype=float)
+        self.lot = np.array([self.lot_sizes.get(int(t), self.default_lot_size) for t in self.tokens], dtype=float)
+        return self
+
+    def _targets(self, strategy) -> np.ndarray:
+        T, N = self.close.shape
+        if hasattr(strategy, 'target_positions'):
+            target = np.asarray(strategy.target_positions(self), dtype=float)
+        else:
+            # Event-driven path: one call per bar with the position currently held
+            target = np.zeros((T, N))
+            position = np.zeros(N)
+            for i in range(T):
+                target[i] = strategy.on_bar(i, self, position)
+                if i + 1 < T:
+                    position = target[i]
+        target = np.nan_to_num(target)
+        # nothing can be held before an instrument's first bar
+        target[np.isnan(self.close)] = 0.0
+        return target
+
+    def run(self, strategy) -> BacktestResult:
+        if self.index is None:
+            raise RuntimeError('No bars loaded. Call load_bars first.')
+        T, N = self.close.shape
+        target = self._targets(strategy)
+        # Decision on bar t's close executes at bar t+1's open
+        position = np.vstack([np.zeros((1, N)), target[:-1]])
+        qty = np.diff(position, axis=0, prepend=np.zeros((1, N)))
+        side = np.sign(qty)
+        # prices are NaN before an instrument's first bar, where nothing is traded or held
+        fill = np.where(qty != 0, self.fill_model.fill_prices(self.open, side), 0.0)
+        traded_value = qty * fill * self.lot
+        orders = (qty != 0).astype(float)
+        costs = self.fill_model.costs(traded_value, orders)
+        cash = -np.cumsum(traded_value + costs, axis=0)
+        mtm = position * np.where(position != 0, self.close, 0.0) * self.lot
+        pnl = cash + mtm
+        equity = pnl.sum(axis=1)
+        trades = self._round_trips(qty, fill, costs)
+        return BacktestResult(
+            index=self.index,
+            tokens=self.tokens,
+            equity=equity,
+            positions=position,
+            pnl_by_instrument=dict(zip(self.tokens, pnl[-1].tolist())) if T else {},
+            orders=orders.sum(),
+            costs=costs.sum(),
+            trades=trades,
+        )
+
+    def _round_trips(self, qty, fill, costs) -> Dict[int, List[Dict]]:
+        """Closed round trips per instrument; only bars with fills are visited."""
+        trades = {}
+        for j, tok in enumerate(self.tokens):
+            out = []
+            pos = 0.0
+            cash = 0.0
+            entry_i = None
+            for i in np.flatnonzero(qty[:, j]):
+                q = qty[i, j]
+                new_pos = pos + q
+                if pos != 0 and (new_pos == 0 or np.sign(new_pos) != np.sign(pos)):
+                    # close the old position at this fill; a flip re-opens with the remainder
+                    close_q = -pos
+                    share = close_q / q
+                    cash -= close_q * fill[i, j] * self.lot[j] + costs[i, j] * share
+                    out.append({'entry_index': entry_i, 'exit_index': int(i),
+                                'side': 'long' if pos > 0 else 'short', 'pnl': float(cash)})
+                    cash = 0.0
+                    q -= close_q
+                    pos = 0.0
+                    if q == 0:
+                        continue
+                    cash -= q * fill[i, j] * self.lot[j] + costs[i, j] * (1 - share)
+                    entry_i = int(i)
+                else:
+                    if pos == 0:
+                        entry_i = int(i)
+                    cash -= q * fill[i, j] * self.lot[j] + costs[i, j]
+                pos = new_pos
+            trades[tok] = out
+        return trades
+
+
+class SmaCross:
+    """Long-only SMA crossover: hold `lots` while the short SMA is above the long SMA."""
+
+    def __init__(self, short: int = 5, long: int = 20, lots: int = 1):
+        self.short = short
+        self.long = long
+        self.lots = lots
+
+    def target_positions(self, bt: EventBacktester) -> np.ndarray:
+        close = pd.DataFrame(bt.close)
+        sma_short = close.rolling(self.short).mean()
+        sma_long = close.rolling(self.long).mean()
+        long_on = (sma_short > sma_long).to_numpy()
+        return np.where(long_on, float(self.lots), 0.0)
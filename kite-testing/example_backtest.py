@@ -4,27 +4,20 @@ Simple example: download historical data for an instrument and run a moving-aver
 import os
 import sys
 from kite_hist import KiteHistClient
-import pandas as pd
+from event_backtest import EventBacktester, SmaCross
 
 API_KEY = os.getenv('KITE_API_KEY')
 ACCESS_TOKEN = os.getenv('KITE_ACCESS_TOKEN')
 
-def sma_cross_backtest(df, short=5, long=20):
-    df = df.copy()
-    df['sma_short'] = df['close'].rolling(short).mean()
-    df['sma_long'] = df['close'].rolling(long).mean()
-    df = df.dropna()
-    position = 0
-    entry_price = 0
-    trades = []
-    for idx, row in df.iterrows():
-        if row['sma_short'] > row['sma_long'] and position == 0:
-            position = 1
-            entry_price = row['close']
-        elif row['sma_short'] < row['sma_long'] and position == 1:
-            position = 0
-            trades.append(row['close'] - entry_price)
-    return trades
+def sma_cross_backtest(df, short=5, long=20, fill_model=None, lot_size=1):
+    """Long-only SMA crossover on one instrument's bars; returns the PnL of each closed trade.
+
+    Signals on a bar's close are filled at the next bar's open, with slippage and brokerage
+    from fill_model (see event_backtest.FillModel).
+    """
+    bt = EventBacktester(fill_model, lot_sizes={0: lot_size}).load_bars({0: df})
+    result = bt.run(SmaCross(short, long))
+    return [t['pnl'] for t in result.trades[0]]
 
 def main():
     # Prompt for missing credentials interactively (access tokens change frequently)
@@ -0,0 +1,236 @@
+"""
+Precomputed F&O index over the instrument master.
+
+FnoIndex keeps every futures and options contract as flat numpy columns sorted by
+(underlying, expiry, type, strike), so each underlying's expiries and each (underlying,
+expiry) chain are contiguous slices found with searchsorted instead of DataFrame filters:
+
+    index = FnoIndex.load_or_build(cache_dir, loader=hist.get_fno_instruments)
+    index.expiries('BANKNIFTY')                       # sorted datetime64[D]
+    strikes, ce, pe = index.chain('BANKNIFTY', exp)   # strikes with aligned CE/PE tokens
+    index.lot_size(tokens)                            # vectorized token -> lot size
+    index.find_token('NIFTY', exp, 22000, 'CE')
+    index.front_month('NIFTY', '2024-01-01', '2024-03-31')
+
+The index is built once per day and saved as fno_index_<YYYYMMDD>.npz. The instrument
+master only lists live contracts, so front_month() over past dates reads the union of all
+saved days (load_history), which still knows the contracts that have since expired.
+"""
+import datetime
+import glob
+import os
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+FUT, CE, PE = 0, 1, 2
+_TYPE_CODES = {'FUT': FUT, 'CE': CE, 'PE': PE}
+_COLUMNS = ('token', 'name', 'expiry', 'kind', 'strike', 'lot')
+INDEX_PREFIX = 'fno_index_'
+STRIKE_DECIMALS = 2   # strikes are multiples of the 0.05 tick
+
+
+def _round_strike(strike) -> np.ndarray:
+    # the instrument master may arrive with float32 strikes (101.05 -> 101.05000305)
+    return np.round(np.asarray(strike, dtype=np.float64), STRIKE_DECIMALS)
+
+
+def _to_day(values) -> np.ndarray:
+    return pd.to_datetime(pd.Series(values), errors='coerce').to_numpy(dtype='datetime64[D]')
+
+
+class FnoIndex:
+    def __init__(self, names, token, name, expiry, kind, strike, lot, symbol=None):
+        self.names = list(names)             # underlying names; `name` holds indexes into this list
+        strike = _round_strike(strike)
+        order = np.lexsort((strike, kind, expiry, name))
+        self.token = np.asarray(token, dtype=np.int64)[order]
+        self.name = np.asarray(name, dtype=np.int32)[order]
+        self.expiry = np.asarray(expiry, dtype='datetime64[D]')[order]
+        self.kind = np.asarray(kind, dtype=np.int8)[order]
+        self.strike = strike[order]
+        self.lot = np.asarray(lot, dtype=np.int32)[order]
+        self.symbol = None if symbol is None else np.asarray(symbol, dtype=object)[order]
+        self._name_code = {n: i for i, n in enumerate(self.names)}
+        by_token = np.argsort(self.token, kind='stable')
+        self._token_sorted = self.token[by_token]
+        self._token_pos = by_token
+
+    def __len__(self):
+        return len(self.token)
+
+    @classmethod
+    def from_instruments(cls, df: pd.DataFrame) -> 'FnoIndex':
+        """Build from kite.instruments() rows / an instruments CSV; non-F&O rows are ignored."""
+        if df is None or df.empty:
+            return cls([], [], [], [], [], [], [])
+        types = df['instrument_type'].astype(str).str.upper()
+        fno = df[types.isin(list(_TYPE_CODES))]
+        expiry = _to_day(fno['expiry'])
+        keep = ~np.isnat(expiry)
+        fno = fno[keep]
+        codes, names = pd.factorize(fno['name'].astype(str), sort=True)
+        lot = pd.to_numeric(fno['lot_size'], errors='coerce').fillna(1).clip(lower=1) if 'lot_size' in fno else 1
+        return cls(
+            names, fno['instrument_token'].to_numpy(), codes, expiry[keep],
+            fno['instrument_type'].astype(str).str.upper().map(_TYPE_CODES).to_numpy(),
+            pd.to_numeric(fno['strike'], errors='coerce').fillna(0).to_numpy(),
+            np.broadcast_to(np.asarray(lot), len(fno)),
+            fno['tradingsymbol'].astype(str).to_numpy() if 'tradingsymbol' in fno else None,
+        )
+
+    # Persistence
+
+    def save(self, path: str) -> str:
+        tmp_path = path + '.tmp.npz'
+        arrays = {c: getattr(self, c) for c in _COLUMNS}
+        arrays['names'] = np.array(self.names, dtype='U')
+        if self.symbol is not None:
+            arrays['symbol'] = self.symbol.astype('U')
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'FnoIndex':
+        with np.load(path) as data:
+            names = data['names'].tolist()
+            symbol = data['symbol'] if 'symbol' in data.files else None
+            return cls(names, *(data[c] for c in _COLUMNS), symbol=symbol)
+
+    @classmethod
+    def load_or_build(cls, cache_dir: str, loader: Callable[[], pd.DataFrame],
+                      on_date: Optional[datetime.date] = None) -> 'FnoIndex':
+        """Today's saved index, or build it from loader() (instrument master rows) and save it."""
+        on_date = on_date or datetime.date.today()
+        path = os.path.join(cache_dir, f'{INDEX_PREFIX}{on_date:%Y%m%d}.npz')
+        if os.path.exists(path):
+            return cls.load(path)
+        index = cls.from_instruments(loader())
+        if len(index):
+            os.makedirs(cache_dir, exist_ok=True)
+            index.save(path)
+        return index
+
+    @classmethod
+    def load_history(cls, cache_dir: str) -> 'FnoIndex':
+        """Union of every saved day (latest entry wins per token), including expired contracts."""
+        paths = sorted(glob.glob(os.path.join(cache_dir, f'{INDEX_PREFIX}*.npz')))
+        if not paths:
+            return cls([], [], [], [], [], [], [])
+        parts = [cls.load(p) for p in paths]
+        names = sorted({n for p in parts for n in p.names})
+        code = {n: i for i, n in enumerate(names)}
+        cols = {c: np.concatenate([getattr(p, c) for p in parts]) for c in _COLUMNS}
+        cols['name'] = np.concatenate([np.array([code[n] for n in p.names], dtype=np.int32)[p.name]
+                                       if len(p) else np.zeros(0, dtype=np.int32) for p in parts])
+        # keep the last occurrence of each token (from the newest file)
+        rev = slice(None, None, -1)
+        _, first = np.unique(cols['token'][rev], return_index=True)
+        keep = len(cols['token']) - 1 - first
+        return cls(names, *(cols[c][keep] for c in _COLUMNS))
+
+    # Lookups
+
+    def _name_slice(self, underlying: str) -> slice:
+        code = self._name_code.get(underlying)
+        if code is None:
+            return slice(0, 0)
+        lo, hi = np.searchsorted(self.name, [code, code + 1])
+        return slice(lo, hi)
+
+    def _chain_slice(self, underlying: str, expiry) -> slice:
+        s = self._name_slice(underlying)
+        expiry = np.datetime64(pd.Timestamp(expiry).date(), 'D')
+        lo, hi = np.searchsorted(self.expiry[s], [expiry, expiry + 1])
+        return slice(s.start + lo, s.start + hi)
+
+    def underlyings(self) -> list:
+        return list(self.names)
+
+    def expiries(self, underlying: str, kind: str = 'option') -> np.ndarray:
+        """Sorted expiries of the underlying's options ('option') or futures ('future')."""
+        s = self._name_slice(underlying)
+        mask = self.kind[s] == FUT if kind == 'future' else self.kind[s] != FUT
+        return np.unique(self.expiry[s][mask])
+
+    def next_expiry(self, underlying: str, on_date=None, kind: str = 'option'):
+        """First expiry on or after on_date (default today), as datetime.date."""
+        expiries = self.expiries(underlying, kind)
+        day = np.datetime64(pd.Timestamp(on_date or datetime.date.today()).date(), 'D')
+        i = np.searchsorted(expiries, day)
+        if i == len(expiries):
+            raise ValueError(f'No {kind} expiry for {underlying} on or after {day}')
+        return expiries[i].astype(datetime.date)
+
+    def chain(self, underlying: str, expiry):
+        """(strikes, ce_tokens, pe_tokens) for one expiry; -1 where a side is not listed."""
+        s = self._chain_slice(underlying, expiry)
+        kind, strike, token = self.kind[s], self.strike[s], self.token[s]
+        strikes = np.unique(strike[kind != FUT])
+        ce = np.full(len(strikes), -1, dtype=np.int64)
+        pe = np.full(len(strikes), -1, dtype=np.int64)
+        for side, out in ((CE, ce), (PE, pe)):
+            m = kind == side
+            out[np.searchsorted(strikes, strike[m])] = token[m]
+        return strikes, ce, pe
+
+    def find_token(self, underlying: str, expiry, strike: float = 0.0, opt_type: str = 'FUT') -> int:
+        """Token of one contract, or -1."""
+        s = self._chain_slice(underlying, expiry)
+        kind = _TYPE_CODES[opt_type.upper()]
+        m = self.kind[s] == kind
+        if kind != FUT:
+            m &= self.strike[s] == _round_strike(strike)
+        hits = self.token[s][m]
+        return int(hits[0]) if len(hits) else -1
+
+    def _positions(self, tokens) -> np.ndarray:
+        """Row of each token in the flat columns, -1 if unknown."""
+        tokens = np.atleast_1d(np.asarray(tokens, dtype=np.int64))
+        if not len(self._token_sorted):
+            return np.full(len(tokens), -1, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self._token_sorted, tokens), len(self._token_sorted) - 1)
+        return np.where(self._token_sorted[i] == tokens, self._token_pos[i], -1)
+
+    def lot_size(self, tokens, default: int = 1):
+        """Lot size per token (array in, array out; scalar in, int out)."""
+        pos = self._positions(tokens)
+        lots = np.full(len(pos), default, dtype=np.int32)
+        hit = pos >= 0
+        lots[hit] = self.lot[pos[hit]]
+        return int(lots[0]) if np.ndim(tokens) == 0 else lots
+
+    def lot_sizes(self) -> dict:
+        """token -> lot size for every contract (the lot_sizes argument of EventBacktester)."""
+        return dict(zip(self.token.tolist(), self.lot.tolist()))
+
+    def contract(self, token: int) -> Optional[dict]:
+        pos = int(self._positions(token)[0])
+        if pos < 0:
+            return None
+        kind = {v: k for k, v in _TYPE_CODES.items()}[int(self.kind[pos])]
+        return {'underlying': self.names[self.name[pos]], 'expiry': self.expiry[pos].astype(datetime.date),
+                'type': kind, 'strike': float(self.strike[pos]), 'lot_size': int(self.lot[pos]),
+                'tradingsymbol': None if self.symbol is None else str(self.symbol[pos])}
+
+    def front_month(self, underlying: str, start, end, roll_days: int = 0, strike: Optional[float] = None,
+                    opt_type: str = 'FUT') -> pd.DataFrame:
+        """
+        Continuous front-month series for each business day in [start, end]: the contract of
+        the nearest monthly expiry on or after the day, rolled `roll_days` days early.
+        Futures by default; with strike/opt_type, the option at that strike. Monthly expiries
+        are those of the futures (options also have weeklies). token is -1 where no contract
+        is known (see load_history). Returns columns date, token, expiry.
+        """
+        days = pd.bdate_range(start, end).to_numpy(dtype='datetime64[D]')
+        monthly = self.expiries(underlying, 'future')
+        i = np.searchsorted(monthly, days + np.timedelta64(roll_days, 'D'))
+        valid = i < len(monthly)
+        expiry = np.full(len(days), np.datetime64('NaT'), dtype='datetime64[D]')
+        expiry[valid] = monthly[i[valid]]
+        tokens = np.full(len(days), -1, dtype=np.int64)
+        for exp in np.unique(expiry[valid]):
+            tokens[expiry == exp] = self.find_token(underlying, exp, strike or 0.0, opt_type)
+        return pd.DataFrame({'date': days, 'token': tokens, 'expiry': expiry})
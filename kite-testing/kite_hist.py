@@ -12,6 +12,51 @@ try:
 except Exception:
     KiteConnect = None
 
+# Compact dtypes for the instrument master (kite.instruments() / instruments_*.csv)
+INSTRUMENT_CATEGORY_COLUMNS = ['exchange', 'segment', 'instrument_type', 'name']
+INSTRUMENT_INT_COLUMNS = ['instrument_token', 'exchange_token', 'lot_size']
+INSTRUMENT_PRICE_COLUMNS = ['last_price', 'tick_size']
+# Matched exactly (strike lookups), so never narrowed to float32
+INSTRUMENT_STRIKE_COLUMNS = ['strike']
+# Local instrument master files tried, in order, when kite.instruments() is unavailable
+FNO_CSV_CANDIDATES = ['instruments_NFO.csv', 'instruments.csv', 'instruments_NSE.csv']
+FNO_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fno_index')
+
+
+def optimize_instrument_dtypes(df: pd.DataFrame, price_dtype: str = 'float32') -> pd.DataFrame:
+    """Cast an instrument master DataFrame to compact dtypes in place and return it.
+
+    Tokens and lot sizes become int32 (int64 if a value does not fit), prices become
+    price_dtype, strikes stay float64 and the repetitive text columns become categoricals.
+    """
+    for col in INSTRUMENT_CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in INSTRUMENT_INT_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            if values.isna().any():
+                continue
+            in_range = values.empty or (values.min() >= -2**31 and values.max() < 2**31)
+            df[col] = values.astype('int32' if in_range else 'int64')
+    for col in INSTRUMENT_PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(price_dtype)
+    for col in INSTRUMENT_STRIKE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    return df
+
+
+def read_instruments_csv(path: str, price_dtype: str = 'float32') -> pd.DataFrame:
+    """Read an instruments CSV with compact dtypes applied while parsing."""
+    header = pd.read_csv(path, nrows=0).columns
+    dtype = {c: 'category' for c in INSTRUMENT_CATEGORY_COLUMNS if c in header}
+    dtype.update({c: price_dtype for c in INSTRUMENT_PRICE_COLUMNS if c in header})
+    dtype.update({c: 'float64' for c in INSTRUMENT_STRIKE_COLUMNS if c in header})
+    df = pd.read_csv(path, dtype=dtype)
+    return optimize_instrument_dtypes(df, price_dtype)
+
 
 class KiteHistClient:
     def __init__(self, api_key: str, access_token: str, kite=None):
@@ -53,8 +98,9 @@ class KiteHistClient:
         """Return all instruments that belong to the F&O segment (NFO) as a DataFrame.
 
         This method attempts to fetch instruments via KiteConnect.instruments(). If kiteconnect
-        isn't available or the call fails, it falls back to reading a local CSV named
-        'instruments_NSE.csv' at the repository root.
+        isn't available or the call fails, it falls back to the first local CSV found at the
+        repository root among FNO_CSV_CANDIDATES (KiteClient.save_instruments_csv('NFO') writes
+        'instruments_NFO.csv').
 
         The returned DataFrame will include at least these columns if available:
         ['instrument_token', 'exchange', 'tradingsymbol', 'name', 'segment', 'expiry']
@@ -68,25 +114,23 @@ class KiteHistClient:
                 instruments = None
 
         if instruments:
-            df = pd.DataFrame(instruments)
+            df = optimize_instrument_dtypes(pd.DataFrame(instruments))
         else:
-            # fallback: try reading instruments_NSE.csv from repo root
-            repo_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            csv_path = os.path.join(repo_root, 'instrumentsFNO_NSE.csv')
-            if not os.path.exists(csv_path):
+            # fallback: a local instruments CSV at the repo root (the parent of kite-testing/)
+            repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            csv_path = next((os.path.join(repo_root, name) for name in FNO_CSV_CANDIDATES
+                             if os.path.exists(os.path.join(repo_root, name))), None)
+            if csv_path is None:
                 # nothing we can do
                 return pd.DataFrame()
-            df = pd.read_csv(csv_path)
+            df = read_instruments_csv(csv_path)
 
         # Normalize column names access patterns
         # Some instrument lists include 'segment' or 'instrument_type'; attempt to detect FNO
         cols = df.columns.str.lower()
         # prefer 'segment' column if present
-        segment_col = None
-        for c in df.columns:
-            if c.lower() in ('segment', 'instrument_type'):
-                segment_col = c
-                break
+        lower = {c.lower(): c for c in df.columns}
+        segment_col = lower.get('segment', lower.get('instrument_type'))
 
         exchange_col = None
         for c in df.columns:
@@ -106,11 +150,18 @@ class KiteHistClient:
             ts = ts_cols[0]
             fno_df = df[df[ts].str.contains('FUT|OPT', na=False)]
 
-        # Ensure instrument_token is numeric where possible
-        if 'instrument_token' in fno_df.columns:
-            try:
-                fno_df['instrument_token'] = fno_df['instrument_token'].astype(int)
-            except Exception:
-                pass
-
+        # instrument_token is already int32/int64 from optimize_instrument_dtypes
         return fno_df.reset_index(drop=True)
+
+    def fno_index(self, cache_dir: str = FNO_INDEX_DIR):
+        """Today's FnoIndex (fno_index.py), built from get_fno_instruments() on the first call of the day."""
+        module = sys.modules.get('fno_index')
+        if module is None:
+            # kite_hist is often loaded by path (see app._load_kite_testing_module), so load the sibling by path too
+            import importlib.util
+            path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fno_index.py')
+            spec = importlib.util.spec_from_file_location('fno_index', path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules['fno_index'] = module
+            spec.loader.exec_module(module)
+        return module.FnoIndex.load_or_build(cache_dir, loader=self.get_fno_instruments)
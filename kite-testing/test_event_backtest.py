@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from event_backtest import EventBacktester, FillModel, SmaCross
+
+
+def _bars(start, n, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    dates = pd.date_range('2024-01-01 09:15', periods=200, freq='1min')[start:start + n]
+    return pd.DataFrame({'date': dates, 'open': close + 0.1, 'high': close + 0.5,
+                         'low': close - 0.5, 'close': close})
+
+
+def test_instruments_starting_at_different_bars():
+    first, late = _bars(0, 100, 1), _bars(50, 50, 2)
+    model = FillModel(slippage_bps=5, brokerage_per_order=20)
+    result = EventBacktester(model).load_bars({1: first, 2: late}).run(SmaCross(3, 8))
+
+    summary = result.summary()
+    assert np.isfinite(result.equity).all()
+    assert np.isfinite(summary['total_pnl']) and np.isfinite(summary['max_drawdown'])
+    assert np.isfinite(summary['costs'])
+    assert (result.positions[:51, 1] == 0).all()
+
+    # each instrument's PnL matches a run on its own bars
+    for token, df in ((1, first), (2, late)):
+        alone = EventBacktester(model).load_bars({token: df}).run(SmaCross(3, 8))
+        assert np.isclose(result.pnl_by_instrument[token], alone.pnl_by_instrument[token])
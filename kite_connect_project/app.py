@@ -1,9 +1,16 @@
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, g, jsonify, request, render_template
 from flask_cors import CORS
+import gc
+import gzip
+import hashlib
 import os
 import traceback
 import importlib.util
 import pathlib
+import threading
+import time
+
+from metrics import _load_shared, instrumentation
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 CORS(app)
@@ -11,26 +18,39 @@ CORS(app)
 # Don't import kite modules at import-time; load them lazily to avoid errors when packages
 # aren't installed in the environment used for editing.
 KiteHistClient = None
+kite_hist_module = None
 
-def _load_kite_hist():
-    """Attempt to load KiteHistClient from kite-testing/kite_hist.py dynamically.
-    Returns the class or None.
-    """
-    global KiteHistClient
-    if KiteHistClient is not None:
-        return KiteHistClient
+_kite_testing_modules = {}
+
+
+def _load_kite_testing_module(name):
+    """Load kite-testing/<name>.py dynamically (cached). Returns the module or None."""
+    if name in _kite_testing_modules:
+        return _kite_testing_modules[name]
     repo_root = pathlib.Path(__file__).resolve().parents[1]
-    hist_path = repo_root / 'kite-testing' / 'kite_hist.py'
-    if not hist_path.exists():
+    path = repo_root / 'kite-testing' / f'{name}.py'
+    if not path.exists():
         return None
-    spec = importlib.util.spec_from_file_location('kite_testing.kite_hist', str(hist_path))
+    spec = importlib.util.spec_from_file_location(f'kite_testing.{name}', str(path))
     module = importlib.util.module_from_spec(spec)
     try:
         spec.loader.exec_module(module)
-        KiteHistClient = getattr(module, 'KiteHistClient', None)
     except Exception:
         traceback.print_exc()
-        KiteHistClient = None
+        return None
+    _kite_testing_modules[name] = module
+    return module
+
+
+def _load_kite_hist():
+    """Attempt to load KiteHistClient from kite-testing/kite_hist.py dynamically.
+    Returns the class or None.
+    """
+    global KiteHistClient, kite_hist_module
+    if KiteHistClient is not None:
+        return KiteHistClient
+    kite_hist_module = _load_kite_testing_module('kite_hist')
+    KiteHistClient = getattr(kite_hist_module, 'KiteHistClient', None)
     return KiteHistClient
 
 
@@ -39,9 +59,32 @@ STRATEGIES = [
     {"id": "stub", "name": "Stub Strategy"},
 ]
 
+# Cache-Control max-age for responses that only change when the code or the instrument master does
+STRATEGIES_MAX_AGE = 86400
+SYMBOLS_MAX_AGE = 3600
+SYMBOLS_LIMIT = 200
+# gzip responses of these types above this size when the client accepts it
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_MIMETYPES = {'application/json', 'text/html', 'text/css', 'text/plain', 'application/javascript',
+                      'text/javascript'}
+
+# Backtest results warehouse (python-tetst/results_store.py) served by /api/results/*
+RESULTS_DB = os.environ.get('OPTIONALGO_RESULTS_DB')
+RESULTS_FILTERS = ('strategy', 'params_hash', 'contract', 'date_from', 'date_to')
+
+
+_kc = None
+_kc_lock = threading.Lock()
+
 
 def get_kc():
-    """Return a KiteClient instance if available, else None."""
+    """Return the process-wide KiteClient instance if available, else None.
+
+    The client (and its pooled HTTP session) is built once and reused by every request.
+    """
+    global _kc
+    if _kc is not None:
+        return _kc
     # Lazy import to avoid import errors at module load
     try:
         from kite_client import KiteClient as _KiteClient
@@ -49,12 +92,201 @@ def get_kc():
         return None
     api_key = os.getenv('KITE_API_KEY')
     api_secret = os.getenv('KITE_API_SECRET')
-    # Try to use token file if present; KiteClient will handle init
+    with _kc_lock:
+        if _kc is None:
+            # Try to use token file if present; KiteClient will handle init
+            try:
+                # KiteClient constructor expects (api_key, api_secret, ...)
+                _kc = _KiteClient(api_key, api_secret)
+            except Exception:
+                return None
+    return _kc
+
+
+class InstrumentIndex:
+    """Instrument master reduced to the arrays the symbol search needs, built once per process."""
+
+    def __init__(self, df):
+        symbol_col = 'tradingsymbol' if 'tradingsymbol' in df.columns else 'symbol'
+        self.symbols = df[symbol_col].astype(str).tolist()
+        self.keys = [s.upper() for s in self.symbols]
+        self.tokens = df['instrument_token'].tolist() if 'instrument_token' in df.columns else [None] * len(df)
+        if 'name' in df.columns:
+            names = df['name'].astype(object)
+            self.names = names.where(names.notna(), None).tolist()
+        else:
+            self.names = self.symbols
+        self.version = hashlib.sha1('\n'.join(self.keys).encode('utf-8')).hexdigest()[:12]
+        self._results = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, q: str, limit: int = SYMBOLS_LIMIT) -> list:
+        """First `limit` instruments whose symbol contains q (case-insensitive), memoized per query."""
+        out = self._results.get(q)
+        if out is None:
+            out = []
+            for i, key in enumerate(self.keys):
+                if q in key:
+                    token = self.tokens[i]
+                    out.append({'symbol': self.symbols[i],
+                                'instrument_token': int(token) if token else None,
+                                'name': self.names[i]})
+                    if len(out) >= limit:
+                        break
+            if len(self._results) > 4096:
+                self._results.clear()
+            self._results[q] = out
+        return out
+
+
+_instrument_index = None
+_instrument_lock = threading.Lock()
+_hist_client = None
+_ready = False
+
+
+def _load_instruments():
+    """Instrument master from the Kite session if there is one, else the local instruments CSV."""
+    kc = get_kc()
+    if kc is not None and getattr(kc, 'kite', None) is not None:
+        return kc.get_instruments_df()
+    csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instruments_NSE.csv')
+    if not os.path.exists(csv_path):
+        return None
+    _load_kite_hist()
+    if kite_hist_module is not None:
+        # compact dtypes: int32 tokens, categorical exchange/segment/name
+        return kite_hist_module.read_instruments_csv(csv_path)
+    import pandas as pd
+    return pd.read_csv(csv_path)
+
+
+def get_instrument_index():
+    """Process-wide InstrumentIndex (built by preload() or on first use), or None."""
+    global _instrument_index
+    if _instrument_index is None:
+        with _instrument_lock:
+            if _instrument_index is None:
+                df = _load_instruments()
+                if df is not None:
+                    _instrument_index = InstrumentIndex(df)
+    return _instrument_index
+
+
+def get_hist_client():
+    """Shared KiteHistClient for KITE_API_KEY / KITE_ACCESS_TOKEN, or None."""
+    global _hist_client
+    if _hist_client is None and _load_kite_hist() is not None and os.getenv('KITE_ACCESS_TOKEN'):
+        _hist_client = KiteHistClient(os.getenv('KITE_API_KEY'), os.getenv('KITE_ACCESS_TOKEN'))
+    return _hist_client
+
+
+def preload():
+    """
+    Load everything the request handlers would otherwise load on first use: pandas, the
+    kite-testing modules, the instrument index and the historical client. Run in the
+    master before the WSGI server forks, so workers share these pages copy-on-write.
+    """
+    global _ready
+    started = time.perf_counter()
+    import pandas  # noqa: F401  (first import is the slowest part of a cold start)
+    _load_kite_hist()
+    _load_kite_testing_module('event_backtest')
+    index = get_instrument_index()
     try:
-        # KiteClient constructor expects (api_key, api_secret, ...)
-        return _KiteClient(api_key, api_secret)
+        get_hist_client()
     except Exception:
-        return None
+        traceback.print_exc()
+    # keep the preloaded objects out of the cyclic GC so it does not dirty shared pages
+    gc.collect()
+    gc.freeze()
+    _ready = True
+    app.logger.info('Preloaded %d instruments in %.2fs', len(index) if index is not None else 0,
+                    time.perf_counter() - started)
+
+
+def reset_after_fork(workers: int = 1):
+    """
+    Drop the Kite client and historical client inherited from the master (gunicorn post_fork).
+    Their HTTP sessions hold keep-alive connections opened by preload(); a forked worker must
+    not share those sockets with its siblings, so each worker builds its own on first use.
+    The instrument index and loaded modules stay shared. workers is the number of worker
+    processes; with more than one, streaming endpoints are refused (see option_chain).
+    """
+    global _kc, _hist_client, _workers
+    _kc = None
+    _hist_client = None
+    _workers = workers
+
+
+@app.before_request
+def _start_request_timer():
+    if instrumentation.enabled():
+        g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _record_request_time(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'unknown'
+        instrumentation.observe('http_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+        instrumentation.inc('http_requests_total', endpoint=endpoint, status=response.status_code)
+    return response
+
+
+@app.after_request
+def _compress(response):
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype not in COMPRESS_MIMETYPES
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '')):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _cacheable(response, max_age, etag):
+    """Cache-Control + ETag, answering a matching If-None-Match with 304."""
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once preload() has run (or the instrument index is built), else 503."""
+    index = _instrument_index
+    body = {'ready': _ready or index is not None, 'instruments': len(index) if index is not None else 0,
+            'hist_client': _hist_client is not None}
+    return jsonify(body), 200 if body['ready'] else 503
+
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text exposition format; counters are per process, so with several gunicorn
+    # workers each scrape sees only the worker that answered it
+    return Response(instrumentation.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/metrics', methods=['GET', 'POST'])
+def metrics_control():
+    """GET: summary of timers/counters. POST {"enabled": bool, "reset": bool}: toggle at runtime."""
+    if request.method == 'POST':
+        body = request.get_json(force=True, silent=True) or {}
+        if 'enabled' in body:
+            instrumentation.enable(bool(body['enabled']))
+        if body.get('reset'):
+            instrumentation.reset()
+    return jsonify(dict(instrumentation.summary(), enabled=instrumentation.enabled()))
 
 
 @app.route('/')
@@ -64,37 +296,112 @@ def index():
 
 @app.route('/api/strategies')
 def strategies():
-    return jsonify(STRATEGIES)
+    etag = hashlib.sha1(repr(STRATEGIES).encode('utf-8')).hexdigest()[:12]
+    return _cacheable(jsonify(STRATEGIES), STRATEGIES_MAX_AGE, etag)
 
 
 @app.route('/api/symbols')
 def symbols():
     q = request.args.get('q', '').strip().upper()
     try:
-        kc = get_kc()
-        if kc is None:
-            # fallback: load a local instruments CSV if present
-            import pandas as pd
-            csv_path = os.path.join(os.path.dirname(__file__), '..', 'instruments_NSE.csv')
-            if os.path.exists(csv_path):
-                df = pd.read_csv(csv_path)
-            else:
-                return jsonify({'error': 'Kite client not available and instruments CSV missing'}), 500
-        else:
-            df = kc.get_instruments_df()
-        # filter by symbol or tradingsymbol
-        df['search_key'] = df.get('tradingsymbol', df.get('symbol', '')).astype(str)
-        if q:
-            df = df[df['search_key'].str.contains(q, case=False, na=False)]
-        # return list of objects {symbol, instrument_token, name}
-        out = []
-        for _, r in df.head(200).iterrows():
-            out.append({
-                'symbol': r.get('tradingsymbol') or r.get('symbol'),
-                'instrument_token': int(r.get('instrument_token')) if r.get('instrument_token') else None,
-                'name': r.get('name') if 'name' in r else r.get('tradingsymbol') or r.get('symbol')
-            })
-        return jsonify(out)
+        index = get_instrument_index()
+        if index is None:
+            return jsonify({'error': 'Kite client not available and instruments CSV missing'}), 500
+        # list of objects {symbol, instrument_token, name}
+        out = index.search(q)
+        return _cacheable(jsonify(out), SYMBOLS_MAX_AGE, f'{index.version}-{hashlib.sha1(q.encode()).hexdigest()[:8]}')
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
+def _results_store():
+    """A ResultsStore on RESULTS_DB (or the module default), or None if no results were written yet."""
+    # results_store imports run_journal by name; load it by path first so that import resolves
+    _load_shared('run_journal')
+    results_store = _load_shared('results_store')
+    path = RESULTS_DB or results_store.DEFAULT_RESULTS_DB
+    if not os.path.exists(path):
+        return None
+    return results_store.ResultsStore(path)
+
+
+@app.route('/api/results/runs')
+def results_runs():
+    store = _results_store()
+    if store is None:
+        return jsonify([])
+    with store:
+        return jsonify(store.runs().to_dict(orient='records'))
+
+
+@app.route('/api/results/stats')
+def results_stats():
+    """Aggregate backtest stats: ?by=strike_distance|run_id|trade_date|month|...&bucket=100
+    &run_id=<id>(repeatable)&strategy=&params_hash=&contract=&date_from=&date_to=
+
+    Returns one row per group with contracts, trades, pnl, avg_pnl, win_rate and max_drawdown.
+    """
+    store = _results_store()
+    if store is None:
+        return jsonify({'error': 'No results stored yet'}), 404
+    filters = {k: request.args[k] for k in RESULTS_FILTERS if request.args.get(k)}
+    try:
+        with store:
+            df = store.stats(by=request.args.get('by', 'strike_distance'),
+                             bucket=float(request.args.get('bucket', 100)),
+                             run_ids=request.args.getlist('run_id') or None, **filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # NaN (no trades in a group) is not valid JSON
+    return jsonify(df.astype(object).where(df.notna(), None).to_dict(orient='records'))
+
+
+# Worker processes serving the app (reset_after_fork). Each would open its own tickers, and Kite
+# caps websocket connections per API key, so /api/chain runs only in single-process serving.
+_workers = 1
+_chain_services = {}
+_chain_lock = threading.Lock()
+# seconds a new chain service waits for its first ticker connection
+CHAIN_CONNECT_TIMEOUT = 10.0
+
+
+def _chain_service(underlying):
+    """Running chain service of an underlying, started on first use (one at a time)."""
+    service = _chain_services.get(underlying)
+    if service is not None:
+        return service
+    with _chain_lock:
+        service = _chain_services.get(underlying)
+        if service is None:
+            kc = get_kc()
+            if kc is None:
+                raise RuntimeError('Kite client not available')
+            if kc.kite is None:
+                kc.init_session()
+            from option_chain import OptionChainService
+            service = OptionChainService(kc, underlying)
+            # sharded: the service owns its connections instead of replacing kc.ticker
+            service.start(threaded=True, sharded=True, connect_timeout=CHAIN_CONNECT_TIMEOUT)
+            # cached only once it streams, so a failed start is retried by the next request
+            _chain_services[underlying] = service
+    return service
+
+
+@app.route('/api/chain')
+def option_chain():
+    """Live option chain (LTP, OI, bid/ask, IV, Greeks) for ?underlying=BANKNIFTY.
+
+    The first request for an underlying starts its streaming chain service; later requests
+    return the current snapshot. Refused (503) when served by several worker processes.
+    """
+    if _workers > 1:
+        return jsonify({'error': f'Option chain streaming needs a single process; this app runs {_workers} '
+                                 'workers. Serve it from one process (python app.py --prod, or '
+                                 'OPTIONALGO_WORKERS=1).'}), 503
+    underlying = request.args.get('underlying', 'BANKNIFTY').strip().upper()
+    try:
+        return jsonify(_chain_service(underlying).snapshot())
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
@@ -114,11 +421,12 @@ def run_strategy():
     if strategy == 'sma_cross':
         # run a quick historical SMA fetch if possible
         try:
-            api_key = os.getenv('KITE_API_KEY')
-            access_token = os.getenv('KITE_ACCESS_TOKEN')
-            if KiteHistClient is None:
+            if _load_kite_hist() is None:
                 return jsonify({'error': 'KiteHistClient not available on server'}), 500
-            client = KiteHistClient(api_key, access_token)
+            backtest = _load_kite_testing_module('event_backtest')
+            if backtest is None:
+                return jsonify({'error': 'event_backtest not available on server'}), 500
+            client = get_hist_client() or KiteHistClient(os.getenv('KITE_API_KEY'), os.getenv('KITE_ACCESS_TOKEN'))
             # default params
             from_date = params.get('from_date') or '2023-01-01'
             to_date = params.get('to_date') or '2023-12-31'
@@ -126,18 +434,28 @@ def run_strategy():
             df = client.get_historical(int(instrument_token), from_date, to_date, interval=interval)
             if df.empty:
                 return jsonify({'error': 'no data returned for instrument'}), 500
-            # compute a tiny SMA crossover report
             short = int(params.get('short', 5))
             long = int(params.get('long', 20))
-            df['sma_short'] = df['close'].rolling(short).mean()
-            df['sma_long'] = df['close'].rolling(long).mean()
-            df = df.dropna()
-            # simple backtest: count crossovers
-            df['signal'] = (df['sma_short'] > df['sma_long']).astype(int)
-            df['signal_shift'] = df['signal'].shift(1).fillna(0).astype(int)
-            entries = int(((df['signal'] > df['signal_shift']) & (df['signal'] == 1)).sum())
-            exits = int(((df['signal'] < df['signal_shift']) & (df['signal'] == 0)).sum())
-            return jsonify({'status': 'ok', 'entries': entries, 'exits': exits, 'rows': len(df)})
+            # fills at next bar open with slippage/brokerage, quantities in lots
+            fill_model = backtest.FillModel(
+                slippage_bps=float(params.get('slippage_bps', 0.0)),
+                brokerage_per_order=float(params.get('brokerage_per_order', 20.0)),
+            )
+            token = int(instrument_token)
+            bt = backtest.EventBacktester(fill_model, lot_sizes={token: int(params.get('lot_size', 1))})
+            result = bt.load_bars({token: df}).run(backtest.SmaCross(short, long))
+            qty = result.positions[1:, 0] - result.positions[:-1, 0]
+            summary = result.summary()
+            return jsonify({
+                'status': 'ok',
+                'entries': int((qty > 0).sum()),
+                'exits': int((qty < 0).sum()),
+                'rows': len(df),
+                'pnl': summary['total_pnl'],
+                'max_drawdown': summary['max_drawdown'],
+                'costs': summary['costs'],
+                'win_rate': summary['win_rate'],
+            })
         except Exception as e:
             traceback.print_exc()
             return jsonify({'error': str(e)}), 500
@@ -146,5 +464,20 @@ def run_strategy():
 
 
 if __name__ == '__main__':
-    # development server
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    import argparse
+    parser = argparse.ArgumentParser(description='OptionAlgo web UI')
+    parser.add_argument('--prod', action='store_true',
+                        help='preload shared data and serve without the debugger (see wsgi.py for multi-process serving)')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    if args.prod:
+        preload()
+        try:
+            from waitress import serve
+        except ImportError:
+            app.run(host='0.0.0.0', port=args.port, debug=False, threaded=True)
+        else:
+            serve(app, host='0.0.0.0', port=args.port, threads=8)
+    else:
+        # development server
+        app.run(host='0.0.0.0', port=args.port, debug=True)
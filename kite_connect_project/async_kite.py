@@ -0,0 +1,201 @@
+"""Asyncio Kite Connect REST client sharing one pooled aiohttp session.
+
+KiteClient/KiteHistClient wrap the blocking KiteConnect object, so each REST call holds
+the caller's thread for a full round-trip. AsyncKiteClient talks to the same REST API
+with aiohttp: all calls go through one keep-alive connection pool and an
+asyncio.Semaphore caps how many are in flight, so fanning out quotes or history over an
+option chain costs roughly one round-trip instead of N.
+
+Use shared_client() to get the single per-process instance, and BackgroundLoop to call
+it from synchronous code such as the Flask routes.
+"""
+import asyncio
+import io
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+try:
+    import aiohttp
+except Exception:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+KITE_ROOT = 'https://api.kite.trade'
+KITE_VERSION = '3'
+
+
+class KiteAPIError(Exception):
+    def __init__(self, message: str, error_type: Optional[str] = None, status: Optional[int] = None):
+        super().__init__(message)
+        self.error_type = error_type
+        self.status = status
+
+
+class AsyncKiteClient:
+    def __init__(self, api_key: str, access_token: str, root: str = KITE_ROOT,
+                 max_concurrency: int = 8, pool_size: int = 16, timeout: float = 7.0):
+        if aiohttp is None:
+            raise ImportError('aiohttp package not installed. See requirements.txt')
+        self.api_key = api_key
+        self.access_token = access_token
+        self.root = root.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session: Optional['aiohttp.ClientSession'] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _get_session(self) -> 'aiohttp.ClientSession':
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    'X-Kite-Version': KITE_VERSION,
+                    'Authorization': f'token {self.api_key}:{self.access_token}',
+                },
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _request(self, method: str, path: str, params=None, data=None, raw: bool = False):
+        session = await self._get_session()
+        async with self._semaphore:
+            async with session.request(method, self.root + path, params=params, data=data) as resp:
+                if raw and resp.status == 200:
+                    return await resp.text()
+                try:
+                    body = await resp.json(content_type=None)
+                except Exception:
+                    raise KiteAPIError(f'Unexpected response ({resp.status})', status=resp.status)
+        if resp.status != 200 or body.get('status') == 'error':
+            raise KiteAPIError(body.get('message', 'Kite API error'), body.get('error_type'), resp.status)
+        return body.get('data')
+
+    # Market data
+    async def instruments(self, exchange: Optional[str] = None) -> pd.DataFrame:
+        path = f'/instruments/{exchange}' if exchange else '/instruments'
+        text = await self._request('GET', path, raw=True)
+        return pd.read_csv(io.StringIO(text))
+
+    async def historical_data(self, instrument_token: int, from_date: str, to_date: str,
+                              interval: str = '15minute', continuous: bool = False, oi: bool = False) -> pd.DataFrame:
+        """Same arguments and DataFrame shape as KiteHistClient.get_historical."""
+        params = {
+            'from': str(from_date),
+            'to': str(to_date),
+            'continuous': int(continuous),
+            'oi': int(oi),
+        }
+        data = await self._request('GET', f'/instruments/historical/{int(instrument_token)}/{interval}', params=params)
+        candles = (data or {}).get('candles') or []
+        if not candles:
+            return pd.DataFrame()
+        columns = ['date', 'open', 'high', 'low', 'close', 'volume', 'oi'][:len(candles[0])]
+        df = pd.DataFrame(candles, columns=columns)
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    async def quote(self, instruments: Iterable[str], mode: str = 'quote') -> Dict:
+        """mode: 'quote' (full), 'ohlc' or 'ltp'. instruments are 'EXCHANGE:TRADINGSYMBOL' strings."""
+        path = '/quote' if mode == 'quote' else f'/quote/{mode}'
+        return await self._request('GET', path, params=[('i', i) for i in instruments])
+
+    async def quotes_batched(self, instruments: List[str], mode: str = 'quote', batch_size: int = 500) -> Dict:
+        """Quote a large instrument list in concurrent batches (the API caps instruments per call)."""
+        batches = [instruments[i:i + batch_size] for i in range(0, len(instruments), batch_size)]
+        out: Dict = {}
+        for part in await asyncio.gather(*(self.quote(b, mode) for b in batches)):
+            out.update(part or {})
+        return out
+
+    async def historical_many(self, tokens: Iterable[int], from_date: str, to_date: str,
+                              interval: str = '15minute') -> Dict[int, pd.DataFrame]:
+        """Fetch history for many instruments concurrently (bounded by max_concurrency)."""
+        tokens = list(tokens)
+        frames = await asyncio.gather(*(self.historical_data(t, from_date, to_date, interval) for t in tokens))
+        return dict(zip(tokens, frames))
+
+    # Orders
+    async def place_order(self, tradingsymbol: str, exchange: str, transaction_type: str, quantity: int,
+                          price: Optional[float] = None, order_type: str = 'MARKET', product: str = 'MIS',
+                          variety: str = 'regular') -> Dict:
+        data = {
+            'tradingsymbol': tradingsymbol,
+            'exchange': exchange,
+            'transaction_type': transaction_type,
+            'quantity': quantity,
+            'order_type': order_type,
+            'product': product,
+        }
+        if price is not None and order_type == 'LIMIT':
+            data['price'] = price
+        return await self._request('POST', f'/orders/{variety}', data=data)
+
+    async def modify_order(self, order_id, quantity: Optional[int] = None, price: Optional[float] = None,
+                           variety: str = 'regular') -> Dict:
+        data = {}
+        if quantity is not None:
+            data['quantity'] = quantity
+        if price is not None:
+            data['price'] = price
+        return await self._request('PUT', f'/orders/{variety}/{order_id}', data=data)
+
+    async def cancel_order(self, order_id, variety: str = 'regular') -> Dict:
+        return await self._request('DELETE', f'/orders/{variety}/{order_id}')
+
+    async def orders(self) -> List[Dict]:
+        return await self._request('GET', '/orders')
+
+
+class BackgroundLoop:
+    """One asyncio event loop running in a daemon thread, for calling async code from sync code."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='async-kite-loop', daemon=True)
+        self.thread.start()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+
+_shared_lock = threading.Lock()
+_shared_client: Optional[AsyncKiteClient] = None
+_shared_loop: Optional[BackgroundLoop] = None
+
+
+def shared_client(api_key: str, access_token: str, **kwargs) -> AsyncKiteClient:
+    """Return the process-wide AsyncKiteClient, creating it on first use."""
+    global _shared_client
+    with _shared_lock:
+        if (_shared_client is None or _shared_client.api_key != api_key
+                or _shared_client.access_token != access_token):
+            _shared_client = AsyncKiteClient(api_key, access_token, **kwargs)
+        return _shared_client
+
+
+def shared_loop() -> BackgroundLoop:
+    """Return the process-wide background event loop used to drive shared_client() from sync code."""
+    global _shared_loop
+    with _shared_lock:
+        if _shared_loop is None:
+            _shared_loop = BackgroundLoop()
+        return _shared_loop
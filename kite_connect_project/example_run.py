@@ -2,7 +2,10 @@
 
 Demonstrates: init_session (manual step to paste request_token), find_instrument_token and start_ticker
 """
+import os
+
 from kite_client import KiteClient
+from tick_journal import TickRecorder
 
 API_KEY = 'egmcnayk2z9xsf2u'
 API_SECRET = 'p771ous3zyhwn4lrpkbzm8uipcax2lnu'
@@ -42,4 +45,6 @@ if __name__ == '__main__':
         print('Instrument not found for', tradingsymbol)
     else:
         print('Found token', token)
-        kc.start_ticker(on_tick, [token], threaded=False)
+        # Journal every tick so the session can be replayed offline with tick_journal.TickReplayer
+        with TickRecorder(os.path.join(os.getcwd(), 'tick_journal')) as recorder:
+            kc.start_ticker(on_tick, [token], threaded=False, recorder=recorder)
@@ -0,0 +1,23 @@
+"""gunicorn settings for `gunicorn -c gunicorn.conf.py wsgi:application`.
+
+Every worker is a separate process with its own metrics, Kite clients and rate limits, and
+/api/chain is refused with more than one worker (see app.reset_after_fork), so the worker
+count stays small; serve the option chain from a single process (OPTIONALGO_WORKERS=1 or
+`python app.py --prod`).
+"""
+import os
+
+bind = os.getenv('OPTIONALGO_BIND', '0.0.0.0:5000')
+# load wsgi.py (and its preload) in the master, then fork the workers
+preload_app = True
+workers = int(os.getenv('OPTIONALGO_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('OPTIONALGO_THREADS', 4))
+timeout = 120
+keepalive = 5
+
+
+def post_fork(server, worker):
+    # connections opened by preload() in the master must not be shared between workers
+    import app
+    app.reset_after_fork(server.cfg.workers)
@@ -1,11 +1,17 @@
 import json
 import logging
 import os
+import random
+import threading
 import time
 from typing import Callable, Dict, Optional
 
 from kiteconnect import KiteConnect, KiteTicker
 
+from live_bars import HIST_REQUESTS_PER_SECOND, backfill_gap
+from metrics import instrumentation, trade_events
+from order_gateway import TokenBucket
+
 # Basic wrapper for Kite Connect. This module stores the access token in a local file
 # and exposes convenience functions to place/modify/cancel orders and subscribe to 
 # tick-by-tick data for a given instrument token.
@@ -15,6 +21,20 @@ logging.basicConfig(level=logging.INFO)
 
 TOKEN_STORE = os.path.expanduser('~/.kite_token.json')
 
+# HTTP connection pool for the KiteConnect requests session; sized so concurrent
+# order/quote calls reuse keep-alive connections instead of opening new ones.
+HTTP_POOL = {'pool_connections': 10, 'pool_maxsize': 10, 'max_retries': 0, 'pool_block': False}
+
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+# a reconnect attempt that has not reached on_connect by then is treated as failed
+RECONNECT_CONNECT_TIMEOUT = 10.0
+
+
+def reconnect_delay(attempt: int, base: float = RECONNECT_BASE_DELAY, cap: float = RECONNECT_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter, so many clients dropped together do not reconnect in step."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
 
 class KiteClient:
     def __init__(self, api_key: str, api_secret: str, token_store: str = TOKEN_STORE):
@@ -49,7 +69,7 @@ class KiteClient:
                     logger.exception('Failed to rename corrupt token file %s', self.token_store)
                 self.access_token = None
 
-        self.kite = KiteConnect(api_key=self.api_key)
+        self.kite = KiteConnect(api_key=self.api_key, pool=HTTP_POOL)
 
         if request_token:
             data = self.kite.generate_session(request_token, api_secret=self.api_secret)
@@ -67,11 +87,19 @@ class KiteClient:
 
         raise RuntimeError('No access token available. Provide request_token to init_session.')
 
-    def start_ticker(self, on_tick: Callable[[Dict], None], instruments: list, threaded: bool = False):
+    def start_ticker(self, on_tick: Callable[[Dict], None], instruments: list, threaded: bool = False, recorder=None,
+                     bars=None, hist_client=None, reconnect: bool = True):
         """
         Start KiteTicker websocket and subscribe to instruments (list of instrument tokens).
         on_tick is called with the tick dict.
         If threaded=True, the ticker runs in a background thread.
+        recorder: optional tick_journal.TickRecorder; every tick is journaled before on_tick.
+        bars: optional live_bars.LiveBars updated with every tick before on_tick.
+        hist_client: KiteHistClient used to backfill `bars` over a disconnect.
+        reconnect: reconnect with jittered exponential backoff after the connection drops.
+            The ticker resubscribes its tokens in their modes; if bars and hist_client are
+            given, ticks arriving after the reconnect are held until the missed candles have
+            been merged into bars, then delivered in order.
         """
         if not self.kite:
             raise RuntimeError('Kite client not initialized. Call init_session first.')
@@ -81,25 +109,114 @@ class KiteClient:
         if not access_token:
             raise RuntimeError('Access token not set. Call init_session.')
 
-        self.ticker = KiteTicker(api_key, access_token)
+        # our own backoff replaces KiteTicker's fixed one when reconnect=True
+        self.ticker = KiteTicker(api_key, access_token, reconnect=not reconnect)
+        self._ticker_stopping = False
+        state = {'connected_once': False, 'attempt': 0, 'pending': False, 'down_since': None,
+                 'held': None, 'connects': 0}
+        lock = threading.Lock()
+
+        def _dispatch(ticks):
+            with instrumentation.timer('tick_dispatch_seconds'):
+                for t in ticks:
+                    if recorder is not None:
+                        recorder.record(t)
+                    if bars is not None:
+                        bars.on_tick(t)
+                    try:
+                        on_tick(t)
+                    except Exception:
+                        logger.exception('Error in on_tick')
+            instrumentation.inc('ticks_total', len(ticks))
 
         def _on_ticks(ws, ticks):
-            for t in ticks:
+            with lock:
+                if state['held'] is not None:
+                    state['held'].extend(ticks)
+                    return
+            _dispatch(ticks)
+
+        def _recover(down_since):
+            # runs off the reactor thread: the historical calls block
+            gap = time.time() - down_since
+            try:
+                merged = backfill_gap(hist_client, bars, bucket=TokenBucket(HIST_REQUESTS_PER_SECOND))
+                logger.info('Backfilled %d bars over a %.1fs gap', sum(merged.values()), gap)
+            except Exception:
+                logger.exception('Gap backfill failed')
+            while True:
+                with lock:
+                    held = state['held']
+                    if not held:
+                        state['held'] = None
+                        break
+                    state['held'] = []
+                _dispatch(held)
+            instrumentation.observe('ticker_gap_seconds', gap)
+            instrumentation.observe('ticker_recovery_seconds', time.time() - down_since)
+
+        def _on_connect(ws, response):
+            state['connects'] += 1
+            if not state['connected_once']:
+                state['connected_once'] = True
+                logger.info('Ticker connected, subscribing to %s', instruments)
+                ws.subscribe(instruments)
+                ws.set_mode(ws.MODE_FULL, instruments)
+                return
+            # reconnect: KiteTicker has already resubscribed its token/mode table
+            down_since = state['down_since']
+            state['attempt'] = 0
+            state['down_since'] = None
+            instrumentation.inc('ticker_reconnects_total')
+            logger.info('Ticker reconnected after %.1fs', time.time() - down_since if down_since else 0.0)
+            if bars is not None and hist_client is not None and down_since is not None:
+                with lock:
+                    state['held'] = []
+                threading.Thread(target=_recover, args=(down_since,), name='ticker-backfill', daemon=True).start()
+            elif down_since is not None:
+                instrumentation.observe('ticker_recovery_seconds', time.time() - down_since)
+
+        def _schedule_reconnect():
+            if not reconnect or self._ticker_stopping or state['pending']:
+                return
+            if state['down_since'] is None:
+                state['down_since'] = time.time()
+            delay = reconnect_delay(state['attempt'])
+            state['attempt'] += 1
+            state['pending'] = True
+            logger.info('Reconnecting ticker in %.2fs (attempt %d)', delay, state['attempt'])
+
+            def _attempt():
+                state['pending'] = False
+                if self._ticker_stopping:
+                    return
+                connects = state['connects']
                 try:
-                    on_tick(t)
+                    self.ticker.connect(threaded=True)
                 except Exception:
-                    logger.exception('Error in on_tick')
+                    logger.exception('Ticker reconnect failed')
+                    _schedule_reconnect()
+                    return
+                # a failed TCP connect creates no websocket, so neither on_close nor on_error
+                # fires (and KiteTicker's own retries are off); check back and retry from here
+                reactor.callLater(RECONNECT_CONNECT_TIMEOUT, _check_connected, connects)
 
-        def _on_connect(ws, response):
-            logger.info('Ticker connected, subscribing to %s', instruments)
-            ws.subscribe(instruments)
-            ws.set_mode(ws.MODE_FULL, instruments)
+            def _check_connected(connects):
+                if state['connects'] == connects and not state['pending']:
+                    logger.warning('Ticker reconnect attempt %d did not connect', state['attempt'])
+                    _schedule_reconnect()
+
+            # callbacks run on the twisted reactor thread; the retry is scheduled there too
+            from twisted.internet import reactor
+            reactor.callLater(delay, _attempt)
 
         def _on_close(ws, code, reason):
             logger.info('Ticker closed: %s %s', code, reason)
+            _schedule_reconnect()
 
         def _on_error(ws, code, reason):
             logger.error('Ticker error: %s %s', code, reason)
+            _schedule_reconnect()
 
         self.ticker.on_ticks = _on_ticks
         self.ticker.on_connect = _on_connect
@@ -112,6 +229,24 @@ class KiteClient:
         except Exception:
             logger.exception('Failed to start ticker')
 
+    def stop_ticker(self) -> None:
+        """Close the ticker started by start_ticker without reconnecting."""
+        self._ticker_stopping = True
+        if self.ticker is not None:
+            self.ticker.close()
+
+    def subscription_manager(self, on_tick: Callable[[Dict], None], recorder=None, **kwargs):
+        """
+        Return a SubscriptionManager that shards instruments over several KiteTicker connections
+        of this session (see subscription_manager.py). Subscribe tokens, then call start().
+        """
+        if not self.kite or not self.access_token:
+            raise RuntimeError('Kite client not initialized. Call init_session first.')
+        from subscription_manager import SubscriptionManager
+        api_key, access_token = self.api_key, self.access_token
+        return SubscriptionManager(lambda: KiteTicker(api_key, access_token), on_tick,
+                                   recorder=recorder, **kwargs)
+
     # Order convenience wrappers
     def place_order(self, tradingsymbol: str, exchange: str, transaction_type: str, quantity: int, price: Optional[float] = None, order_type: str = 'MARKET', product: str = 'MIS') -> Dict:
         """
@@ -134,8 +269,10 @@ class KiteClient:
         if price is not None and order_type == 'LIMIT':
             params['price'] = price
 
-        logger.info('Placing order: %s', params)
-        resp = self.kite.place_order(**params)
+        trade_events.emit(trade_events.EventCode.ORDER_PLACE, tradingsymbol, params.get('price', float('nan')),
+                          qty=quantity, side=1 if transaction_type == 'BUY' else -1)
+        with instrumentation.timer('order_roundtrip_seconds', action='place'):
+            resp = self.kite.place_order(**params)
         return resp
 
     def modify_order(self, order_id: int, quantity: Optional[int] = None, price: Optional[float] = None) -> Dict:
@@ -146,14 +283,29 @@ class KiteClient:
             params['quantity'] = quantity
         if price is not None:
             params['price'] = price
-        logger.info('Modifying order: %s', params)
-        return self.kite.modify_order(**params)
+        trade_events.emit(trade_events.EventCode.ORDER_MODIFY, order_id, float('nan') if price is None else price,
+                          qty=quantity or 0)
+        with instrumentation.timer('order_roundtrip_seconds', action='modify'):
+            return self.kite.modify_order(**params)
 
     def cancel_order(self, order_id: int) -> Dict:
         if not self.kite:
             raise RuntimeError('Kite client not initialized. Call init_session first.')
-        logger.info('Cancelling order: %s', order_id)
-        return self.kite.cancel_order(order_id=order_id)
+        trade_events.emit(trade_events.EventCode.ORDER_CANCEL, order_id)
+        with instrumentation.timer('order_roundtrip_seconds', action='cancel'):
+            return self.kite.cancel_order(order_id=order_id)
+
+    def async_client(self, **kwargs):
+        """Return the process-wide AsyncKiteClient for this session (one pooled aiohttp session)."""
+        if not self.access_token:
+            raise RuntimeError('Access token not set. Call init_session.')
+        from async_kite import shared_client
+        return shared_client(self.api_key, self.access_token, **kwargs)
+
+    def order_gateway(self, **kwargs):
+        """Return an OrderGateway that sends this client's orders concurrently under the broker rate limit."""
+        from order_gateway import OrderGateway
+        return OrderGateway(self, **kwargs)
 
     def get_instruments_df(self):
         # Downloads the instruments list (cached by kiteconnect) and returns a DataFrame
@@ -0,0 +1,265 @@
+"""Live OHLCV bars built from ticks, with indicator state, and gap backfill after a disconnect.
+
+LiveBars keeps one forming bar per instrument token and a bounded history of closed bars.
+Each closed bar's close is fed to the token's indicator state (by default the strategy set
+from python-tetst/streaming_indicators.py, which carries its state across updates).
+
+When the ticker drops, the minutes it missed are fetched with KiteHistClient.get_historical
+and merged by merge_history(): the partial bar the tick stream was building is replaced by
+the historical one, the missing bars are closed in order (one chunk update per indicator),
+and the newest historical bar, if still in progress, becomes the forming bar that live ticks
+continue. backfill_gap() does this for every tracked token.
+"""
+import collections
+import datetime
+import logging
+import os
+import pickle
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from metrics import _load_shared, instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Kite historical candle intervals by bar size in minutes
+HIST_INTERVALS = {1: 'minute', 3: '3minute', 5: '5minute', 10: '10minute', 15: '15minute',
+                  30: '30minute', 60: '60minute'}
+# Kite historical data API limit
+HIST_REQUESTS_PER_SECOND = 3
+BAR_FIELDS = ('date', 'open', 'high', 'low', 'close', 'volume')
+
+
+def strategy_indicators(params: Optional[dict] = None) -> Callable[[], object]:
+    """Factory of StrategyIndicators (MACD, EMA trend, RSI) with process_option_data's defaults."""
+    streaming = _load_shared('streaming_indicators')
+    if params is None:
+        params = {'ema_fast': 12, 'ema_slow': 26, 'signal': 9, 'ema_trend': 200, 'rsi_period': 14}
+    return lambda: streaming.StrategyIndicators(params)
+
+
+class _Forming:
+    __slots__ = ('start', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, start, open_, high, low, close, volume=0.0):
+        self.start = start
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+
+class LiveBars:
+    """
+    minutes: bar size. indicators: factory returning a fresh indicator state per token
+    (anything with update(closes) -> dict of arrays), or None for bars only.
+    max_bars: closed bars kept per token.
+    """
+
+    def __init__(self, minutes: int = 1, indicators: Optional[Callable[[], object]] = None,
+                 max_bars: int = 2000):
+        if minutes not in HIST_INTERVALS:
+            raise ValueError(f'Unsupported bar size {minutes}; use one of {sorted(HIST_INTERVALS)}')
+        self.minutes = minutes
+        self.step = datetime.timedelta(minutes=minutes)
+        self.indicator_factory = indicators
+        self.max_bars = max_bars
+        self._closed: Dict[int, collections.deque] = {}
+        self._forming: Dict[int, _Forming] = {}
+        self._state: Dict[int, object] = {}
+        self._latest: Dict[int, Dict[str, float]] = {}
+        self._cum_volume: Dict[int, float] = {}
+        self._last_time: Dict[int, datetime.datetime] = {}
+        self._lock = threading.Lock()
+
+    def _bar_start(self, ts: datetime.datetime) -> datetime.datetime:
+        minute = (ts.hour * 60 + ts.minute) // self.minutes * self.minutes
+        return ts.replace(hour=minute // 60, minute=minute % 60, second=0, microsecond=0)
+
+    def _close_bars(self, token: int, rows) -> None:
+        """Append closed bars (tuples in BAR_FIELDS order) and advance the indicators in one chunk."""
+        if not rows:
+            return
+        closed = self._closed.get(token)
+        if closed is None:
+            closed = self._closed[token] = collections.deque(maxlen=self.max_bars)
+        closed.extend(rows)
+        if self.indicator_factory is None:
+            return
+        state = self._state.get(token)
+        if state is None:
+            state = self._state[token] = self.indicator_factory()
+        values = state.update(np.array([r[4] for r in rows], dtype=float))
+        self._latest[token] = {k: float(v[-1]) for k, v in values.items()}
+
+    def on_tick(self, tick: Dict) -> None:
+        token = tick.get('instrument_token')
+        price = tick.get('last_price')
+        if token is None or price is None:
+            return
+        ts = tick.get('exchange_timestamp') or tick.get('last_trade_time') or datetime.datetime.now()
+        if ts.tzinfo is not None:
+            ts = ts.replace(tzinfo=None)
+        start = self._bar_start(ts)
+        cum = tick.get('volume_traded')
+        with self._lock:
+            bar = self._forming.get(token)
+            closed = self._closed.get(token)
+            if (bar is not None and start < bar.start) or (bar is None and closed and start <= closed[-1][0]):
+                # late tick for a bar that has already closed
+                return
+            if bar is None or start > bar.start:
+                if bar is not None:
+                    self._close_bars(token, [(bar.start, bar.open, bar.high, bar.low, bar.close, bar.volume)])
+                bar = self._forming[token] = _Forming(start, price, price, price, price)
+            else:
+                bar.high = max(bar.high, price)
+                bar.low = min(bar.low, price)
+                bar.close = price
+            if cum is not None:
+                # volume_traded is cumulative for the day; the bar gets its increase
+                prev = self._cum_volume.get(token)
+                if prev is not None and cum > prev:
+                    bar.volume += cum - prev
+                self._cum_volume[token] = cum
+            self._last_time[token] = ts
+
+    def merge_history(self, token: int, hist: pd.DataFrame, now: Optional[datetime.datetime] = None) -> int:
+        """
+        Merge historical candles (KiteHistClient.get_historical frame) covering a gap.
+        Candles from the forming bar's start onwards replace the tick-built state; a candle
+        that has not ended by `now` becomes the forming bar. Returns the number of bars closed.
+        """
+        if hist is None or hist.empty:
+            return 0
+        now = now or datetime.datetime.now()
+        dates = pd.to_datetime(hist['date'])
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        volume = hist['volume'] if 'volume' in hist.columns else pd.Series(0.0, index=hist.index)
+        with self._lock:
+            closed = self._closed.get(token)
+            forming = self._forming.get(token)
+            if forming is not None:
+                since = forming.start
+            elif closed:
+                since = closed[-1][0] + self.step
+            else:
+                since = dates.min()
+            rows = [(d.to_pydatetime(), float(o), float(h), float(lo), float(c), float(v))
+                    for d, o, h, lo, c, v in zip(dates, hist['open'], hist['high'], hist['low'],
+                                                 hist['close'], volume)
+                    if d >= since]
+            if not rows:
+                return 0
+            if forming is not None and rows[0][0] > forming.start:
+                # no candle for the tick-built bar; keep what the ticks saw
+                rows.insert(0, (forming.start, forming.open, forming.high, forming.low, forming.close,
+                                forming.volume))
+            last = rows[-1]
+            in_progress = last[0] + self.step > now
+            done = rows[:-1] if in_progress else rows
+            self._close_bars(token, done)
+            if in_progress:
+                self._forming[token] = _Forming(*last)
+            else:
+                self._forming.pop(token, None)
+            # the next tick's cumulative volume has no reference inside the merged bar
+            self._cum_volume.pop(token, None)
+            self._last_time[token] = max(self._last_time.get(token, last[0]), last[0])
+            return len(done)
+
+    def tokens(self):
+        with self._lock:
+            return list(set(self._forming) | set(self._closed))
+
+    def gap_start(self, token: int) -> Optional[datetime.datetime]:
+        """Start of the first bar not yet closed for token (where a backfill has to begin)."""
+        with self._lock:
+            forming = self._forming.get(token)
+            if forming is not None:
+                return forming.start
+            closed = self._closed.get(token)
+            return closed[-1][0] + self.step if closed else None
+
+    def last_time(self, token: int) -> Optional[datetime.datetime]:
+        return self._last_time.get(token)
+
+    def bars(self, token: int, include_forming: bool = False) -> pd.DataFrame:
+        with self._lock:
+            rows = list(self._closed.get(token, ()))
+            forming = self._forming.get(token)
+            if include_forming and forming is not None:
+                rows.append((forming.start, forming.open, forming.high, forming.low, forming.close,
+                             forming.volume))
+        return pd.DataFrame(rows, columns=list(BAR_FIELDS))
+
+    def indicators(self, token: int) -> Dict[str, float]:
+        """Latest indicator values (as of the last closed bar) for token."""
+        with self._lock:
+            return dict(self._latest.get(token, {}))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the factory is usually a lambda; restore() takes it again
+        del state['_lock'], state['indicator_factory']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.indicator_factory = None
+
+    def snapshot(self, path: str) -> str:
+        """Write bars and indicator state to `path` (atomic replace)."""
+        tmp_path = path + '.tmp'
+        with self._lock:
+            payload = pickle.dumps({'saved_at': datetime.datetime.now(), 'bars': self},
+                                   protocol=pickle.HIGHEST_PROTOCOL)
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def restore(cls, path: str, indicators: Optional[Callable[[], object]] = None):
+        """Load a snapshot; returns (bars, saved_at). indicators: factory for tokens added later."""
+        # indicator state objects are instances of the shared streaming_indicators module
+        _load_shared('streaming_indicators')
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+        bars = payload['bars']
+        bars.indicator_factory = indicators
+        return bars, payload['saved_at']
+
+
+def backfill_gap(hist_client, bars: LiveBars, tokens: Optional[Iterable[int]] = None,
+                 until: Optional[datetime.datetime] = None, bucket=None) -> Dict[int, int]:
+    """
+    Fetch the candles each token missed (from its open bar to `until`) and merge them into
+    `bars`. bucket: optional order_gateway.TokenBucket pacing the historical API calls.
+    Returns {token: bars closed}; tokens whose fetch failed are logged and skipped.
+    """
+    until = until or datetime.datetime.now()
+    interval = HIST_INTERVALS[bars.minutes]
+    merged = {}
+    for token in (tokens if tokens is not None else bars.tokens()):
+        since = bars.gap_start(token)
+        if since is None or since >= until:
+            continue
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            df = hist_client.get_historical(token, since.strftime('%Y-%m-%d %H:%M:%S'),
+                                            until.strftime('%Y-%m-%d %H:%M:%S'), interval)
+        except Exception:
+            logger.exception('Backfill of %s from %s failed', token, since)
+            instrumentation.inc('backfill_errors_total')
+            continue
+        merged[token] = bars.merge_history(token, df, now=until)
+        instrumentation.inc('backfill_bars_total', merged[token])
+    return merged
@@ -0,0 +1,24 @@
+"""Access to python-tetst/instrumentation.py and trade_events.py from the live-trading modules.
+
+Each module is loaded once and registered under its own name in sys.modules, so the
+Flask app, KiteClient, OrderGateway and any backtest code running in the same process
+share one set of metrics and one trade event log.
+"""
+import importlib.util
+import pathlib
+import sys
+
+
+def _load_shared(name):
+    module = sys.modules.get(name)
+    if module is None:
+        path = pathlib.Path(__file__).resolve().parents[1] / 'python-tetst' / f'{name}.py'
+        spec = importlib.util.spec_from_file_location(name, str(path))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+instrumentation = _load_shared('instrumentation')
+trade_events = _load_shared('trade_events')
@@ -0,0 +1,255 @@
+"""Live option-chain snapshot service.
+
+OptionChainService resolves an underlying's option chain for one expiry from the
+instrument master (fetched once), subscribes every strike plus the underlying through
+KiteClient.start_ticker, and keeps a strike x (CE, PE) grid of LTP, OI and top-of-book.
+IV and Greeks are recomputed only for cells whose option price changed, or for the
+whole grid when the underlying moves, using the vectorized engine in
+python-tetst/option_greeks.py.
+
+start(sharded=True) streams through a SubscriptionManager instead: strikes near the money
+in FULL mode, the next band in QUOTE and the far wings in LTP, re-banded as the spot moves.
+"""
+import datetime
+import importlib.util
+import logging
+import pathlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from metrics import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Index tradingsymbols (NSE segment) of the F&O underlyings
+INDEX_SYMBOLS = {
+    'BANKNIFTY': 'NIFTY BANK',
+    'NIFTY': 'NIFTY 50',
+    'FINNIFTY': 'NIFTY FIN SERVICE',
+    'MIDCPNIFTY': 'NIFTY MID SELECT',
+}
+CE, PE = 0, 1
+GRID_FIELDS = ('ltp', 'oi', 'bid', 'ask', 'iv', 'delta', 'gamma', 'vega', 'theta')
+
+_option_greeks = None
+
+
+def _load_option_greeks():
+    """Load python-tetst/option_greeks.py dynamically (same approach as app._load_kite_hist)."""
+    global _option_greeks
+    if _option_greeks is None:
+        path = pathlib.Path(__file__).resolve().parents[1] / 'python-tetst' / 'option_greeks.py'
+        spec = importlib.util.spec_from_file_location('python_tetst.option_greeks', str(path))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _option_greeks = module
+    return _option_greeks
+
+
+def nearest_expiry(instruments: pd.DataFrame, name: str, on_date: Optional[datetime.date] = None):
+    opts = instruments[(instruments['name'].astype(str) == name)
+                       & instruments['instrument_type'].astype(str).isin(['CE', 'PE'])]
+    expiries = sorted(pd.to_datetime(opts['expiry'].dropna().unique()).date)
+    on_date = on_date or datetime.date.today()
+    for exp in expiries:
+        if exp >= on_date:
+            return exp
+    raise ValueError(f'No option expiry for {name} on or after {on_date}')
+
+
+class OptionChainService:
+    def __init__(self, kc, underlying: str, expiry: Optional[datetime.date] = None,
+                 underlying_token: Optional[int] = None, r: float = 0.065):
+        self.kc = kc
+        self.underlying = underlying
+        self.expiry = expiry
+        self.underlying_token = underlying_token
+        self.r = r
+        self.spot = np.nan
+        self.strikes = np.zeros(0)
+        self.grid: Dict[str, np.ndarray] = {}
+        self._token_cell: Dict[int, tuple] = {}
+        self._dirty = np.zeros((0, 2), dtype=bool)
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[['OptionChainService'], None]] = []
+        self.updated_at: Optional[datetime.datetime] = None
+        self.greeks_recomputed = 0
+        self.manager = None
+        self._mode_center: Optional[int] = None
+
+    def build(self, instruments: Optional[pd.DataFrame] = None) -> List[int]:
+        """Resolve chain tokens from the instrument master; returns all tokens to subscribe."""
+        if instruments is None:
+            instruments = self.kc.get_instruments_df()
+        if self.expiry is None:
+            self.expiry = nearest_expiry(instruments, self.underlying)
+        expiry = pd.to_datetime(instruments['expiry'], errors='coerce').dt.date
+        chain = instruments[(instruments['name'].astype(str) == self.underlying)
+                            & instruments['instrument_type'].astype(str).isin(['CE', 'PE'])
+                            & (expiry == self.expiry)]
+        if chain.empty:
+            raise ValueError(f'No {self.underlying} options for expiry {self.expiry}')
+        if self.underlying_token is None:
+            symbol = INDEX_SYMBOLS.get(self.underlying, self.underlying)
+            row = instruments[(instruments['exchange'].astype(str) == 'NSE')
+                              & (instruments['tradingsymbol'].astype(str) == symbol)]
+            if row.empty:
+                raise ValueError(f'Underlying {symbol} not found on NSE')
+            self.underlying_token = int(row.iloc[0]['instrument_token'])
+        self.strikes = np.sort(chain['strike'].astype(float).unique())
+        n = len(self.strikes)
+        self.grid = {f: np.full((n, 2), np.nan) for f in GRID_FIELDS}
+        self._dirty = np.zeros((n, 2), dtype=bool)
+        pos = np.searchsorted(self.strikes, chain['strike'].astype(float).to_numpy())
+        sides = np.where(chain['instrument_type'].astype(str).to_numpy() == 'CE', CE, PE)
+        self._token_cell = {int(t): (int(i), int(s))
+                            for t, i, s in zip(chain['instrument_token'], pos, sides)}
+        logger.info('Option chain %s %s: %d strikes, %d contracts', self.underlying, self.expiry, n, len(chain))
+        return [self.underlying_token] + list(self._token_cell)
+
+    def start(self, instruments: Optional[pd.DataFrame] = None, threaded: bool = True, sharded: bool = False,
+              full_strikes: int = 5, quote_strikes: int = 15, connect_timeout: Optional[float] = None):
+        """
+        Subscribe the chain. sharded=True streams through this service's own SubscriptionManager
+        connections; otherwise through the client's single ticker (KiteClient.start_ticker).
+        connect_timeout: wait up to this many seconds for the first connection (threaded only)
+        and raise RuntimeError, with the connections closed, if none is made.
+        """
+        tokens = self.build(instruments)
+        if not sharded:
+            self.kc.start_ticker(self.on_tick, tokens, threaded=threaded)
+        else:
+            self.full_strikes = full_strikes
+            self.quote_strikes = quote_strikes
+            self.manager = self.kc.subscription_manager(self.on_tick)
+            self._update_modes()
+            self.manager.start(threaded=threaded)
+        if connect_timeout is not None and threaded:
+            deadline = time.monotonic() + connect_timeout
+            while not self.connected():
+                if time.monotonic() >= deadline:
+                    self.stop()
+                    raise RuntimeError(f'Option chain {self.underlying}: ticker did not connect '
+                                       f'within {connect_timeout:g}s')
+                time.sleep(0.1)
+
+    def connected(self) -> bool:
+        """True once at least one of the service's ticker connections is up."""
+        if self.manager is not None:
+            return any(s['connected'] for s in self.manager.stats())
+        ticker = self.kc.ticker
+        return ticker is not None and bool(ticker.is_connected())
+
+    def stop(self) -> None:
+        if self.manager is not None:
+            self.manager.stop()
+        else:
+            self.kc.stop_ticker()
+
+    def subscription_modes(self, full_strikes: int = 5, quote_strikes: int = 15) -> Dict[int, str]:
+        """
+        Ticker mode per token: FULL for the `full_strikes` strikes on each side of the spot,
+        QUOTE for the next `quote_strikes`, LTP beyond (only the price is needed there).
+        """
+        from subscription_manager import MODE_FULL, MODE_LTP, MODE_QUOTE
+        center = self._atm_index()
+        modes = {self.underlying_token: MODE_FULL}
+        for token, (i, _) in self._token_cell.items():
+            distance = abs(i - center)
+            modes[token] = MODE_FULL if distance <= full_strikes else (
+                MODE_QUOTE if distance <= full_strikes + quote_strikes else MODE_LTP)
+        return modes
+
+    def _atm_index(self) -> int:
+        if np.isnan(self.spot) or not len(self.strikes):
+            return len(self.strikes) // 2
+        return int(np.argmin(np.abs(self.strikes - self.spot)))
+
+    def _update_modes(self) -> None:
+        center = self._atm_index()
+        if self.manager is None or center == self._mode_center:
+            return
+        self._mode_center = center
+        self.manager.set_modes(self.subscription_modes(self.full_strikes, self.quote_strikes))
+
+    def add_listener(self, callback: Callable[['OptionChainService'], None]) -> None:
+        """callback(service) runs after each Greeks refresh; strategies read service.grid / snapshot()."""
+        self._listeners.append(callback)
+
+    def on_tick(self, tick: Dict) -> None:
+        token = tick.get('instrument_token')
+        with self._lock:
+            if token == self.underlying_token:
+                ltp = tick.get('last_price')
+                if ltp is not None and ltp != self.spot:
+                    self.spot = float(ltp)
+                    self._dirty[:] = True
+                return
+            cell = self._token_cell.get(token)
+            if cell is None:
+                return
+            ltp = tick.get('last_price')
+            if ltp is not None and ltp != self.grid['ltp'][cell]:
+                self.grid['ltp'][cell] = ltp
+                self._dirty[cell] = True
+            if tick.get('oi') is not None:
+                self.grid['oi'][cell] = tick['oi']
+            depth = tick.get('depth')
+            if depth:
+                buy = (depth.get('buy') or [{}])[0]
+                sell = (depth.get('sell') or [{}])[0]
+                self.grid['bid'][cell] = buy.get('price', np.nan)
+                self.grid['ask'][cell] = sell.get('price', np.nan)
+            self.updated_at = datetime.datetime.now()
+
+    def refresh_greeks(self, now: Optional[datetime.datetime] = None) -> int:
+        """Recompute IV/Greeks for dirty cells only. Returns the number of cells recomputed."""
+        og = _load_option_greeks()
+        with self._lock:
+            if not self._dirty.any() or np.isnan(self.spot):
+                return 0
+            rows, cols = np.nonzero(self._dirty)
+            price = self.grid['ltp'][rows, cols]
+            self._dirty[rows, cols] = False
+            spot = self.spot
+        now = now or datetime.datetime.now()
+        with instrumentation.timer('greeks_refresh_seconds'):
+            expiry_ts = pd.Timestamp(f'{self.expiry} {og.MARKET_CLOSE}')
+            T = og.years_to_expiry(np.array([np.datetime64(now, 'ns')]), expiry_ts)[0]
+            K = self.strikes[rows]
+            is_call = cols == CE
+            iv = og.implied_vol(price, spot, K, T, is_call, self.r)
+            g = og.greeks(spot, K, T, iv, is_call, self.r)
+        with self._lock:
+            self.grid['iv'][rows, cols] = iv
+            for name in ('delta', 'gamma', 'vega', 'theta'):
+                self.grid[name][rows, cols] = g[name]
+        self.greeks_recomputed += len(rows)
+        self._update_modes()
+        for cb in self._listeners:
+            try:
+                cb(self)
+            except Exception:
+                logger.exception('Error in option chain listener')
+        return len(rows)
+
+    def snapshot(self) -> Dict:
+        """Chain as plain JSON-able data, with Greeks brought up to date first."""
+        self.refresh_greeks()
+        with self._lock:
+            def cell(i, side):
+                return {f: (None if np.isnan(self.grid[f][i, side]) else float(self.grid[f][i, side]))
+                        for f in GRID_FIELDS}
+            rows = [{'strike': float(k), 'CE': cell(i, CE), 'PE': cell(i, PE)}
+                    for i, k in enumerate(self.strikes)]
+            return {
+                'underlying': self.underlying,
+                'expiry': str(self.expiry),
+                'spot': None if np.isnan(self.spot) else self.spot,
+                'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+                'chain': rows,
+            }
@@ -0,0 +1,218 @@
+"""Rate-limited, concurrent order gateway on top of KiteClient.
+
+Order intents are queued and released by a token bucket sized to the broker's order
+rate limit (Kite: 10 orders/second), then sent concurrently from a small thread pool
+over KiteConnect's pooled HTTP session. Each intent gets a Future that resolves with
+the broker response, so callers can fire all legs of a multi-leg entry at once and
+collect the acks afterwards. Submit-to-ack latency is recorded in a histogram.
+"""
+import bisect
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from metrics import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Kite Connect order placement limit
+KITE_ORDERS_PER_SECOND = 10
+
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `burst` stored."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram in milliseconds."""
+
+    def __init__(self, buckets_ms: List[float] = LATENCY_BUCKETS_MS):
+        self.buckets = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, ms: float) -> None:
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+            self.count += 1
+            self.total += ms
+            self.max = max(self.max, ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound of the bucket holding the p-th percentile, capped at the observed max."""
+        with self.lock:
+            if self.count == 0:
+                return None
+            rank = p / 100.0 * self.count
+            seen = 0
+            for i, c in enumerate(self.counts):
+                seen += c
+                if seen >= rank and c:
+                    return min(float(self.buckets[i]), self.max) if i < len(self.buckets) else self.max
+            return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max,
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['inf'], self.counts)),
+        }
+
+
+class OrderIntent:
+    def __init__(self, intent_id: int, action: str, params: Dict):
+        self.intent_id = intent_id
+        self.action = action
+        self.params = params
+        self.future: Future = Future()
+        self.submitted_at = time.perf_counter()
+        self.acked_at: Optional[float] = None
+
+    def latency_ms(self) -> Optional[float]:
+        if self.acked_at is None:
+            return None
+        return (self.acked_at - self.submitted_at) * 1000.0
+
+
+class OrderGateway:
+    """
+    Queue order intents and send them to `broker` under a token-bucket rate limit.
+
+    broker: object with place_order/modify_order/cancel_order, normally a KiteClient
+    (a fake broker with the same methods works for offline testing).
+    """
+
+    ACTIONS = ('place_order', 'modify_order', 'cancel_order')
+
+    def __init__(self, broker, orders_per_second: float = KITE_ORDERS_PER_SECOND,
+                 burst: Optional[int] = None, max_workers: int = 8,
+                 on_ack: Optional[Callable[[OrderIntent], None]] = None):
+        self.broker = broker
+        self.bucket = TokenBucket(orders_per_second, burst)
+        self.latency = LatencyHistogram()
+        self.on_ack = on_ack
+        self.errors = 0
+        self._errors_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._queue: 'queue.Queue[Optional[OrderIntent]]' = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='order-gw')
+        self._dispatcher = threading.Thread(target=self._dispatch, name='order-gw-dispatch', daemon=True)
+        self._closed = False
+        self._dispatcher.start()
+
+    # Public API
+    def submit(self, action: str, **params) -> OrderIntent:
+        if action not in self.ACTIONS:
+            raise ValueError(f'Unknown order action: {action}')
+        if self._closed:
+            raise RuntimeError('Order gateway is closed')
+        intent = OrderIntent(next(self._ids), action, params)
+        self._queue.put(intent)
+        return intent
+
+    def place_order(self, **params) -> OrderIntent:
+        return self.submit('place_order', **params)
+
+    def modify_order(self, order_id, quantity: Optional[int] = None, price: Optional[float] = None) -> OrderIntent:
+        return self.submit('modify_order', order_id=order_id, quantity=quantity, price=price)
+
+    def cancel_order(self, order_id) -> OrderIntent:
+        return self.submit('cancel_order', order_id=order_id)
+
+    def place_legs(self, legs: List[Dict]) -> List[OrderIntent]:
+        """Queue all legs of a multi-leg entry back to back so they go out together."""
+        return [self.place_order(**leg) for leg in legs]
+
+    @staticmethod
+    def wait_all(intents: List[OrderIntent], timeout: Optional[float] = None) -> List:
+        """Block until every intent is acked; returns responses (or exceptions) in order."""
+        out = []
+        for intent in intents:
+            try:
+                out.append(intent.future.result(timeout=timeout))
+            except Exception as e:
+                out.append(e)
+        return out
+
+    def stats(self) -> Dict:
+        snap = self.latency.snapshot()
+        snap['errors'] = self.errors
+        snap['queued'] = self._queue.qsize()
+        return snap
+
+    def close(self, wait: bool = True) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        if wait:
+            self._dispatcher.join()
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Internals
+    def _dispatch(self) -> None:
+        while True:
+            intent = self._queue.get()
+            if intent is None:
+                break
+            self.bucket.acquire()
+            self._pool.submit(self._send, intent)
+
+    def _send(self, intent: OrderIntent) -> None:
+        resp, error = None, None
+        try:
+            resp = getattr(self.broker, intent.action)(**intent.params)
+        except Exception as e:
+            error = e
+        intent.acked_at = time.perf_counter()
+        self.latency.record(intent.latency_ms())
+        instrumentation.observe('order_ack_seconds', intent.latency_ms() / 1000.0, action=intent.action)
+        if error is not None:
+            with self._errors_lock:
+                self.errors += 1
+            logger.error('Order intent %d (%s) failed: %s', intent.intent_id, intent.action, error)
+            intent.future.set_exception(error)
+        else:
+            intent.future.set_result(resp)
+        if self.on_ack is not None:
+            try:
+                self.on_ack(intent)
+            except Exception:
+                logger.exception('Error in on_ack')
@@ -0,0 +1,290 @@
+"""Sharded KiteTicker subscriptions for large instrument universes.
+
+SubscriptionManager spreads instrument tokens over up to MAX_CONNECTIONS KiteTicker
+connections of at most MAX_TOKENS_PER_CONNECTION tokens each. New tokens go to the shard
+with the least streaming load, weighted by the packet size of their mode, so FULL tokens
+do not pile up on one socket. A token stays on its shard until it is unsubscribed.
+
+subscribe / unsubscribe / set_mode only change the desired state; each shard sends the
+difference between desired and applied state when it is connected. After a reconnect
+KiteTicker itself replays the subscriptions it had, so the shard then sends only what
+changed while it was down.
+
+Ticks from all shards go through one queue and are delivered to on_tick by a single
+dispatcher thread, in arrival order, so the callback never runs concurrently.
+
+    manager = kc.subscription_manager(on_tick)
+    manager.subscribe(chain_tokens, MODE_LTP)
+    manager.set_mode(near_atm_tokens, MODE_FULL)
+    manager.start()
+"""
+import itertools
+import logging
+import queue
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+from metrics import instrumentation
+
+logger = logging.getLogger(__name__)
+
+MODE_LTP, MODE_QUOTE, MODE_FULL = 'ltp', 'quote', 'full'
+# Bytes per tick packet in each mode; used as the load weight of a subscription
+MODE_WEIGHT = {MODE_LTP: 8, MODE_QUOTE: 44, MODE_FULL: 184}
+MAX_TOKENS_PER_CONNECTION = 3000
+MAX_CONNECTIONS = 3
+
+_STOP = object()
+
+
+class _Shard:
+    def __init__(self, index: int, ticker, manager: 'SubscriptionManager'):
+        self.index = index
+        self.ticker = ticker
+        self.manager = manager
+        self.desired: Dict[int, str] = {}
+        self.applied: Dict[int, str] = {}
+        self.connected = False
+        self.load = 0           # sum of MODE_WEIGHT over desired tokens
+        ticker.on_ticks = self._on_ticks
+        ticker.on_connect = self._on_connect
+        ticker.on_close = self._on_close
+        ticker.on_error = self._on_error
+
+    def want(self, token: int, mode: str) -> None:
+        old = self.desired.get(token)
+        self.load += MODE_WEIGHT[mode] - (MODE_WEIGHT[old] if old else 0)
+        self.desired[token] = mode
+
+    def drop(self, token: int) -> None:
+        old = self.desired.pop(token, None)
+        if old:
+            self.load -= MODE_WEIGHT[old]
+
+    def _on_ticks(self, ws, ticks):
+        self.manager._enqueue(self.index, ticks)
+
+    def _on_connect(self, ws, response):
+        with self.manager._lock:
+            # on a reconnect KiteTicker has already resubscribed its own token/mode table
+            self.applied = dict(getattr(self.ticker, 'subscribed_tokens', None) or {})
+            if self.applied:
+                logger.info('Ticker shard %d reconnected with %d tokens', self.index, len(self.applied))
+            self.connected = True
+            self.sync()
+
+    def _on_close(self, ws, code, reason):
+        logger.info('Ticker shard %d closed: %s %s', self.index, code, reason)
+        with self.manager._lock:
+            self.connected = False
+
+    def _on_error(self, ws, code, reason):
+        logger.error('Ticker shard %d error: %s %s', self.index, code, reason)
+
+    def sync(self) -> int:
+        """Send the desired/applied difference (caller holds the manager lock). Returns messages sent."""
+        if not self.connected:
+            return 0
+        removed = [t for t in self.applied if t not in self.desired]
+        added = [t for t in self.desired if t not in self.applied]
+        by_mode: Dict[str, List[int]] = {}
+        for token, mode in self.desired.items():
+            if self.applied.get(token) != mode:
+                by_mode.setdefault(mode, []).append(token)
+        sent = 0
+        try:
+            if removed:
+                self.ticker.unsubscribe(removed)
+                sent += 1
+            if added:
+                self.ticker.subscribe(added)
+                sent += 1
+            for mode, tokens in by_mode.items():
+                self.ticker.set_mode(mode, tokens)
+                sent += 1
+        except Exception:
+            # the socket went away mid-sync; the next on_connect sends the rest
+            logger.exception('Ticker shard %d: subscription update failed', self.index)
+            return sent
+        for token in removed:
+            self.applied.pop(token, None)
+        self.applied.update(self.desired)
+        if sent:
+            instrumentation.inc('subscription_updates_total', sent, shard=self.index)
+        return sent
+
+
+class SubscriptionManager:
+    """
+    ticker_factory() returns a new, unconnected KiteTicker (KiteClient.subscription_manager
+    passes one bound to the session). recorder: optional tick_journal.TickRecorder.
+    max_load_per_connection: packet bytes per tick round a connection takes before another
+    connection is opened (default: a quarter of its token limit in FULL mode).
+    """
+
+    def __init__(self, ticker_factory: Callable[[], object], on_tick: Callable[[Dict], None],
+                 max_tokens_per_connection: int = MAX_TOKENS_PER_CONNECTION,
+                 max_connections: int = MAX_CONNECTIONS, max_load_per_connection: Optional[int] = None,
+                 recorder=None):
+        self.ticker_factory = ticker_factory
+        self.on_tick = on_tick
+        self.max_tokens_per_connection = max_tokens_per_connection
+        self.max_connections = max_connections
+        self.max_load_per_connection = max_load_per_connection or (
+            max_tokens_per_connection * MODE_WEIGHT[MODE_FULL] // 4)
+        self.recorder = recorder
+        self.shards: List[_Shard] = []
+        self._token_shard: Dict[int, _Shard] = {}
+        self._lock = threading.RLock()
+        self._queue: queue.Queue = queue.Queue()
+        self._seq = itertools.count()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._started = False
+
+    # Subscription state
+
+    def _place(self, mode: str) -> _Shard:
+        """Least loaded shard with room; a new connection once the open ones reach max_load_per_connection."""
+        open_shards = [s for s in self.shards if len(s.desired) < self.max_tokens_per_connection]
+        fits = [s for s in open_shards if s.load + MODE_WEIGHT[mode] <= self.max_load_per_connection]
+        if fits:
+            return min(fits, key=lambda s: (s.load, len(s.desired)))
+        if len(self.shards) < self.max_connections:
+            shard = _Shard(len(self.shards), self.ticker_factory(), self)
+            self.shards.append(shard)
+            if self._started:
+                self._connect(shard)
+            return shard
+        if open_shards:
+            return min(open_shards, key=lambda s: (s.load, len(s.desired)))
+        raise ValueError(f'Subscription limit reached: {self.max_connections} connections x '
+                         f'{self.max_tokens_per_connection} tokens')
+
+    def _check_capacity(self, tokens) -> None:
+        """Raise before any state changes if the new tokens among `tokens` cannot all be placed."""
+        new = {int(t) for t in tokens} - self._token_shard.keys()
+        room = self.max_connections * self.max_tokens_per_connection - len(self._token_shard)
+        if len(new) > room:
+            raise ValueError(f'Subscription limit reached: {self.max_connections} connections x '
+                             f'{self.max_tokens_per_connection} tokens ({len(new)} new, room for {room})')
+
+    def subscribe(self, tokens: Iterable[int], mode: str = MODE_FULL) -> None:
+        """Subscribe tokens (already subscribed ones just change mode). All or nothing at the limit."""
+        if mode not in MODE_WEIGHT:
+            raise ValueError(f'Unknown ticker mode: {mode}')
+        tokens = [int(t) for t in tokens]
+        with self._lock:
+            self._check_capacity(tokens)
+            touched = set()
+            for token in tokens:
+                shard = self._token_shard.get(token)
+                if shard is None:
+                    shard = self._token_shard[token] = self._place(mode)
+                shard.want(token, mode)
+                touched.add(shard)
+            for shard in touched:
+                shard.sync()
+
+    def unsubscribe(self, tokens: Iterable[int]) -> None:
+        with self._lock:
+            touched = set()
+            for token in tokens:
+                shard = self._token_shard.pop(int(token), None)
+                if shard is not None:
+                    shard.drop(int(token))
+                    touched.add(shard)
+            for shard in touched:
+                shard.sync()
+
+    def set_mode(self, tokens: Iterable[int], mode: str) -> None:
+        """Change the mode of subscribed tokens; unknown tokens are ignored."""
+        if mode not in MODE_WEIGHT:
+            raise ValueError(f'Unknown ticker mode: {mode}')
+        with self._lock:
+            touched = set()
+            for token in tokens:
+                shard = self._token_shard.get(int(token))
+                if shard is not None:
+                    shard.want(int(token), mode)
+                    touched.add(shard)
+            for shard in touched:
+                shard.sync()
+
+    def set_modes(self, modes: Dict[int, str]) -> None:
+        """Apply {token: mode} in one pass, subscribing tokens that are not subscribed yet."""
+        grouped: Dict[str, List[int]] = {}
+        for token, mode in modes.items():
+            grouped.setdefault(mode, []).append(token)
+        with self._lock:
+            self._check_capacity(modes)
+            for mode, tokens in grouped.items():
+                self.subscribe(tokens, mode)
+
+    def subscriptions(self) -> Dict[int, str]:
+        with self._lock:
+            return {t: s.desired[t] for t, s in self._token_shard.items()}
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [{'shard': s.index, 'connected': s.connected, 'tokens': len(s.desired),
+                     'pending': sum(1 for t, m in s.desired.items() if s.applied.get(t) != m)
+                     + sum(1 for t in s.applied if t not in s.desired),
+                     'load_bytes': s.load} for s in self.shards]
+
+    # Connections and dispatch
+
+    def _connect(self, shard: _Shard) -> None:
+        try:
+            # every shard runs on the shared twisted reactor thread
+            shard.ticker.connect(threaded=True)
+        except Exception:
+            logger.exception('Failed to start ticker shard %d', shard.index)
+
+    def start(self, threaded: bool = True) -> None:
+        """Connect every shard and start the dispatcher. threaded=False blocks in the dispatcher."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            shards = list(self.shards)
+        for shard in shards:
+            self._connect(shard)
+        if threaded:
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name='tick-dispatch', daemon=True)
+            self._dispatcher.start()
+        else:
+            self._dispatch_loop()
+
+    def stop(self) -> None:
+        with self._lock:
+            shards = list(self.shards)
+            self._started = False
+        for shard in shards:
+            try:
+                shard.ticker.close()
+            except Exception:
+                logger.exception('Failed to close ticker shard %d', shard.index)
+        self._queue.put(_STOP)
+        if self._dispatcher is not None and self._dispatcher is not threading.current_thread():
+            self._dispatcher.join(timeout=5)
+            self._dispatcher = None
+
+    def _enqueue(self, shard_index: int, ticks) -> None:
+        self._queue.put((next(self._seq), shard_index, ticks))
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            _, shard_index, ticks = item
+            with instrumentation.timer('tick_dispatch_seconds'):
+                for t in ticks:
+                    if self.recorder is not None:
+                        self.recorder.record(t)
+                    try:
+                        self.on_tick(t)
+                    except Exception:
+                        logger.exception('Error in on_tick')
+            instrumentation.inc('ticks_total', len(ticks))
+            instrumentation.inc('shard_ticks_total', len(ticks), shard=shard_index)
@@ -0,0 +1,180 @@
+"""Pre-market warm start of live bar and indicator state.
+
+warm_start() seeds a LiveBars (see live_bars.py) for every subscribed token before the
+open, so the EMA200 filter and the other indicators are meaningful from the first live bar:
+
+1. If a snapshot from the same session exists, it is restored (bars and indicator state in
+   one unpickle) and only the minutes since the snapshot are backfilled.
+2. Otherwise each token's bars come from the local HistoryCache; get_historical is called
+   only for the range the cache does not cover yet, paced at the API limit. Cache reads
+   and fetches run in a thread pool over the whole universe.
+3. The cached bars are merged into LiveBars in one chunk per token and the state is
+   snapshotted, so a restart during the session comes back in milliseconds.
+
+    bars = LiveBars(indicators=strategy_indicators())
+    bars = warm_start(bars, tokens, hist_client, snapshot_path='live_state.pkl')
+    kc.start_ticker(on_tick, tokens, bars=bars, hist_client=hist_client)
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from live_bars import BAR_FIELDS, HIST_INTERVALS, HIST_REQUESTS_PER_SECOND, LiveBars, backfill_gap
+from metrics import instrumentation
+from order_gateway import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history_cache')
+# Kite serves at most 60 days of minute candles per request
+MAX_DAYS_PER_REQUEST = {'minute': 60, '3minute': 100, '5minute': 100, '10minute': 100,
+                        '15minute': 200, '30minute': 200, '60minute': 400}
+
+
+class HistoryCache:
+    """
+    Per-token candle files <directory>/<interval>/<token>.npz (date as int64 ns, OHLCV as
+    float64). Files are replaced atomically, so a crash never leaves a torn cache entry.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, interval: str = 'minute'):
+        self.directory = os.path.join(directory, interval)
+        self.interval = interval
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, token: int) -> str:
+        return os.path.join(self.directory, f'{int(token)}.npz')
+
+    def load(self, token: int) -> pd.DataFrame:
+        path = self._path(token)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=list(BAR_FIELDS))
+        with np.load(path) as data:
+            df = pd.DataFrame({f: data[f] for f in BAR_FIELDS[1:]})
+            df.insert(0, 'date', pd.to_datetime(data['date'], unit='ns'))
+        return df
+
+    def save(self, token: int, df: pd.DataFrame) -> None:
+        tmp_path = self._path(token) + '.tmp.npz'
+        dates = pd.to_datetime(df['date'])
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        arrays = {f: df[f].to_numpy(dtype=float) if f in df.columns else np.zeros(len(df))
+                  for f in BAR_FIELDS[1:]}
+        np.savez(tmp_path, date=dates.to_numpy(dtype='datetime64[ns]').astype(np.int64), **arrays)
+        os.replace(tmp_path, self._path(token))
+
+    def extend(self, token: int, cached: pd.DataFrame, fetched: pd.DataFrame, keep_from) -> pd.DataFrame:
+        """Cached + fetched candles (fetched wins on overlap) from keep_from on; saved and returned."""
+        if fetched is None or fetched.empty:
+            return cached
+        fetched = fetched[[c for c in BAR_FIELDS if c in fetched.columns]].copy()
+        fetched['date'] = pd.to_datetime(fetched['date'])
+        if fetched['date'].dt.tz is not None:
+            fetched['date'] = fetched['date'].dt.tz_localize(None)
+        df = pd.concat([cached, fetched], ignore_index=True) if len(cached) else fetched
+        df = df.drop_duplicates('date', keep='last').sort_values('date')
+        df = df[df['date'] >= keep_from].reset_index(drop=True)
+        self.save(token, df)
+        return df
+
+
+def _fetch(hist_client, token, since, until, interval, bucket) -> pd.DataFrame:
+    """get_historical over [since, until] in pieces within the per-request day limit."""
+    step = datetime.timedelta(days=MAX_DAYS_PER_REQUEST.get(interval, 60))
+    frames = []
+    start = since
+    while start < until:
+        end = min(start + step, until)
+        bucket.acquire()
+        df = hist_client.get_historical(token, start.strftime('%Y-%m-%d %H:%M:%S'),
+                                        end.strftime('%Y-%m-%d %H:%M:%S'), interval)
+        instrumentation.inc('warm_start_fetches_total')
+        if df is not None and not df.empty:
+            frames.append(df)
+        start = end
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _history(token, cache, hist_client, now, lookback, bucket, refresh_after):
+    cached = cache.load(token)
+    keep_from = now - lookback
+    if len(cached):
+        # the last cached candle may have been in progress when it was fetched
+        since = max(cached['date'].iloc[-1].to_pydatetime(), keep_from)
+    else:
+        since = keep_from
+    if hist_client is None or now - since <= refresh_after:
+        return token, cached[cached['date'] >= keep_from]
+    try:
+        fetched = _fetch(hist_client, token, since, now, cache.interval, bucket)
+    except Exception:
+        logger.exception('History fetch for %s failed; warming from the cache only', token)
+        instrumentation.inc('warm_start_errors_total')
+        return token, cached[cached['date'] >= keep_from]
+    return token, cache.extend(token, cached, fetched, keep_from)
+
+
+def warm_start(bars: LiveBars, tokens: Iterable[int], hist_client=None, cache_dir: str = DEFAULT_CACHE_DIR,
+               snapshot_path: Optional[str] = None, lookback_days: int = 7, workers: int = 8,
+               now: Optional[datetime.datetime] = None) -> LiveBars:
+    """
+    Seed `bars` for `tokens` and return the LiveBars to use (a restored snapshot replaces
+    `bars` when one from today covers every token). hist_client=None warms from the cache only.
+    """
+    started = time.perf_counter()
+    now = now or datetime.datetime.now()
+    tokens = [int(t) for t in tokens]
+    bucket = TokenBucket(HIST_REQUESTS_PER_SECOND)
+
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            restored, saved_at = LiveBars.restore(snapshot_path, bars.indicator_factory)
+        except Exception:
+            logger.exception('Could not read state snapshot %s; warming from history', snapshot_path)
+        else:
+            if (saved_at.date() == now.date() and restored.minutes == bars.minutes
+                    and set(tokens) <= set(restored.tokens())):
+                if hist_client is not None:
+                    backfill_gap(hist_client, restored, tokens, until=now, bucket=bucket)
+                logger.info('Restored live state for %d tokens from %s (saved %s)', len(tokens), snapshot_path, saved_at)
+                instrumentation.observe('warm_start_seconds', time.perf_counter() - started, source='snapshot')
+                return restored
+
+    cache = HistoryCache(cache_dir, HIST_INTERVALS[bars.minutes])
+    lookback = datetime.timedelta(days=lookback_days)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(
+            lambda t: _history(t, cache, hist_client, now, lookback, bucket, bars.step), tokens))
+    seeded = 0
+    for token, df in results:
+        if len(df):
+            seeded += bars.merge_history(token, df, now=now)
+    logger.info('Warm start: %d bars over %d tokens in %.2fs', seeded, len(tokens), time.perf_counter() - started)
+    if snapshot_path:
+        bars.snapshot(snapshot_path)
+    instrumentation.observe('warm_start_seconds', time.perf_counter() - started, source='history')
+    return bars
+
+
+def snapshot_every(bars: LiveBars, path: str, interval_s: float = 60.0):
+    """Start a daemon thread that snapshots `bars` every interval_s seconds; returns the thread."""
+
+    def _loop():
+        while True:
+            time.sleep(interval_s)
+            try:
+                bars.snapshot(path)
+            except Exception:
+                logger.exception('State snapshot to %s failed', path)
+
+    thread = threading.Thread(target=_loop, name='live-state-snapshot', daemon=True)
+    thread.start()
+    return thread
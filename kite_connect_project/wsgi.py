@@ -0,0 +1,14 @@
+"""WSGI entry point for production serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Importing this module runs app.preload(), so with preload_app (see gunicorn.conf.py) the
+instrument index and kite-testing modules are loaded once in the master and shared
+copy-on-write by every forked worker. The Kite and historical clients are dropped in each
+worker after the fork (post_fork), so workers never share the master's HTTP connections.
+Any other WSGI server can serve `application` the same way.
+"""
+from app import app, preload
+
+preload()
+application = app
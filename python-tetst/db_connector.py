@@ -1,19 +1,147 @@
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import pymysql
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+
+import instrumentation
+from run_journal import content_hash
+from table_dtypes import optimize_table_dtypes
 
 class DBConnector:
+    """
+    Reads the per-day market_data tables.
+
+    Optional config keys:
+      url: full SQLAlchemy URL (e.g. a SQLite file) instead of user/password/host/database
+      pool_size, max_overflow, pool_recycle: connection pool settings
+      prefetch_tables: number of tables read ahead in background threads by iter_tables (0 = off)
+      prefetch_memory_mb: cap on memory held by tables read ahead but not yet consumed
+      stream_threshold_rows: tables with more rows are read through a server-side cursor
+      stream_chunksize: rows fetched per chunk when streaming
+      price_dtype: dtype for price columns after loading, 'float64' (default) or 'float32';
+        float32 halves memory but can change PnL and flip target/stop comparisons at the
+        thresholds, so it is opt-in. None keeps pandas' defaults
+    """
+
     def __init__(self, config):
         self.config = config
-        self.engine = create_engine(
+        self.prefetch_tables = int(config.get('prefetch_tables', 0))
+        self.prefetch_memory_mb = float(config.get('prefetch_memory_mb', 2048))
+        self.stream_threshold_rows = int(config.get('stream_threshold_rows', 500000))
+        self.stream_chunksize = int(config.get('stream_chunksize', 50000))
+        self.price_dtype = config.get('price_dtype', 'float64')
+        url = config.get('url') or (
             f"mysql+pymysql://{config['user']}:{config['password']}@{config['host']}/{config['database']}"
         )
+        engine_kwargs = {'pool_pre_ping': True}
+        if make_url(url).get_backend_name() != 'sqlite':
+            # One pooled connection per prefetch worker plus the caller
+            engine_kwargs.update(
+                pool_size=int(config.get('pool_size', max(5, self.prefetch_tables + 1))),
+                max_overflow=int(config.get('max_overflow', 5)),
+                pool_recycle=int(config.get('pool_recycle', 3600)),
+            )
+        self.engine = create_engine(url, **engine_kwargs)
 
-    def get_tables(self):
+    def list_tables(self):
+        if self.engine.dialect.name == 'mysql':
+            with self.engine.connect() as conn:
+                tables = [t[0] for t in conn.execute(text("SHOW TABLES")).fetchall()]
+        else:
+            tables = inspect(self.engine).get_table_names()
+        if not tables:
+            raise Exception("No tables found in the database.")
+        return tables
+
+    def count_rows(self, name):
         with self.engine.connect() as conn:
-            tables = conn.execute(text("SHOW TABLES")).fetchall()
-            if not tables:
-                raise Exception("No tables found in the database.")
-            table_names = [t[0] for t in tables]
-            dfs = [pd.read_sql(f"SELECT * FROM `{name}`", conn) for name in table_names]
+            return int(conn.execute(text(f"SELECT COUNT(*) FROM `{name}`")).scalar())
+
+    def table_fingerprint(self, name):
+        """Cheap change marker for a table (row count and columns) that does not read the data."""
+        columns = ','.join(c['name'] for c in inspect(self.engine).get_columns(name))
+        return f"{self.count_rows(name)}:{hashlib.sha1(columns.encode('utf-8')).hexdigest()[:12]}"
+
+    def table_checksum(self, name):
+        """Content signature of a table: MySQL's CHECKSUM TABLE, else a hash of its loaded values."""
+        if self.engine.dialect.name == 'mysql':
+            with self.engine.connect() as conn:
+                row = conn.execute(text(f"CHECKSUM TABLE `{name}`")).fetchone()
+            if row is not None and row[1] is not None:
+                return f"mysql:{row[1]}"
+        return content_hash(self.read_table(name))
+
+    def read_table(self, name, columns=None):
+        """Whole table, or only `columns` (those the table has) when given."""
+        with instrumentation.timer('data_load_seconds', source='db'):
+            df = self._read_table(name, columns)
+        instrumentation.inc('rows_loaded_total', len(df), source='db')
+        return df
+
+    def _read_table(self, name, columns=None):
+        select = '*'
+        if columns is not None:
+            existing = {c['name'] for c in inspect(self.engine).get_columns(name)}
+            columns = [c for c in columns if c in existing]
+            if not columns:
+                return pd.DataFrame()
+            select = ', '.join(f"`{c}`" for c in columns)
+        query = f"SELECT {select} FROM `{name}`"
+        if self.count_rows(name) <= self.stream_threshold_rows:
+            with self.engine.connect() as conn:
+                df = pd.read_sql(query, conn)
+            return optimize_table_dtypes(df, self.price_dtype)
+        # Very large table: server-side cursor, fetched in chunks; prices are narrowed per chunk
+        # to keep the peak low, categoricals once the chunks are joined
+        with self.engine.connect().execution_options(stream_results=True) as conn:
+            chunks = [
+                optimize_table_dtypes(chunk, self.price_dtype, categorical=False)
+                for chunk in pd.read_sql(query, conn, chunksize=self.stream_chunksize)
+            ]
+        if not chunks:
+            return pd.DataFrame()
+        return optimize_table_dtypes(pd.concat(chunks, ignore_index=True), self.price_dtype)
+
+    def iter_tables(self, table_names=None, prefetch=None):
+        """
+        Yield (table_name, DataFrame) in order. With prefetch > 0 a thread pool reads the next
+        tables while the caller processes the current one, holding at most prefetch_memory_mb
+        of read-ahead data (at least one table is always in flight).
+        """
+        names = list(table_names) if table_names is not None else self.list_tables()
+        prefetch = self.prefetch_tables if prefetch is None else int(prefetch)
+        if prefetch <= 0:
+            for name in names:
+                yield name, self.read_table(name)
+            return
+
+        budget = self.prefetch_memory_mb * 1024 * 1024
+        avg_bytes = 0.0
+        loaded = 0
+        pending = deque()
+        next_i = 0
+        with ThreadPoolExecutor(max_workers=prefetch) as pool:
+            while next_i < len(names) or pending:
+                while next_i < len(names) and len(pending) < prefetch:
+                    held = sum(
+                        f.result().memory_usage(deep=False).sum() if f.done() else avg_bytes
+                        for _, f in pending
+                    )
+                    if pending and held + avg_bytes > budget:
+                        break
+                    pending.append((names[next_i], pool.submit(self.read_table, names[next_i])))
+                    next_i += 1
+                name, future = pending.popleft()
+                df = future.result()
+                loaded += 1
+                avg_bytes += (df.memory_usage(deep=False).sum() - avg_bytes) / loaded
+                yield name, df
+
+    def get_tables(self):
+        table_names = self.list_tables()
+        dfs = [df for _, df in self.iter_tables(table_names)]
         return dfs, table_names
@@ -1,6 +1,8 @@
 import pandas as pd
-import numpy as np
 from pnl_logic import compute_trade_pnl
+from streaming_indicators import rolling_mean, rolling_std
+import trade_events
+from trade_events import EventCode, Reason
 
 def calculate_atr(high, low, close, period=14):
     high = pd.Series(high)
@@ -10,7 +12,7 @@ def calculate_atr(high, low, close, period=14):
     tr2 = (high - close.shift()).abs()
     tr3 = (low - close.shift()).abs()
     tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    atr = tr.rolling(window=period, min_periods=period).mean()
+    atr = pd.Series(rolling_mean(tr, period), index=tr.index)
     return atr
 
 def manage_position_with_exit_stoploss(price_series, position_type, entry_price, contract_name, total_pnl=0.0):
@@ -27,13 +29,14 @@ def manage_position_with_exit_stoploss(price_series, position_type, entry_price,
     high = close
     low = close
     atr = calculate_atr(high, low, close, period=period_atr)
-    ma20 = close.rolling(window=period_bb, min_periods=period_bb).mean()
-    std20 = close.rolling(window=period_bb, min_periods=period_bb).std()
+    # per-window statistics, identical to the chunked streaming_indicators versions
+    ma20 = pd.Series(rolling_mean(close, period_bb), index=close.index)
+    std20 = pd.Series(rolling_std(close, period_bb), index=close.index)
     upper_bb = ma20 + std_bb * std20
     lower_bb = ma20 - std_bb * std20
     mid_bb = ma20
     position_open = True
-    exit_reason = None
+    exit_reason = Reason.NONE
     exit_price = None
     for idx in range(len(close)):
         if idx < max(period_atr, period_bb):
@@ -45,28 +48,31 @@ def manage_position_with_exit_stoploss(price_series, position_type, entry_price,
         # Long position exit logic
         if position_type == 'long' and position_open:
             if price > bb_high:
-                exit_reason = 'Profit: Price crossed above upper BB'
+                exit_reason = Reason.BB_UPPER_PROFIT
                 exit_price = price
                 position_open = False
             elif price < bb_mid:
-                exit_reason = 'Stop: Price crossed below middle BB'
+                exit_reason = Reason.BB_MID_STOP_LONG
                 exit_price = price
                 position_open = False
         # Short position exit logic
         elif position_type == 'short' and position_open:
             if price < bb_low:
-                exit_reason = 'Profit: Price crossed below lower BB'
+                exit_reason = Reason.BB_LOWER_PROFIT
                 exit_price = price
                 position_open = False
             elif price > bb_mid:
-                exit_reason = 'Stop: Price crossed above middle BB'
+                exit_reason = Reason.BB_MID_STOP_SHORT
                 exit_price = price
                 position_open = False
         if not position_open:
             trade_pnl = compute_trade_pnl('buy' if position_type == 'long' else 'sell', entry_price, exit_price, 75)
             total_pnl += trade_pnl
-            print(f"[{contract_name}] {position_type.upper()} EXIT at {exit_price:.2f} (entry {entry_price:.2f}) | {exit_reason} | Trade PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+            code = EventCode.EXIT_LONG if position_type == 'long' else EventCode.EXIT_SHORT
+            trade_events.emit(code, contract_name, exit_price, entry_price, 75, pnl=trade_pnl, total_pnl=total_pnl,
+                              reason=exit_reason, index=idx)
             break
     if position_open:
-        print(f"[{contract_name}] {position_type.upper()} still open. Entry: {entry_price:.2f}")
+        code = EventCode.STILL_OPEN_LONG if position_type == 'long' else EventCode.STILL_OPEN_SHORT
+        trade_events.emit(code, contract_name, entry=entry_price, qty=75, total_pnl=total_pnl)
     return total_pnl
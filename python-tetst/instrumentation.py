@@ -0,0 +1,225 @@
+"""
+Lightweight timers, counters and histograms for the hot paths.
+
+Instrumentation is off by default and every call returns straight away while it is off
+(timer() hands back one shared no-op context manager), so the calls can stay in loops.
+Switch it on with enable(), or by setting OPTIONALGO_METRICS=1 before start-up.
+
+    import instrumentation
+    with instrumentation.timer('indicator_seconds'):
+        ...
+    instrumentation.inc('ticks_total', len(ticks))
+
+Metrics are keyed by name plus optional labels (keyword arguments). render_prometheus()
+returns the Prometheus text exposition format (served at /metrics by the Flask app) and
+summary() / print_summary() give a per-run breakdown of where the time went.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0,
+                   10.0, 30.0, 60.0)
+PROMETHEUS_PREFIX = 'optionalgo_'
+
+_enabled = os.environ.get('OPTIONALGO_METRICS', '').lower() in ('1', 'true', 'yes', 'on')
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p: float):
+        """Upper bound of the bucket holding the p-th percentile (capped at the max seen)."""
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                bound = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(bound, self.max)
+        return self.max
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _observe_key(self.key, time.perf_counter() - self.start)
+        return False
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = bool(on)
+
+
+def disable() -> None:
+    enable(False)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def _observe_key(key, value):
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = Histogram()
+        hist.observe(value)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record one value (seconds for timings) in the histogram `name`."""
+    if not _enabled:
+        return
+    _observe_key(_key(name, labels), value)
+
+
+def timer(name: str, **labels):
+    """Context manager recording the elapsed seconds of its block in the histogram `name`."""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(_key(name, labels))
+
+
+def timed(name: str, **labels):
+    """Decorator form of timer()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Timer(_key(name, labels)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _label_text(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+def render_prometheus(prefix: str = PROMETHEUS_PREFIX) -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, (h.buckets, list(h.counts), h.count, h.sum)) for k, h in _histograms.items())
+    lines = []
+    typed = set()
+    for (name, labels), value in counters:
+        metric = prefix + name
+        if metric not in typed:
+            lines.append(f'# TYPE {metric} counter')
+            typed.add(metric)
+        lines.append(f'{metric}{_label_text(labels)} {value}')
+    for (name, labels), (buckets, counts, count, total) in histograms:
+        metric = prefix + name
+        if metric not in typed:
+            lines.append(f'# TYPE {metric} histogram')
+            typed.add(metric)
+        cumulative = 0
+        for bound, c in zip(buckets, counts):
+            cumulative += c
+            lines.append(f'{metric}_bucket{_label_text(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{metric}_bucket{_label_text(labels, [("le", "+Inf")])} {count}')
+        lines.append(f'{metric}_sum{_label_text(labels)} {total}')
+        lines.append(f'{metric}_count{_label_text(labels)} {count}')
+    lines.append(f'# TYPE {prefix}instrumentation_enabled gauge')
+    lines.append(f'{prefix}instrumentation_enabled {int(_enabled)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _display_name(name, labels):
+    return name + _label_text(labels)
+
+
+def summary() -> dict:
+    """{'timers': {name: {count, total_s, mean_ms, p50_ms, p99_ms, max_ms}}, 'counters': {name: value}}."""
+    with _lock:
+        timers = {}
+        for (name, labels), h in sorted(_histograms.items(), key=lambda kv: -kv[1].sum):
+            p50, p99 = h.percentile(50), h.percentile(99)
+            timers[_display_name(name, labels)] = {
+                'count': h.count,
+                'total_s': h.sum,
+                'mean_ms': h.sum / h.count * 1000 if h.count else None,
+                'p50_ms': p50 * 1000 if p50 is not None else None,
+                'p99_ms': p99 * 1000 if p99 is not None else None,
+                'max_ms': h.max * 1000,
+            }
+        counters = {_display_name(name, labels): v for (name, labels), v in sorted(_counters.items())}
+    return {'timers': timers, 'counters': counters}
+
+
+def print_summary(title: str = 'Run summary') -> None:
+    s = summary()
+    if not s['timers'] and not s['counters']:
+        return
+    print(f"\n{title}")
+    for name, t in s['timers'].items():
+        print(f"  {name:<45} n={t['count']:<8} total={t['total_s']:.3f}s mean={t['mean_ms']:.3f}ms "
+              f"p99<={t['p99_ms']:.3f}ms max={t['max_ms']:.3f}ms")
+    for name, v in s['counters'].items():
+        print(f"  {name:<45} {v:g}")
@@ -1,88 +1,180 @@
 from db_connector import DBConnector
-from process_option_data import process_option_data
+from market_store import MarketDataStore
+from process_option_data import process_option_data, DEFAULT_PARAMS
 from manage_reports import save_results_to_excel
+from strike_index import StrikeIndex, StrikeIndexCache
+from option_greeks import chain_greeks
+from run_journal import RunJournal, DEFAULT_JOURNAL_PATH, params_hash, content_hash
+from results_store import ResultsStore, DEFAULT_RESULTS_DB
+import instrumentation
 import pandas as pd
 import os
 import datetime
-import re
 
 class OptionAlgoMain:
     def __init__(self, config):
         self.config = config
-        self.db = DBConnector(config)
-        
+        # Read from the columnar store when one is configured, else straight from MySQL
+        if config.get('store_path'):
+            self.db = MarketDataStore(config)
+        else:
+            self.db = DBConnector(config)
+        # Per-table strike descriptors, persisted across runs
+        if 'strike_index_cache' in config:
+            self.strike_indexes = StrikeIndexCache(config['strike_index_cache'])
+        else:
+            self.strike_indexes = StrikeIndexCache()
+        # Finished work is journaled so reruns skip it; 'run_journal': None turns this off
+        journal_path = config.get('run_journal', DEFAULT_JOURNAL_PATH)
+        self.journal = RunJournal(journal_path) if journal_path else None
+        # Tables are skipped on their content checksum; 'journal_fast' uses the row count/column
+        # fingerprint instead, which misses values edited in place; 'journal_verify' loads every table
+        self.journal_fast = bool(config.get('journal_fast', False))
+        self.journal_verify = bool(config.get('journal_verify', False))
+        self._signatures = {}
+        # Per-contract and per-trade results go to the results warehouse; 'results_db': None turns this off
+        results_path = config.get('results_db', DEFAULT_RESULTS_DB)
+        self.results = ResultsStore(results_path) if results_path else None
+        # One <table>_<contract>_details.xlsx per contract; set False when the warehouse is enough
+        self.save_details = bool(config.get('save_details', True))
+        # Timers/counters for the per-run summary; also switched on by OPTIONALGO_METRICS=1
+        if config.get('metrics'):
+            instrumentation.enable()
 
-    def select_option_columns(self, df, base_price):
-        columns = df.columns.tolist()
-        # Find all call and put strikes
-        call_strikes = sorted([int(col[1:]) for col in columns if re.match(r'^C\d+$', col)])
-        put_strikes = sorted([int(col[1:]) for col in columns if re.match(r'^P\d+$', col)])
-        # Find the call just above base_price
-        c_col = None
-        for strike in call_strikes:
-            if strike > base_price:
-                c_col = f'C{strike}'
-                break
-        # Find the put just below base_price
-        p_col = None
-        for strike in reversed(put_strikes):
-            if strike < base_price:
-                p_col = f'P{strike}'
-                break
-        c_cols = [c_col] if c_col else []
-        p_cols = [p_col] if p_col else []
+    def select_option_columns(self, df, base_price, index=None):
+        # Call just above and put just below base_price, via the table's strike index
+        if index is None:
+            index = StrikeIndex.from_df(df)
+        c_cols, p_cols = index.select_otm_columns(base_price)
         print(f"Selected OTM call column: {c_cols}")
         print(f"Selected OTM put column: {p_cols}")
         return c_cols, p_cols
 
+    def compute_chain_greeks(self, table_name, df, expiry, times, r=0.065):
+        # IV/Greeks grid for the whole table, using the cached strike index and its underlying column
+        index = self.strike_indexes.get(str(table_name), df)
+        return chain_greeks(df, expiry, times, index, r=r)
+
     def run(self):
-        dfs, table_names = self.db.get_tables()
-        all_contracts = []
+        with instrumentation.timer('run_seconds'):
+            self._run()
+        instrumentation.print_summary()
+
+    def _run(self):
         no_of_table = 100
-        for i in range(min(no_of_table, len(dfs))):
-            df = dfs[i]
-            table_name_clean = table_names[i].strip()[:20] if isinstance(table_names[i], str) else table_names[i]
+        table_names = self.db.list_tables()[:no_of_table]
+        phash = params_hash(dict(DEFAULT_PARAMS, strategy='process_option_data'))
+        run_id = self.results.start_run('process_option_data', DEFAULT_PARAMS) if self.results is not None else None
+        results = {}
+        # Finished, unchanged tables come straight from the run journal without being loaded
+        pending = []
+        for name in table_names:
+            done = None
+            if self.journal is not None and not self.journal_verify:
+                done = self.journal.table_results(name, self._table_signature(name), phash)
+            if done is None:
+                pending.append(name)
+            else:
+                results[name] = pd.DataFrame(done)
+                if self.results is not None:
+                    # journaled rows carry the PnL only; the contract column is the last part of Contract
+                    for row in done:
+                        self.results.record_contract(run_id, name, str(row['Contract']).rsplit('_', 1)[-1], row['PnL'])
+                instrumentation.inc('tables_resumed_total')
+        if len(pending) < len(table_names):
+            print(f"Resuming: {len(table_names) - len(pending)} tables already in the run journal, "
+                  f"{len(pending)} to process")
+        # Tables are streamed so the next ones load while the current one is processed
+        for name, df in self.db.iter_tables(pending):
+            table_name_clean = name.strip()[:20] if isinstance(name, str) else name
             print(f"\nProcessing table: {table_name_clean}")
-            call_df = pd.DataFrame()
-            put_df = pd.DataFrame()
             # Retrieve BankNifty price from 30th row (index 29)
-            # Try common column names for BankNifty spot/underlying
-            banknifty_col = None
-            for cand in ['BANKNIFTY', 'banknifty', 'underlying', 'spot', 'base_price', 'underlying_price']:
-                if cand in df.columns:
-                    banknifty_col = cand
-                    break
-            if banknifty_col is None:
-                # fallback: first numeric non-option column
-                numeric_cols = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c]) and not c.startswith(('C','P'))]
-                if numeric_cols:
-                    banknifty_col = numeric_cols[0]
+            # Underlying column is detected once per table and kept in the strike index
+            index = self.strike_indexes.get(str(name), df)
+            banknifty_col = index.underlying_col
             if banknifty_col is None:
                 print("No BankNifty/underlying column found, skipping table.")
+                # journaled with no contracts, so resumed runs skip it without loading it again
+                self._journal_table(name, phash, [])
                 continue
             if len(df) < 30:
                 print("Not enough rows to get 30th row price, skipping table.")
+                self._journal_table(name, phash, [])
                 continue
             banknifty_price = float(df[banknifty_col].iloc[29])
-            c_cols, p_cols = self.select_option_columns(df, banknifty_price)
+            c_cols, p_cols = self.select_option_columns(df, banknifty_price, index)
             opt_cols = c_cols + p_cols
             # Process only the selected OTM columns using unified processor
-            combined_df = pd.DataFrame()
-            if opt_cols:
-                combined_df = process_option_data(df, table_name_clean, opt_cols)
-            all_contracts.append(combined_df)
+            trades = {}
+            results[name] = self._process_contracts(name, table_name_clean, df, opt_cols, phash, trades)
+            if self.results is not None and opt_cols:
+                for col, pnl in zip(opt_cols, results[name]['PnL']):
+                    self.results.record_contract(run_id, name, col, pnl, trades=trades.get(col),
+                                                 underlying=banknifty_price)
+            self._journal_table(name, phash, opt_cols)
+            instrumentation.inc('tables_processed_total')
+        self.strike_indexes.save()
+        if self.journal is not None:
+            self.journal.close()
+        if self.results is not None:
+            self.results.finish_run(run_id)
+            print(f"Results stored as run {run_id} in {self.results.path}")
+        all_contracts = [results[name] for name in table_names if name in results]
         if all_contracts:
             final_df = pd.concat(all_contracts, ignore_index=True)
             save_results_to_excel(final_df[['Contract', 'PnL']])
         else:
             print("No contracts processed.")
 
+    def _table_signature(self, name):
+        # computed once per run; the journal compares it with the one recorded for the table
+        if name not in self._signatures:
+            if self.journal_fast:
+                self._signatures[name] = 'fp:' + self.db.table_fingerprint(name)
+            else:
+                self._signatures[name] = 'sum:' + self.db.table_checksum(name)
+        return self._signatures[name]
+
+    def _journal_table(self, name, phash, contracts):
+        if self.journal is not None:
+            self.journal.record_table(name, self._table_signature(name), phash, contracts)
+
+    def _process_contracts(self, name, table_name_clean, df, opt_cols, phash, trades=None):
+        """
+        Contract results for one table, reusing journaled ones whose price data is unchanged.
+        trades, if given, is filled with contract column -> closed trades for the contracts computed here.
+        """
+        if not opt_cols:
+            return pd.DataFrame()
+        if self.journal is None:
+            closed = []
+            res = process_option_data(df, table_name_clean, opt_cols, save_details=self.save_details,
+                                      trades=closed)
+            if trades is not None:
+                for col in opt_cols:
+                    trades[col] = [t for t in closed if t['contract'] == f"{table_name_clean}_{col}"]
+            return res
+        rows = []
+        for col in opt_cols:
+            data_hash = content_hash(df, [col])
+            result = self.journal.lookup(name, col, phash, data_hash)
+            if result is None:
+                closed = []
+                result = process_option_data(df, table_name_clean, [col], save_details=self.save_details,
+                                             trades=closed).iloc[0].to_dict()
+                if trades is not None:
+                    trades[col] = closed
+                self.journal.record(name, col, phash, data_hash, result)
+            rows.append(result)
+        return pd.DataFrame(rows)
+
 if __name__ == "__main__":
     config = {
         'user': 'root',
         'password': 'hindus',
         'host': 'localhost',
         'database': 'market_data',
+        'prefetch_tables': 2,
     }
     app = OptionAlgoMain(config)
     app.run()
@@ -2,9 +2,15 @@ import pandas as pd
 import os
 import datetime
 
+import instrumentation
+
+# Spreadsheet reports are kept for sharing; results_store.py holds the queryable copy
+DEFAULT_OUTPUT_FOLDER = os.environ.get('OPTIONALGO_REPORT_DIR', r'C:\Users\shiva\OneDrive\Documents\algo results')
+
+@instrumentation.timed('report_write_seconds', report='results')
 def save_results_to_excel(results, output_folder=None):
     if output_folder is None:
-        output_folder = r'C:\Users\shiva\OneDrive\Documents\algo results'
+        output_folder = DEFAULT_OUTPUT_FOLDER
     os.makedirs(output_folder, exist_ok=True)
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
     output_path = os.path.join(output_folder, f'results_{timestamp}.xlsx')
@@ -15,9 +21,10 @@ def save_results_to_excel(results, output_folder=None):
     print(results_df)
     return output_path
 
+@instrumentation.timed('report_write_seconds', report='row_details')
 def save_row_details_report(row_details, table_name, output_folder=None):
     if output_folder is None:
-        output_folder = r'C:\Users\shiva\OneDrive\Documents\algo results'
+        output_folder = DEFAULT_OUTPUT_FOLDER
     os.makedirs(output_folder, exist_ok=True)
     if not row_details or not isinstance(row_details, list) or not any(row_details):
         print(f"No row details to save for {table_name}.")
@@ -30,3 +37,13 @@ def save_row_details_report(row_details, table_name, output_folder=None):
     df.to_excel(report_path, index=False)
     #print(f"Detailed row-by-row report saved to {report_path}")
     return report_path
+
+@instrumentation.timed('report_write_seconds', report='walk_forward')
+def save_walk_forward_report(report, output_folder=None):
+    if output_folder is None:
+        output_folder = DEFAULT_OUTPUT_FOLDER
+    os.makedirs(output_folder, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_path = os.path.join(output_folder, f'walk_forward_{timestamp}.xlsx')
+    pd.DataFrame(report).to_excel(output_path, index=False)
+    return output_path
@@ -0,0 +1,227 @@
+"""
+Columnar market-data store for the wide per-day option tables.
+
+Each MySQL table becomes one partition directory under the store root:
+
+    <store_path>/table=<table name>/_meta.json
+    <store_path>/table=<table name>/<column>.npy      (format 'npy')
+    <store_path>/table=<table name>/data.parquet     (format 'parquet', needs pyarrow)
+
+'npy' partitions are opened with numpy memory-mapping, so loading a column does not
+read or copy the file; only the pages actually touched are paged in.
+MarketDataStore.get_tables() returns (dfs, table_names) exactly like DBConnector.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from run_journal import content_hash
+
+try:
+    import pyarrow.parquet as pq
+except Exception:
+    pq = None
+
+META_FILE = '_meta.json'
+PARQUET_FILE = 'data.parquet'
+
+
+def _partition_dir(store_path, table_name):
+    safe = str(table_name).strip().replace(os.sep, '_').replace('/', '_')
+    return os.path.join(store_path, f'table={safe}')
+
+
+def _column_file(col):
+    return f"{str(col).replace(os.sep, '_').replace('/', '_')}.npy"
+
+
+def _to_array(series: pd.Series):
+    """Convert a column to a fixed-width numpy array that can be memory-mapped."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy(dtype='datetime64[ns]')
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series.to_numpy()
+    # object columns (timestamps as text, labels): try numeric, then fixed-width unicode
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.notna().sum() == series.notna().sum():
+        return numeric.to_numpy(dtype=float)
+    return series.astype(str).to_numpy(dtype='U')
+
+
+def read_meta(store_path, table_name):
+    path = os.path.join(_partition_dir(store_path, table_name), META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_table(store_path, table_name, df: pd.DataFrame, fmt='npy', source_rows=None, source_checksum=None):
+    """
+    Write one table as a partition of the store. Returns the partition directory.
+    source_checksum is the source table's content signature (DBConnector.table_checksum);
+    without one, the content hash of df is recorded.
+    """
+    part_dir = _partition_dir(store_path, table_name)
+    tmp_dir = part_dir + '.tmp'
+    old_dir = part_dir + '.old'
+    # leftovers of a write that crashed half way
+    for stale in (tmp_dir, old_dir):
+        if os.path.exists(stale):
+            shutil.rmtree(stale)
+    os.makedirs(tmp_dir)
+    columns = [str(c) for c in df.columns]
+    if fmt == 'npy':
+        for col in df.columns:
+            np.save(os.path.join(tmp_dir, _column_file(col)), _to_array(df[col]), allow_pickle=False)
+    elif fmt == 'parquet':
+        if pq is None:
+            raise ImportError('pyarrow is required for the parquet store format')
+        out = df.copy()
+        out.columns = columns
+        out.to_parquet(os.path.join(tmp_dir, PARQUET_FILE), index=False)
+    else:
+        raise ValueError(f'Unknown store format: {fmt}')
+    meta = {
+        'table': str(table_name),
+        'format': fmt,
+        'columns': columns,
+        'rows': int(len(df)),
+        'source_rows': int(len(df) if source_rows is None else source_rows),
+        'source_checksum': content_hash(df) if source_checksum is None else str(source_checksum),
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f)
+    # Swap the finished partition in so readers never see a half-written table
+    if os.path.exists(part_dir):
+        os.replace(part_dir, old_dir)
+        os.replace(tmp_dir, part_dir)
+        shutil.rmtree(old_dir)
+    else:
+        os.replace(tmp_dir, part_dir)
+    return part_dir
+
+
+def convert_database(db, store_path, fmt='npy', incremental=True):
+    """
+    Copy every table from a DBConnector into the columnar store.
+    With incremental=True, tables already in the store with an unchanged content checksum
+    (DBConnector.table_checksum) are skipped, so nightly runs only convert new or changed
+    day tables, including values corrected in place.
+    Returns the list of converted table names.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    converted = []
+    for name in db.list_tables():
+        checksum = db.table_checksum(name)
+        if incremental:
+            meta = read_meta(store_path, name)
+            if meta is not None and meta.get('format') == fmt:
+                if meta.get('source_checksum') == checksum:
+                    continue
+        df = db.read_table(name)
+        write_table(store_path, name, df, fmt=fmt, source_rows=len(df), source_checksum=checksum)
+        print(f"Converted table {name}: {len(df)} rows, {len(df.columns)} columns")
+        converted.append(name)
+    return converted
+
+
+class MarketDataStore:
+    """
+    Read side of the columnar store, with the same get_tables() interface as DBConnector.
+
+    config keys:
+      store_path: root directory of the store
+      columns: optional list of columns to load; others are never touched
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.store_path = config['store_path']
+
+    def list_tables(self):
+        if not os.path.isdir(self.store_path):
+            raise Exception(f"Market data store not found: {self.store_path}")
+        names = []
+        for entry in sorted(os.listdir(self.store_path)):
+            if not entry.startswith('table=') or entry.endswith(('.tmp', '.old')):
+                continue
+            meta_path = os.path.join(self.store_path, entry, META_FILE)
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r') as f:
+                    names.append(json.load(f)['table'])
+        if not names:
+            raise Exception("No tables found in the market data store.")
+        return names
+
+    def load_columns(self, table_name, columns=None):
+        """
+        Return {column: array} for one table. For 'npy' partitions the arrays are read-only
+        memory maps (zero copy); for 'parquet' only the requested columns are decoded.
+        """
+        meta = read_meta(self.store_path, table_name)
+        if meta is None:
+            raise KeyError(f"Table {table_name} not in market data store")
+        wanted = meta['columns'] if columns is None else [c for c in meta['columns'] if c in set(columns)]
+        part_dir = _partition_dir(self.store_path, table_name)
+        if meta['format'] == 'npy':
+            return {c: np.load(os.path.join(part_dir, _column_file(c)), mmap_mode='r') for c in wanted}
+        if pq is None:
+            raise ImportError('pyarrow is required to read parquet partitions')
+        table = pq.read_table(os.path.join(part_dir, PARQUET_FILE), columns=wanted, memory_map=True)
+        return {c: table.column(c).to_numpy() for c in wanted}
+
+    def table_fingerprint(self, table_name):
+        """Row count, columns and write time of the partition, from its metadata only."""
+        meta = read_meta(self.store_path, table_name)
+        if meta is None:
+            raise KeyError(f"Table {table_name} not in market data store")
+        mtime = os.stat(os.path.join(_partition_dir(self.store_path, table_name), META_FILE)).st_mtime_ns
+        columns = ','.join(meta['columns'])
+        return f"{meta['rows']}:{hashlib.sha1(columns.encode('utf-8')).hexdigest()[:12]}:{mtime}"
+
+    def table_checksum(self, table_name):
+        """Content signature of the partition, recorded when it was written."""
+        meta = read_meta(self.store_path, table_name)
+        if meta is None:
+            raise KeyError(f"Table {table_name} not in market data store")
+        if meta.get('source_checksum') is None:
+            # partitions written before checksums were recorded
+            return content_hash(self.read_table(table_name, meta['columns']))
+        return meta['source_checksum']
+
+    def read_table(self, table_name, columns=None):
+        columns = columns if columns is not None else self.config.get('columns')
+        with instrumentation.timer('data_load_seconds', source='store'):
+            arrays = self.load_columns(table_name, columns)
+            df = pd.DataFrame(arrays, copy=False)
+        instrumentation.inc('rows_loaded_total', len(df), source='store')
+        return df
+
+    def iter_tables(self, table_names=None, prefetch=None):
+        # Memory-mapped reads are cheap, so there is nothing to prefetch
+        for name in (table_names if table_names is not None else self.list_tables()):
+            yield name, self.read_table(name)
+
+    def get_tables(self):
+        table_names = self.list_tables()
+        dfs = [self.read_table(name) for name in table_names]
+        return dfs, table_names
+
+
+if __name__ == "__main__":
+    from db_connector import DBConnector
+    config = {
+        'user': 'root',
+        'password': 'hindus',
+        'host': 'localhost',
+        'database': 'market_data',
+        'store_path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_store'),
+    }
+    converted = convert_database(DBConnector(config), config['store_path'])
+    print(f"Converted {len(converted)} table(s) into {config['store_path']}")
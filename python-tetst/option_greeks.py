@@ -0,0 +1,189 @@
+"""
+Vectorized Black-Scholes pricing, implied volatility and Greeks for option chains.
+
+Everything works on numpy arrays that broadcast together, so a whole wide table
+(timestamps x strikes, calls and puts) is priced in one pass. Implied volatility uses
+vectorized Newton steps on vega with a bisection fallback for the points Newton cannot
+handle (deep ITM/OTM, near expiry), so every point ends inside [IV_MIN, IV_MAX].
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.special import ndtr as _ndtr
+except Exception:
+    _ndtr = None
+
+IV_MIN = 1e-4
+IV_MAX = 5.0
+MINUTES_PER_YEAR = 365.0 * 24 * 60
+MARKET_CLOSE = '15:30'
+_SQRT_2PI = math.sqrt(2 * math.pi)
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def norm_cdf(x):
+    if _ndtr is not None:
+        return _ndtr(x)
+    # Abramowitz & Stegun 26.2.17 (|error| < 7.5e-8) when scipy is not installed
+    x = np.asarray(x, dtype=float)
+    t = 1.0 / (1.0 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    upper = 1.0 - norm_pdf(x) * poly
+    return np.where(x >= 0, upper, 1.0 - upper)
+
+
+def _d1_d2(S, K, T, r, q, sigma):
+    vol_t = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * T) / vol_t
+    return d1, d1 - vol_t
+
+
+def bs_price(S, K, T, sigma, is_call, r=0.0, q=0.0):
+    """Black-Scholes price. is_call is a bool (array) selecting call or put."""
+    d1, d2 = _d1_d2(S, K, T, r, q, sigma)
+    df_q = np.exp(-q * T)
+    df_r = np.exp(-r * T)
+    call = S * df_q * norm_cdf(d1) - K * df_r * norm_cdf(d2)
+    put = K * df_r * norm_cdf(-d2) - S * df_q * norm_cdf(-d1)
+    return np.where(is_call, call, put)
+
+
+def bs_vega(S, K, T, sigma, r=0.0, q=0.0):
+    d1, _ = _d1_d2(S, K, T, r, q, sigma)
+    return S * np.exp(-q * T) * norm_pdf(d1) * np.sqrt(T)
+
+
+def implied_vol(price, S, K, T, is_call, r=0.0, q=0.0, tol=1e-6, newton_iters=20, bisect_iters=60):
+    """
+    Implied volatility for arrays of option prices. Points with no solution (price outside
+    the no-arbitrage bounds, non-positive price or time) come back as NaN.
+    """
+    price, S, K, T, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(S, dtype=float), np.asarray(K, dtype=float),
+        np.asarray(T, dtype=float), np.asarray(is_call, dtype=bool))
+    # work on flat copies so masked updates can use flat indices
+    shape = price.shape
+    price, S, K, T, is_call = (a.ravel() for a in (price, S, K, T, is_call))
+    df_r = np.exp(-r * T)
+    df_q = np.exp(-q * T)
+    intrinsic = np.where(is_call, np.maximum(S * df_q - K * df_r, 0.0), np.maximum(K * df_r - S * df_q, 0.0))
+    upper = np.where(is_call, S * df_q, K * df_r)
+    valid = (price > 0) & (T > 0) & (S > 0) & (price > intrinsic) & (price < upper)
+    valid &= np.isfinite(price) & np.isfinite(S)
+
+    # Brenner-Subrahmanyam starting point
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt(2 * np.pi / np.where(T > 0, T, 1.0)) * price / np.where(S > 0, S, 1.0)
+    sigma = np.clip(np.nan_to_num(sigma, nan=0.2), 0.01, IV_MAX)
+    done = ~valid
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(newton_iters):
+            active = ~done
+            if not active.any():
+                break
+            s = sigma[active]
+            diff = bs_price(S[active], K[active], T[active], s, is_call[active], r, q) - price[active]
+            vega = bs_vega(S[active], K[active], T[active], s, r, q)
+            step = diff / vega
+            new = s - step
+            ok = np.isfinite(new) & (new > IV_MIN) & (new < IV_MAX) & (vega > 1e-10)
+            s_new = np.where(ok, new, s)
+            sigma[active] = s_new
+            converged = ok & (np.abs(diff) < tol)
+            stuck = ~ok
+            idx = np.flatnonzero(active)
+            done[idx[converged]] = True
+            # Newton left the bracket: hand these to bisection
+            done[idx[stuck]] = True
+            sigma[idx[stuck]] = np.nan
+
+        # Bisection for points Newton could not finish
+        todo = valid & (np.isnan(sigma) | (np.abs(
+            bs_price(S, K, T, np.nan_to_num(sigma, nan=0.2), is_call, r, q) - price) >= tol))
+        if todo.any():
+            lo = np.full(todo.sum(), IV_MIN)
+            hi = np.full(todo.sum(), IV_MAX)
+            Pt, St, Kt, Tt, Ct = price[todo], S[todo], K[todo], T[todo], is_call[todo]
+            for _ in range(bisect_iters):
+                mid = 0.5 * (lo + hi)
+                above = bs_price(St, Kt, Tt, mid, Ct, r, q) > Pt
+                hi = np.where(above, mid, hi)
+                lo = np.where(above, lo, mid)
+            sigma[todo] = 0.5 * (lo + hi)
+    sigma[~valid] = np.nan
+    return sigma.reshape(shape)
+
+
+def greeks(S, K, T, sigma, is_call, r=0.0, q=0.0):
+    """Delta, gamma, vega (per 1 vol point), theta (per calendar day)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1, d2 = _d1_d2(S, K, T, r, q, sigma)
+        df_q = np.exp(-q * T)
+        df_r = np.exp(-r * T)
+        pdf = norm_pdf(d1)
+        sqrt_t = np.sqrt(T)
+        delta = np.where(is_call, df_q * norm_cdf(d1), df_q * (norm_cdf(d1) - 1.0))
+        gamma = df_q * pdf / (S * sigma * sqrt_t)
+        vega = S * df_q * pdf * sqrt_t / 100.0
+        common = -S * df_q * pdf * sigma / (2 * sqrt_t)
+        theta_call = common - r * K * df_r * norm_cdf(d2) + q * S * df_q * norm_cdf(d1)
+        theta_put = common + r * K * df_r * norm_cdf(-d2) - q * S * df_q * norm_cdf(-d1)
+        theta = np.where(is_call, theta_call, theta_put) / 365.0
+    return {'delta': delta, 'gamma': gamma, 'vega': vega, 'theta': theta}
+
+
+def minute_times(trade_date, n_rows, start='09:15'):
+    """Timestamps for a wide table with one row per minute from `start` on trade_date."""
+    return pd.date_range(f"{pd.Timestamp(trade_date).date()} {start}", periods=n_rows, freq='min').to_numpy()
+
+
+def expiry_for(instruments: pd.DataFrame, name: str, on_date) -> pd.Timestamp:
+    """Nearest option expiry on/after on_date for `name` in the instrument master, at market close."""
+    opts = instruments[(instruments['name'].astype(str) == name)
+                       & instruments['instrument_type'].astype(str).isin(['CE', 'PE'])]
+    expiries = pd.to_datetime(opts['expiry'].dropna().unique())
+    expiries = expiries[expiries >= pd.Timestamp(on_date).normalize()]
+    if len(expiries) == 0:
+        raise ValueError(f'No option expiry for {name} on or after {on_date}')
+    return pd.Timestamp(f"{expiries.min().date()} {MARKET_CLOSE}")
+
+
+def years_to_expiry(times, expiry) -> np.ndarray:
+    times = np.asarray(times, dtype='datetime64[ns]')
+    minutes = (np.datetime64(pd.Timestamp(expiry).to_datetime64(), 'ns') - times) / np.timedelta64(1, 'm')
+    return np.maximum(minutes, 0.0) / MINUTES_PER_YEAR
+
+
+def chain_greeks(df: pd.DataFrame, expiry, times, index=None, r=0.065, q=0.0):
+    """
+    IV and Greeks for every C<strike>/P<strike> column of a wide table at every row.
+    The underlying column is the one detected by the table's StrikeIndex
+    (as in OptionAlgoMain.run). Returns {'C': {...}, 'P': {...}}, each holding
+    'strikes' (N,) and 'iv', 'delta', 'gamma', 'vega', 'theta' arrays of shape (rows, N).
+    """
+    if index is None:
+        # imported here so the pricing functions load without the backtest modules (see option_chain.py)
+        from strike_index import StrikeIndex
+        index = StrikeIndex.from_df(df)
+    if index.underlying_col is None:
+        raise ValueError('No underlying column found in table')
+    S = df[index.underlying_col].to_numpy(dtype=float)[:, None]
+    T = years_to_expiry(times, expiry)[:, None]
+    out = {}
+    for kind, strikes, positions in (('C', index.call_strikes, index.call_positions),
+                                     ('P', index.put_strikes, index.put_positions)):
+        if len(strikes) == 0:
+            continue
+        prices = df.iloc[:, positions].to_numpy(dtype=float)
+        K = strikes.astype(float)[None, :]
+        is_call = kind == 'C'
+        iv = implied_vol(prices, S, K, T, is_call, r, q)
+        g = greeks(S, K, T, iv, is_call, r, q)
+        out[kind] = dict(strikes=strikes, iv=iv, **g)
+    return out
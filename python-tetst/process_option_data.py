@@ -1,52 +1,138 @@
+import time
+
 import pandas as pd
+
+import instrumentation
 from manage_reports import save_row_details_report
 from pnl_logic import compute_trade_pnl
+import trade_events
+from trade_events import EventCode, Reason
+from table_dtypes import as_price_series
+from timeframes import MultiTimeframe
+from streaming_indicators import rolling_mean
+
+# Strategy constants; any of them can be overridden through the `params` argument
+DEFAULT_PARAMS = {
+    'ema_fast': 12,
+    'ema_slow': 26,
+    'signal': 9,
+    'ema_trend': 200,
+    'trend_timeframe': 1,   # bar size in minutes for the EMA trend filter; 1 = the table's own rows
+    'rsi_period': 14,
+    'rsi_upper': 70,
+    'rsi_lower': 30,
+    'target_pct': 0.005,
+    'qty': 75,
+    'warmup': 30,
+}
+
+INDICATOR_KEYS = ('ema_fast', 'ema_slow', 'signal', 'ema_trend', 'trend_timeframe', 'rsi_period')
+
+
+def compute_indicators(close: pd.Series, params: dict, trend: pd.Series = None) -> dict:
+    """
+    MACD line/signal/histogram, EMA trend filter and RSI for one price series.
+    trend, if given, replaces the full-resolution EMA trend filter (e.g. a higher-timeframe EMA).
+    """
+    ema_fast = close.ewm(span=params['ema_fast'], adjust=False).mean()
+    ema_slow = close.ewm(span=params['ema_slow'], adjust=False).mean()
+    macd_line = ema_fast - ema_slow
+    signal_line = macd_line.ewm(span=params['signal'], adjust=False).mean()
+    macd_hist = macd_line - signal_line
+    ema200 = trend if trend is not None else close.ewm(span=params['ema_trend'], adjust=False).mean()
+
+    delta = close.diff()
+    gain = delta.clip(lower=0)
+    loss = -delta.clip(upper=0)
+    # per-window means, so chunked runs (streaming_indicators.RSI) give identical values
+    avg_gain = pd.Series(rolling_mean(gain, params['rsi_period']), index=close.index)
+    avg_loss = pd.Series(rolling_mean(loss, params['rsi_period']), index=close.index)
+    rs = avg_gain / avg_loss
+    rsi = 100 - (100 / (1 + rs))
+    return {
+        'macd_line': macd_line,
+        'signal_line': signal_line,
+        'macd_hist': macd_hist,
+        'ema200': ema200,
+        'rsi': rsi,
+    }
 
-def process_option_data(df: pd.DataFrame, table_name: str, option_columns: list[str]) -> pd.DataFrame:
+
+def process_option_data(df: pd.DataFrame, table_name: str, option_columns: list[str], params: dict = None,
+                        save_details: bool = True, indicator_cache: dict = None,
+                        htf: MultiTimeframe = None, trades: list = None, cache_key=None) -> pd.DataFrame:
     """
     Generic processor for option contracts (both Calls and Puts).
     Applies MACD + RSI signals gated by EMA200 trend filter, supports reversal on opposite signal,
     0.5% trailing profit targets with dynamic adjustment, and forced exit if target crosses entry.
 
+    params overrides DEFAULT_PARAMS. indicator_cache, if given, is a dict reused across calls so
+    parameter sweeps that only change thresholds/targets do not recompute indicators. Its
+    entries are keyed by cache_key (default table_name); pass the full table name when
+    table_name is a shortened display name, so tables sharing a prefix do not share series.
+
+    With params['trend_timeframe'] > 1 the EMA trend filter is computed on bars of that many
+    minutes and applied to each row from the last closed bar only (no lookahead). htf is the
+    table's MultiTimeframe stage; one is built here if not given, shared by all contracts.
+
+    trades, if given, is a list that every closed trade is appended to as a dict (contract,
+    side, entry, exit, qty, pnl, reason, entry_index, index), e.g. for results_store.
+
     Returns a DataFrame with columns: Contract, PnL
     """
     if not option_columns:
         raise ValueError('No option contract columns provided')
 
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    qty_lots = p['qty']
+    upper_mult = 1 + p['target_pct']
+    lower_mult = 1 - p['target_pct']
     contract_pnl = []
+    if p['trend_timeframe'] > 1 and htf is None:
+        htf = MultiTimeframe(df, columns=option_columns)
+
+    def indicators(contract, close):
+        trend = None
+        if p['trend_timeframe'] > 1:
+            trend = pd.Series(htf.ema(contract, p['trend_timeframe'], p['ema_trend']), index=close.index)
+        return compute_indicators(close, p, trend)
 
     for contract in option_columns:
         contract_name = f"{table_name}_{contract}"
-        price = df[contract].astype(float)
+        price = as_price_series(df[contract])
         close = price
 
         # Indicators
-        ema12 = close.ewm(span=12, adjust=False).mean()
-        ema26 = close.ewm(span=26, adjust=False).mean()
-        macd_line = ema12 - ema26
-        signal_line = macd_line.ewm(span=9, adjust=False).mean()
-        macd_hist = macd_line - signal_line
-        ema200 = close.ewm(span=200, adjust=False).mean()
-
-        delta = close.diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
-        avg_gain = gain.rolling(window=14, min_periods=14).mean()
-        avg_loss = loss.rolling(window=14, min_periods=14).mean()
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
+        if indicator_cache is not None:
+            key = (table_name if cache_key is None else cache_key, contract) + tuple(p[k] for k in INDICATOR_KEYS)
+            ind = indicator_cache.get(key)
+            if ind is None:
+                with instrumentation.timer('indicator_seconds'):
+                    ind = indicator_cache[key] = indicators(contract, close)
+            else:
+                instrumentation.inc('indicator_cache_hits_total')
+        else:
+            with instrumentation.timer('indicator_seconds'):
+                ind = indicators(contract, close)
+        macd_line = ind['macd_line']
+        signal_line = ind['signal_line']
+        macd_hist = ind['macd_hist']
+        ema200 = ind['ema200']
+        rsi = ind['rsi']
 
         # State
         position = None  # 'long' | 'short' | None
         entry_price = None
+        entry_index = None
         qty = 0
         total_pnl = 0.0
         closed_trades = []
         row_details = []
         profit_target = None
 
+        loop_start = time.perf_counter()
         for idx in range(len(close)):
-            if idx < 30:
+            if idx < p['warmup']:
                 continue
             try:
                 macd_prev = macd_line.iloc[idx - 1]
@@ -66,13 +152,13 @@ def process_option_data(df: pd.DataFrame, table_name: str, option_columns: list[
             bull_signal = (
                 (macd_prev <= sig_prev)
                 and (macd_curr > sig_curr)
-                and (rsi_curr is not None and rsi_curr > 70)
+                and (rsi_curr is not None and rsi_curr > p['rsi_upper'])
                 and (pd.notna(ema200_curr) and price_curr > ema200_curr)
             )
             bear_signal = (
                 (macd_prev >= sig_prev)
                 and (macd_curr < sig_curr)
-                and (rsi_curr is not None and rsi_curr < 30)
+                and (rsi_curr is not None and rsi_curr < p['rsi_lower'])
                 and (pd.notna(ema200_curr) and price_curr < ema200_curr)
             )
 
@@ -82,9 +168,10 @@ def process_option_data(df: pd.DataFrame, table_name: str, option_columns: list[
                 if position is None:
                     position = 'long'
                     entry_price = price_curr
-                    qty = 75 if qty == 0 else qty
-                    profit_target = entry_price * 1.005  # 0.5%
-                    print(f"[{contract}] LONG opened at {entry_price:.2f}, qty={qty}, profit_target={profit_target:.2f}, total PNL={total_pnl:.2f}")
+                    entry_index = idx
+                    qty = qty_lots if qty == 0 else qty
+                    profit_target = entry_price * upper_mult
+                    trade_events.emit(EventCode.OPEN_LONG, contract, price_curr, entry_price, qty, profit_target, total_pnl=total_pnl, index=idx)
                 elif position == 'short':
                     # Reverse SHORT -> LONG
                     exit_price = price_curr
@@ -92,23 +179,28 @@ def process_option_data(df: pd.DataFrame, table_name: str, option_columns: list[
                     total_pnl += trade_pnl
                     closed_trades.append({
                         'side': 'short', 'entry': float(entry_price), 'exit': float(exit_price),
-                        'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Reversal on bull signal', 'index': int(idx)
+                        'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Reversal on bull signal',
+                        'entry_index': entry_index, 'index': int(idx)
                     })
-                    print(f"[{contract}] SHORT EXIT (reversal) at {exit_price:.2f} (entry {entry_price:.2f}) | PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.EXIT_SHORT, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.REVERSAL, index=idx)
                     position = 'long'
                     entry_price = price_curr
-                    qty = 75 if qty == 0 else qty
-                    profit_target = entry_price * 1.005
+                    entry_index = idx
+                    qty = qty_lots if qty == 0 else qty
+                    profit_target = entry_price * upper_mult
                     signal_text += ' (Reversal)'
-                    print(f"[{contract}] LONG opened (reversal) at {entry_price:.2f}, qty={qty}, profit_target={profit_target:.2f}, total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.OPEN_LONG, contract, price_curr, entry_price, qty, profit_target, total_pnl=total_pnl,
+                                      reason=Reason.REVERSAL, index=idx)
             elif bear_signal:
                 signal_text = 'Bearish Confirmed Signal'
                 if position is None:
                     position = 'short'
                     entry_price = price_curr
-                    qty = 75 if qty == 0 else qty
-                    profit_target = entry_price * 0.995  # 0.5%
-                    print(f"[{contract}] SHORT opened at {entry_price:.2f}, qty={qty}, profit_target={profit_target:.2f}, total PNL={total_pnl:.2f}")
+                    entry_index = idx
+                    qty = qty_lots if qty == 0 else qty
+                    profit_target = entry_price * lower_mult
+                    trade_events.emit(EventCode.OPEN_SHORT, contract, price_curr, entry_price, qty, profit_target, total_pnl=total_pnl, index=idx)
                 elif position == 'long':
                     # Reverse LONG -> SHORT
                     exit_price = price_curr
@@ -116,27 +208,37 @@ def process_option_data(df: pd.DataFrame, table_name: str, option_columns: list[
                     total_pnl += trade_pnl
                     closed_trades.append({
                         'side': 'long', 'entry': float(entry_price), 'exit': float(exit_price),
-                        'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Reversal on bear signal', 'index': int(idx)
+                        'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Reversal on bear signal',
+                        'entry_index': entry_index, 'index': int(idx)
                     })
-                    print(f"[{contract}] LONG EXIT (reversal) at {exit_price:.2f} (entry {entry_price:.2f}) | PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.EXIT_LONG, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.REVERSAL, index=idx)
                     position = 'short'
                     entry_price = price_curr
-                    qty = 75 if qty == 0 else qty
-                    profit_target = entry_price * 0.995
+                    entry_index = idx
+                    qty = qty_lots if qty == 0 else qty
+                    profit_target = entry_price * lower_mult
                     signal_text += ' (Reversal)'
-                    print(f"[{contract}] SHORT opened (reversal) at {entry_price:.2f}, qty={qty}, profit_target={profit_target:.2f}, total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.OPEN_SHORT, contract, price_curr, entry_price, qty, profit_target, total_pnl=total_pnl,
+                                      reason=Reason.REVERSAL, index=idx)
 
             # Trailing profit logic and forced exit when target crosses entry
             if position == 'long' and entry_price is not None:
                 if price_curr < entry_price:
                     diff = entry_price - price_curr
-                    if (entry_price * 1.005 - profit_target) < diff:
-                        profit_target = entry_price * 1.005 - diff
+                    if (entry_price * upper_mult - profit_target) < diff:
+                        profit_target = entry_price * upper_mult - diff
                 if profit_target is not None and profit_target <= entry_price:
                     exit_price = price_curr
                     trade_pnl = compute_trade_pnl('buy', entry_price, exit_price, qty)
                     total_pnl += trade_pnl
-                    print(f"[{contract}] LONG EXIT at {exit_price:.2f} (entry {entry_price:.2f}) | Target <= entry (forced) | Trade PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    closed_trades.append({
+                        'side': 'long', 'entry': float(entry_price), 'exit': float(exit_price),
+                        'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Target <= entry (forced)',
+                        'entry_index': entry_index, 'index': int(idx)
+                    })
+                    trade_events.emit(EventCode.EXIT_LONG, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.TARGET_CROSSED_ENTRY, index=idx)
                     position = None
                     profit_target = None
                     entry_price = None
@@ -144,20 +246,32 @@ def process_option_data(df: pd.DataFrame, table_name: str, option_columns: list[
                     exit_price = price_curr
                     trade_pnl = compute_trade_pnl('buy', entry_price, exit_price, qty)
                     total_pnl += trade_pnl
-                    print(f"[{contract}] LONG EXIT at {exit_price:.2f} (entry {entry_price:.2f}) | Trailing profit booked | Trade PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    closed_trades.append({
+                        'side': 'long', 'entry': float(entry_price), 'exit': float(exit_price),
+                        'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Trailing profit booked',
+                        'entry_index': entry_index, 'index': int(idx)
+                    })
+                    trade_events.emit(EventCode.EXIT_LONG, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.TRAILING_PROFIT, index=idx)
                     position = None
                     profit_target = None
                     entry_price = None
             elif position == 'short' and entry_price is not None:
                 if price_curr > entry_price:
                     diff = price_curr - entry_price
-                    if (profit_target - entry_price * 0.995) < diff:
-                        profit_target = entry_price * 0.995 + diff
+                    if (profit_target - entry_price * lower_mult) < diff:
+                        profit_target = entry_price * lower_mult + diff
                 if profit_target is not None and profit_target >= entry_price:
                     exit_price = price_curr
                     trade_pnl = compute_trade_pnl('sell', entry_price, exit_price, qty)
                     total_pnl += trade_pnl
-                    print(f"[{contract}] SHORT EXIT at {exit_price:.2f} (entry {entry_price:.2f}) | Target >= entry (forced) | Trade PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    closed_trades.append({
+                        'side': 'short', 'entry': float(entry_price), 'exit': float(exit_price),
+                        'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Target >= entry (forced)',
+                        'entry_index': entry_index, 'index': int(idx)
+                    })
+                    trade_events.emit(EventCode.EXIT_SHORT, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.TARGET_CROSSED_ENTRY, index=idx)
                     position = None
                     profit_target = None
                     entry_price = None
@@ -165,7 +279,13 @@ def process_option_data(df: pd.DataFrame, table_name: str, option_columns: list[
                     exit_price = price_curr
                     trade_pnl = compute_trade_pnl('sell', entry_price, exit_price, qty)
                     total_pnl += trade_pnl
-                    print(f"[{contract}] SHORT EXIT at {exit_price:.2f} (entry {entry_price:.2f}) | Trailing profit booked | Trade PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    closed_trades.append({
+                        'side': 'short', 'entry': float(entry_price), 'exit': float(exit_price),
+                        'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Trailing profit booked',
+                        'entry_index': entry_index, 'index': int(idx)
+                    })
+                    trade_events.emit(EventCode.EXIT_SHORT, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.TRAILING_PROFIT, index=idx)
                     position = None
                     profit_target = None
                     entry_price = None
@@ -187,8 +307,14 @@ def process_option_data(df: pd.DataFrame, table_name: str, option_columns: list[
                 'total_pnl': total_pnl,
             })
 
+        instrumentation.observe('signal_loop_seconds', time.perf_counter() - loop_start)
+        instrumentation.inc('signal_rows_total', len(close))
+
         # Save per-contract details and summary
-        save_row_details_report(row_details, contract_name)
+        if save_details:
+            save_row_details_report(row_details, contract_name)
         contract_pnl.append({'Contract': contract_name, 'PnL': total_pnl})
+        if trades is not None:
+            trades.extend(dict(t, contract=contract_name) for t in closed_trades)
 
     return pd.DataFrame(contract_pnl)
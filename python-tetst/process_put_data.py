@@ -1,6 +1,9 @@
 import pandas as pd
 from manage_reports import save_row_details_report
 from pnl_logic import compute_trade_pnl
+import trade_events
+from trade_events import EventCode, Reason
+from table_dtypes import as_price_series
 
 def process_put_data(df, table_name, put_columns):
     results = []
@@ -12,7 +15,7 @@ def process_put_data(df, table_name, put_columns):
     contract_pnl = []
     for contract in option_cols:
         contract_name = table_name+"_"+contract
-        price = df[contract].astype(float)
+        price = as_price_series(df[contract])
         close = price
         ema12 = close.ewm(span=12, adjust=False).mean()
         ema26 = close.ewm(span=26, adjust=False).mean()
@@ -78,7 +81,7 @@ def process_put_data(df, table_name, put_columns):
                     entry_price = price_curr
                     qty = 75 if qty == 0 else qty
                     profit_target = entry_price * 1.005
-                    print(f"[{contract}] LONG opened at {entry_price:.2f}, qty={qty}, profit_target={profit_target:.2f}, total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.OPEN_LONG, contract, price_curr, entry_price, qty, profit_target, total_pnl=total_pnl, index=idx)
                 elif position == 'short':
                     # Reverse from SHORT -> LONG
                     exit_price = price_curr
@@ -88,7 +91,8 @@ def process_put_data(df, table_name, put_columns):
                         'side': 'short', 'entry': float(entry_price), 'exit': float(exit_price),
                         'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Reversal on bull signal', 'index': int(idx)
                     })
-                    print(f"[{contract}] SHORT EXIT (reversal) at {exit_price:.2f} (entry {entry_price:.2f}) | PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.EXIT_SHORT, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.REVERSAL, index=idx)
                     # Open new LONG immediately
                     position = 'long'
                     entry_type = 'buy'
@@ -96,7 +100,8 @@ def process_put_data(df, table_name, put_columns):
                     qty = 75 if qty == 0 else qty
                     profit_target = entry_price * 1.005
                     signal_text += ' (Reversal)'
-                    print(f"[{contract}] LONG opened (reversal) at {entry_price:.2f}, qty={qty}, profit_target={profit_target:.2f}, total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.OPEN_LONG, contract, price_curr, entry_price, qty, profit_target, total_pnl=total_pnl,
+                                      reason=Reason.REVERSAL, index=idx)
             elif bear_signal:
                 signal_text = 'Bearish Confirmed Signal'
                 if position is None:
@@ -106,7 +111,7 @@ def process_put_data(df, table_name, put_columns):
                     entry_price = price_curr
                     qty = 75 if qty == 0 else qty
                     profit_target = entry_price * 0.995
-                    print(f"[{contract}] SHORT opened at {entry_price:.2f}, qty={qty}, profit_target={profit_target:.2f}, total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.OPEN_SHORT, contract, price_curr, entry_price, qty, profit_target, total_pnl=total_pnl, index=idx)
                 elif position == 'long':
                     # Reverse from LONG -> SHORT
                     exit_price = price_curr
@@ -116,7 +121,8 @@ def process_put_data(df, table_name, put_columns):
                         'side': 'long', 'entry': float(entry_price), 'exit': float(exit_price),
                         'qty': qty, 'pnl': float(trade_pnl), 'reason': 'Reversal on bear signal', 'index': int(idx)
                     })
-                    print(f"[{contract}] LONG EXIT (reversal) at {exit_price:.2f} (entry {entry_price:.2f}) | PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.EXIT_LONG, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.REVERSAL, index=idx)
                     # Open new SHORT immediately
                     position = 'short'
                     entry_type = 'sell'
@@ -124,7 +130,8 @@ def process_put_data(df, table_name, put_columns):
                     qty = 75 if qty == 0 else qty
                     profit_target = entry_price * 0.995
                     signal_text += ' (Reversal)'
-                    print(f"[{contract}] SHORT opened (reversal) at {entry_price:.2f}, qty={qty}, profit_target={profit_target:.2f}, total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.OPEN_SHORT, contract, price_curr, entry_price, qty, profit_target, total_pnl=total_pnl,
+                                      reason=Reason.REVERSAL, index=idx)
             # Trailing profit booking logic
             if position == 'long':
                 # Adjust trailing target down when price pulls back below entry
@@ -137,7 +144,8 @@ def process_put_data(df, table_name, put_columns):
                     exit_price = price_curr
                     trade_pnl = compute_trade_pnl('buy', entry_price, exit_price, qty)
                     total_pnl += trade_pnl
-                    print(f"[{contract}] LONG EXIT at {exit_price:.2f} (entry {entry_price:.2f}) | Target <= entry (forced) | Trade PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.EXIT_LONG, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.TARGET_CROSSED_ENTRY, index=idx)
                     position = None
                     profit_target = None
                     entry_price = None
@@ -145,7 +153,8 @@ def process_put_data(df, table_name, put_columns):
                     exit_price = price_curr
                     trade_pnl = compute_trade_pnl('buy', entry_price, exit_price, qty)
                     total_pnl += trade_pnl
-                    print(f"[{contract}] LONG EXIT at {exit_price:.2f} (entry {entry_price:.2f}) | Trailing profit booked | Trade PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.EXIT_LONG, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.TRAILING_PROFIT, index=idx)
                     position = None
                     profit_target = None
                     entry_price = None
@@ -160,7 +169,8 @@ def process_put_data(df, table_name, put_columns):
                     exit_price = price_curr
                     trade_pnl = compute_trade_pnl('sell', entry_price, exit_price, qty)
                     total_pnl += trade_pnl
-                    print(f"[{contract}] SHORT EXIT at {exit_price:.2f} (entry {entry_price:.2f}) | Target >= entry (forced) | Trade PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.EXIT_SHORT, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.TARGET_CROSSED_ENTRY, index=idx)
                     position = None
                     profit_target = None
                     entry_price = None
@@ -168,7 +178,8 @@ def process_put_data(df, table_name, put_columns):
                     exit_price = price_curr
                     trade_pnl = compute_trade_pnl('sell', entry_price, exit_price, qty)
                     total_pnl += trade_pnl
-                    print(f"[{contract}] SHORT EXIT at {exit_price:.2f} (entry {entry_price:.2f}) | Trailing profit booked | Trade PNL={trade_pnl:.2f} | Total PNL={total_pnl:.2f}")
+                    trade_events.emit(EventCode.EXIT_SHORT, contract, exit_price, entry_price, qty, pnl=trade_pnl,
+                                      total_pnl=total_pnl, reason=Reason.TRAILING_PROFIT, index=idx)
                     position = None
                     profit_target = None
                     entry_price = None
@@ -0,0 +1,303 @@
+"""
+Queryable warehouse of backtest results in one SQLite file.
+
+Every run gets a run_id and is stored with its strategy and params hash. Per-contract
+results (PnL, trade count, wins, drawdown, strike and distance from the underlying) and
+per-trade rows go into two tables indexed on trade date, contract and strategy, so
+comparing runs is a query instead of opening a spreadsheet per contract:
+
+    store = ResultsStore()
+    run_id = store.start_run('process_option_data', DEFAULT_PARAMS)
+    store.record_contract(run_id, table, 'C48000', pnl, trades=trades, underlying=47950.0)
+    store.finish_run(run_id)
+
+    store.stats(by='strike_distance', bucket=100)          # PnL, win rate, drawdown per bucket
+    store.stats(by='run_id', strategy='process_option_data', date_from='2024-01-01')
+    store.contract_results(run_ids=[a, b])
+
+Writes replace rows with the same key (run, table, contract, params hash), so recording a
+contract twice (a resumed run, a unit finished by two sweep workers) keeps one copy.
+OptionAlgoMain records into it through config['results_db'] and sweep workers through
+run_worker(results_db=...); app.py serves stats() at /api/results/stats.
+"""
+import datetime
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+import pandas as pd
+
+from run_journal import params_hash
+
+DEFAULT_RESULTS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.db')
+
+_OPTION_RE = re.compile(r'(?:^|_)([CP])(\d+(?:\.\d+)?)$')
+_DATE_RES = (
+    (re.compile(r'(20\d{2})[-_]?(\d{2})[-_]?(\d{2})'), (1, 2, 3)),   # 2024-01-31, 20240131
+    (re.compile(r'(\d{2})[-_]?(\d{2})[-_]?(20\d{2})'), (3, 2, 1)),   # 31-01-2024, 31012024
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    strategy TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    params TEXT NOT NULL,
+    started TEXT NOT NULL,
+    finished TEXT,
+    note TEXT
+);
+CREATE TABLE IF NOT EXISTS contract_results (
+    run_id TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    trade_date TEXT,
+    contract TEXT NOT NULL,
+    option_type TEXT,
+    strike REAL,
+    underlying REAL,
+    strike_distance REAL,
+    strategy TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    pnl REAL NOT NULL,
+    trades INTEGER,
+    wins INTEGER,
+    max_drawdown REAL,
+    PRIMARY KEY (run_id, table_name, contract, params_hash)
+);
+CREATE INDEX IF NOT EXISTS contract_results_date ON contract_results (trade_date);
+CREATE INDEX IF NOT EXISTS contract_results_contract ON contract_results (contract);
+CREATE INDEX IF NOT EXISTS contract_results_strategy ON contract_results (strategy, params_hash);
+CREATE TABLE IF NOT EXISTS trades (
+    run_id TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    trade_date TEXT,
+    contract TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    trade_no INTEGER NOT NULL,
+    side TEXT,
+    entry REAL,
+    exit REAL,
+    qty INTEGER,
+    pnl REAL,
+    reason TEXT,
+    entry_index INTEGER,
+    exit_index INTEGER,
+    PRIMARY KEY (run_id, table_name, contract, params_hash, trade_no)
+);
+CREATE INDEX IF NOT EXISTS trades_date ON trades (trade_date);
+CREATE INDEX IF NOT EXISTS trades_contract ON trades (contract);
+CREATE INDEX IF NOT EXISTS trades_strategy ON trades (strategy, params_hash);
+"""
+
+# stats(by=...) groupings and the SQL expression for each
+GROUPINGS = {
+    'strike_distance': 'strike_distance',
+    'run_id': 'run_id',
+    'strategy': 'strategy',
+    'params_hash': 'params_hash',
+    'trade_date': 'trade_date',
+    'month': 'substr(trade_date, 1, 7)',
+    'option_type': 'option_type',
+    'contract': 'contract',
+    'table_name': 'table_name',
+}
+
+
+def table_date(table_name) -> Optional[str]:
+    """ISO date embedded in a day table's name (2024-01-31, 20240131, 31_01_2024, ...), or None."""
+    for pattern, (y, m, d) in _DATE_RES:
+        match = pattern.search(str(table_name))
+        if match:
+            try:
+                return datetime.date(int(match.group(y)), int(match.group(m)), int(match.group(d))).isoformat()
+            except ValueError:
+                continue
+    return None
+
+
+def parse_contract(contract):
+    """('CE'|'PE', strike) from a contract column such as C48000 or day_01_P47900, else (None, None)."""
+    match = _OPTION_RE.search(str(contract))
+    if match is None:
+        return None, None
+    return ('CE' if match.group(1) == 'C' else 'PE'), float(match.group(2))
+
+
+def max_drawdown(pnls) -> float:
+    """Largest fall of the running PnL total from its peak (the peak starts at 0)."""
+    peak = total = worst = 0.0
+    for pnl in pnls:
+        total += pnl
+        peak = max(peak, total)
+        worst = max(worst, peak - total)
+    return worst
+
+
+class ResultsStore:
+    def __init__(self, path: str = DEFAULT_RESULTS_DB, timeout: float = 60.0):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self._runs = {}   # run_id -> (strategy, params)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Writing
+
+    def start_run(self, strategy: str, params: dict, run_id: Optional[str] = None, note: Optional[str] = None) -> str:
+        """Register a run (kept as is if run_id already exists) and return its run_id."""
+        run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR IGNORE INTO runs (run_id, strategy, params_hash, params, started, note) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (run_id, strategy, params_hash(params), json.dumps(params, sort_keys=True, default=str),
+                 datetime.datetime.now().isoformat(timespec='seconds'), note))
+        return run_id
+
+    def finish_run(self, run_id: str) -> None:
+        with self._lock:
+            self.conn.execute('UPDATE runs SET finished = ? WHERE run_id = ?',
+                              (datetime.datetime.now().isoformat(timespec='seconds'), run_id))
+
+    def _run(self, run_id):
+        if run_id not in self._runs:
+            row = self.conn.execute('SELECT strategy, params FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+            if row is None:
+                raise KeyError(f'Unknown run {run_id}; call start_run first')
+            params = json.loads(row[1])
+            self._runs[run_id] = (row[0], params)
+        return self._runs[run_id]
+
+    def record_contract(self, run_id: str, table_name, contract: str, pnl: float, trades=None,
+                        underlying: Optional[float] = None, params: Optional[dict] = None) -> None:
+        """
+        Store one contract's result and its closed trades (process_option_data(trades=...)
+        dicts). params are overrides of the run's params (a sweep unit's grid values), so a
+        contract's params hash always covers the full parameter set. trades=None stores
+        the PnL only (e.g. a result taken from the run journal), leaving trades/wins empty.
+        """
+        strategy, run_params = self._run(run_id)
+        phash = params_hash(run_params if params is None else dict(run_params, **params))
+        table_name = str(table_name)
+        day = table_date(table_name)
+        option_type, strike = parse_contract(contract)
+        distance = None
+        if strike is not None and underlying is not None:
+            distance = strike - underlying if option_type == 'CE' else underlying - strike
+        trades = None if trades is None else list(trades)
+        counts = (None, None, None) if trades is None else (
+            len(trades), sum(1 for t in trades if t['pnl'] > 0), max_drawdown(t['pnl'] for t in trades))
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO contract_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (run_id, table_name, day, contract, option_type, strike, underlying, distance,
+                     strategy, phash, float(pnl)) + counts)
+                if trades is not None:
+                    self.conn.execute(
+                        'DELETE FROM trades WHERE run_id = ? AND table_name = ? AND contract = ? AND params_hash = ?',
+                        (run_id, table_name, contract, phash))
+                    self.conn.executemany(
+                        'INSERT INTO trades VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        [(run_id, table_name, day, contract, strategy, phash, i, t.get('side'), t.get('entry'),
+                          t.get('exit'), t.get('qty'), t['pnl'], t.get('reason'), t.get('entry_index'),
+                          t.get('index')) for i, t in enumerate(trades)])
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    # Queries
+
+    @staticmethod
+    def _where(run_ids=None, strategy=None, params_hash=None, contract=None, date_from=None, date_to=None):
+        clauses, args = [], []
+        if run_ids:
+            run_ids = [run_ids] if isinstance(run_ids, str) else list(run_ids)
+            clauses.append(f"run_id IN ({','.join('?' * len(run_ids))})")
+            args += run_ids
+        for column, value in (('strategy', strategy), ('params_hash', params_hash), ('contract', contract)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                args.append(value)
+        if date_from is not None:
+            clauses.append('trade_date >= ?')
+            args.append(str(date_from))
+        if date_to is not None:
+            clauses.append('trade_date <= ?')
+            args.append(str(date_to))
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', args
+
+    def runs(self) -> pd.DataFrame:
+        return pd.read_sql_query('SELECT * FROM runs ORDER BY started', self.conn)
+
+    def contract_results(self, **filters) -> pd.DataFrame:
+        """Per-contract rows; filters: run_ids, strategy, params_hash, contract, date_from, date_to."""
+        where, args = self._where(**filters)
+        return pd.read_sql_query(
+            f'SELECT * FROM contract_results{where} ORDER BY run_id, trade_date, table_name, contract',
+            self.conn, params=args)
+
+    def trades(self, **filters) -> pd.DataFrame:
+        """Per-trade rows; same filters as contract_results."""
+        where, args = self._where(**filters)
+        return pd.read_sql_query(
+            f'SELECT * FROM trades{where} ORDER BY run_id, trade_date, table_name, contract, trade_no',
+            self.conn, params=args)
+
+    def stats(self, by: str = 'strike_distance', bucket: float = 100.0, **filters) -> pd.DataFrame:
+        """
+        Aggregates per group of contract results: contracts, trades, total/average PnL, win
+        rate (winning trades / trades) and max drawdown of the group's running PnL in date
+        order. by is one of GROUPINGS; strike distances (points out of the money at selection,
+        negative in the money) are grouped in buckets of `bucket` points.
+        """
+        if by not in GROUPINGS:
+            raise ValueError(f'Unknown grouping {by!r}; one of {sorted(GROUPINGS)}')
+        key = GROUPINGS[by]
+        where, args = self._where(**filters)
+        if by == 'strike_distance':
+            bucket = float(bucket)
+            if not math.isfinite(bucket) or bucket <= 0:
+                raise ValueError(f'bucket must be a positive number of points, got {bucket!r}')
+            key = 'ROUND(strike_distance / ?) * ?'
+            args = [bucket, bucket] + args
+        order = 'trade_date, table_name, contract, run_id'
+        sql = f"""
+            WITH g AS (
+                SELECT {key} AS grp, pnl, trades, wins, {order}
+                FROM contract_results{where}
+            ), r AS (
+                SELECT grp, pnl, trades, wins,
+                       SUM(pnl) OVER (PARTITION BY grp ORDER BY {order} ROWS UNBOUNDED PRECEDING) AS cum,
+                       ROW_NUMBER() OVER (PARTITION BY grp ORDER BY {order}) AS seq
+                FROM g
+            ), d AS (
+                SELECT *, MAX(MAX(cum) OVER (PARTITION BY grp ORDER BY seq ROWS UNBOUNDED PRECEDING), 0) - cum AS dd
+                FROM r
+            )
+            SELECT grp AS {by}, COUNT(*) AS contracts, SUM(trades) AS trades, SUM(pnl) AS pnl,
+                   AVG(pnl) AS avg_pnl, 1.0 * SUM(wins) / NULLIF(SUM(trades), 0) AS win_rate,
+                   MAX(dd) AS max_drawdown
+            FROM d GROUP BY grp ORDER BY grp
+        """
+        return pd.read_sql_query(sql, self.conn, params=args)
@@ -0,0 +1,118 @@
+"""
+Append-only journal of finished backtest work, so interrupted or repeated runs resume.
+
+Every finished (table, contract, params) result is appended as one JSON line together with a
+content hash of the price data it was computed from; the line is flushed and fsynced before
+the run moves on, so a crash loses at most the contract in progress. When all selected
+contracts of a table are done, a table line records the table's signature and the contracts
+chosen. OptionAlgoMain uses the source content checksum (DBConnector/MarketDataStore
+.table_checksum) as the signature, or with 'journal_fast' the cheaper fingerprint (row count
+and columns, table_fingerprint), which cannot see values edited in place with the same shape.
+
+On the next run a table whose signature and params match is taken from the journal without
+being loaded. A table whose signature changed is loaded, and each contract is recomputed
+only if its content hash differs from the journaled one. OptionAlgoMain's 'journal_verify'
+option loads every table and relies on the content hashes alone.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run_journal.jsonl')
+
+
+def params_hash(params: dict) -> str:
+    blob = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()[:16]
+
+
+def content_hash(df: pd.DataFrame, columns=None) -> str:
+    """Hash of the values (not the dtype or memory layout) of the given columns."""
+    data = df if columns is None else df[list(columns)]
+    row_hashes = pd.util.hash_pandas_object(data, index=False)
+    digest = hashlib.sha1(row_hashes.to_numpy().tobytes())
+    digest.update(json.dumps([str(c) for c in data.columns]).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class RunJournal:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self._results = {}   # (table, contract, params_hash) -> entry
+        self._tables = {}    # (table, params_hash) -> entry
+        self._file = None
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a crash can leave the last line half written; everything before it is valid
+                    continue
+                if entry.get('kind') == 'result':
+                    self._results[(entry['table'], entry['contract'], entry['params'])] = entry
+                elif entry.get('kind') == 'table':
+                    self._tables[(entry['table'], entry['params'])] = entry
+
+    def _append(self, entry):
+        if not self.path:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry, default=float) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def table_results(self, table, fingerprint, phash):
+        """Journaled result rows of a finished, unchanged table, or None if it must be (re)run."""
+        entry = self._tables.get((str(table), phash))
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return None
+        rows = []
+        for contract in entry['contracts']:
+            result = self._results.get((str(table), contract, phash))
+            if result is None:
+                return None
+            rows.append(result['result'])
+        return rows
+
+    def lookup(self, table, contract, phash, data_hash):
+        """Journaled result dict for one contract if its input data is unchanged, else None."""
+        entry = self._results.get((str(table), contract, phash))
+        if entry is None or entry['data_hash'] != data_hash:
+            return None
+        return entry['result']
+
+    def record(self, table, contract, phash, data_hash, result: dict):
+        entry = {'kind': 'result', 'table': str(table), 'contract': contract, 'params': phash,
+                 'data_hash': data_hash, 'result': result}
+        self._results[(str(table), contract, phash)] = entry
+        self._append(entry)
+
+    def record_table(self, table, fingerprint, phash, contracts):
+        entry = {'kind': 'table', 'table': str(table), 'params': phash, 'fingerprint': fingerprint,
+                 'contracts': list(contracts)}
+        self._tables[(str(table), phash)] = entry
+        self._append(entry)
+
+    def compact(self):
+        """Rewrite the journal with only the latest entry per key (atomic replace)."""
+        if not self.path:
+            return None
+        self.close()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in list(self._results.values()) + list(self._tables.values()):
+                f.write(json.dumps(entry, default=float) + '\n')
+        os.replace(tmp_path, self.path)
+        return self.path
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
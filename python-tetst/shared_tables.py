@@ -0,0 +1,232 @@
+"""
+Shared-memory copies of the day tables for worker processes.
+
+The parent loads each table once and publishes it into one POSIX shared-memory segment;
+workers attach to the segment by name and get a DataFrame whose columns are read-only numpy
+views on the shared pages, so nothing is pickled or copied per worker.
+
+Segment layout:
+
+    magic (8 bytes) | header length (uint64) | JSON header | column blocks (64-byte aligned)
+
+The header records the table name, row count and, per column, its dtype, byte offset and
+(for categoricals) the category labels, so a worker needs nothing but the segment name.
+
+Cleanup: SharedTableSet unlinks its segments on close(), on interpreter exit and on SIGTERM.
+If the publisher is killed outright, the multiprocessing resource tracker unlinks them once
+the last process using it exits. Segment names carry the publisher's pid, and
+cleanup_orphans() removes segments whose publisher is no longer running, for the case where
+the tracker died too.
+"""
+import atexit
+import itertools
+import json
+import os
+import signal
+import struct
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from market_store import _to_array
+
+MAGIC = b'OASHM\x00\x01\x00'
+SEGMENT_PREFIX = 'optalgo_'
+ALIGN = 64
+SHM_DIR = '/dev/shm'
+
+_counter = itertools.count()
+_attached = {}   # segment name -> (SharedMemory, DataFrame), kept for the worker's lifetime
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _column_arrays(df: pd.DataFrame):
+    """(name, array, categories) per column; categoricals are stored as their integer codes."""
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            yield str(col), series.cat.codes.to_numpy(), [str(c) for c in series.cat.categories]
+        else:
+            yield str(col), np.ascontiguousarray(_to_array(series)), None
+
+
+def _build_header(table_name, rows, columns):
+    """Assign column offsets until the header (which holds them) fits before the first block."""
+    data_start = ALIGN
+    while True:
+        offset = data_start
+        entries = []
+        for name, arr, categories in columns:
+            entry = {'name': name, 'dtype': arr.dtype.str, 'offset': offset, 'nbytes': arr.nbytes}
+            if categories is not None:
+                entry['categories'] = categories
+            entries.append(entry)
+            offset = _align(offset + arr.nbytes)
+        header = json.dumps({'table': str(table_name), 'rows': rows, 'columns': entries}).encode('utf-8')
+        needed = _align(len(MAGIC) + 8 + len(header))
+        if needed <= data_start:
+            return header, max(offset, data_start)
+        data_start = needed
+
+
+def _publisher_pid(segment_name):
+    try:
+        return int(segment_name[len(SEGMENT_PREFIX):].split('_', 1)[0])
+    except ValueError:
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedTableSet:
+    """
+    Publisher side. Keeps the segments it created and unlinks them when closed.
+
+        with SharedTableSet() as shared:
+            for name, df in db.iter_tables(names):
+                shared.publish(name, df)
+            handles = shared.handles()        # {table name: segment name}, cheap to pickle
+    """
+
+    def __init__(self):
+        self._segments = {}   # table name -> SharedMemory
+        self._closed = False
+        # forked pool workers inherit this object and the SIGTERM handler; only the publisher unlinks
+        self._owner_pid = os.getpid()
+        atexit.register(self.close)
+        self._previous_sigterm = None
+        try:
+            self._previous_sigterm = signal.signal(signal.SIGTERM, self._on_sigterm)
+        except ValueError:
+            # not the main thread; atexit and the resource tracker still apply
+            pass
+
+    def _on_sigterm(self, signum, frame):
+        previous = self._previous_sigterm
+        if os.getpid() != self._owner_pid:
+            # a forked worker: act as if this handler had never been installed
+            signal.signal(signum, previous if previous is not None else signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+            return
+        self.close()
+        if callable(previous):
+            previous(signum, frame)
+        else:
+            sys.exit(128 + signum)
+
+    def publish(self, table_name, df: pd.DataFrame) -> str:
+        """Copy one table into a new segment and return the segment name."""
+        if table_name in self._segments:
+            return self._segments[table_name].name
+        columns = list(_column_arrays(df))
+        header, size = _build_header(table_name, len(df), columns)
+        name = f'{SEGMENT_PREFIX}{os.getpid()}_{next(_counter)}'
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        buf = shm.buf
+        buf[:len(MAGIC)] = MAGIC
+        buf[len(MAGIC):len(MAGIC) + 8] = struct.pack('<Q', len(header))
+        buf[len(MAGIC) + 8:len(MAGIC) + 8 + len(header)] = header
+        for entry, (_, arr, _) in zip(json.loads(header)['columns'], columns):
+            view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=buf, offset=entry['offset'])
+            view[...] = arr
+            del view
+        del buf
+        self._segments[table_name] = shm
+        return name
+
+    def handles(self) -> dict:
+        return {table: shm.name for table, shm in self._segments.items()}
+
+    def nbytes(self) -> int:
+        return sum(shm.size for shm in self._segments.values())
+
+    def close(self):
+        if self._closed or os.getpid() != self._owner_pid:
+            return
+        self._closed = True
+        for shm in self._segments.values():
+            try:
+                shm.close()
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._segments.clear()
+        atexit.unregister(self.close)
+        if self._previous_sigterm is not None:
+            try:
+                signal.signal(signal.SIGTERM, self._previous_sigterm)
+            except ValueError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def attach_table(segment_name) -> pd.DataFrame:
+    """
+    Worker side: DataFrame over the shared segment without copying the data. Columns are
+    read-only; the segment stays mapped for the life of the process (cached per name).
+    """
+    cached = _attached.get(segment_name)
+    if cached is not None:
+        return cached[1]
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=segment_name, track=False)
+    else:
+        # registers with the publisher's resource tracker (inherited by pool workers), which
+        # already tracks this name, so the worker's exit does not unlink it
+        shm = shared_memory.SharedMemory(name=segment_name)
+    buf = shm.buf
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        shm.close()
+        raise ValueError(f'{segment_name} is not a shared table segment')
+    (header_len,) = struct.unpack('<Q', buf[len(MAGIC):len(MAGIC) + 8])
+    header = json.loads(bytes(buf[len(MAGIC) + 8:len(MAGIC) + 8 + header_len]))
+    data = {}
+    for entry in header['columns']:
+        dtype = np.dtype(entry['dtype'])
+        view = np.ndarray((header['rows'],), dtype=dtype, buffer=buf, offset=entry['offset'])
+        view.flags.writeable = False
+        if 'categories' in entry:
+            data[entry['name']] = pd.Categorical.from_codes(view, entry['categories'])
+        else:
+            data[entry['name']] = view
+    df = pd.DataFrame(data, copy=False)
+    _attached[segment_name] = (shm, df)
+    return df
+
+
+def cleanup_orphans(shm_dir=SHM_DIR) -> list:
+    """Unlink segments left behind by publishers that are no longer running. Returns their names."""
+    if not os.path.isdir(shm_dir):
+        return []
+    removed = []
+    for entry in os.listdir(shm_dir):
+        if not entry.startswith(SEGMENT_PREFIX):
+            continue
+        pid = _publisher_pid(entry)
+        if pid is None or _pid_alive(pid):
+            continue
+        try:
+            os.unlink(os.path.join(shm_dir, entry))
+            removed.append(entry)
+        except FileNotFoundError:
+            pass
+    return removed
@@ -0,0 +1,213 @@
+"""
+Chunk-wise indicators that carry their state across chunk boundaries.
+
+Each indicator has an update(chunk) method taking the next slice of a price series (numpy array)
+and returning the indicator values for exactly those rows, so a multi-month series can be fed
+one day table (or any chunk size) at a time in bounded memory. Feeding the chunks gives the
+same values, bit for bit, as one call on the whole series:
+
+  EMA/MACD     pandas ewm(adjust=False) re-seeded with the carried weighted mean (and the
+               NaN steps since the last observation, which decay its weight)
+  rolling      rolling_mean/rolling_std compute every window from its own values, so the
+               result does not depend on where the series was split; the carried state is
+               the last window-1 values. compute_indicators and the exit/stoploss manager use
+               the same functions, so the in-memory backtests match the chunked path.
+
+iter_column_chunks() reads one column of consecutive day tables from a DBConnector or a
+MarketDataStore, without loading the other columns.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _windows(x, window):
+    return sliding_window_view(np.asarray(x, dtype=float), window)
+
+
+def rolling_mean(x, window: int) -> np.ndarray:
+    """Mean of each full window ending at every row; NaN for the first window-1 rows or any NaN inside."""
+    x = np.asarray(x, dtype=float)
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = _windows(x, window).mean(axis=1)
+    return out
+
+
+def rolling_std(x, window: int, ddof: int = 1) -> np.ndarray:
+    """Sample standard deviation of each full window (ddof=1 like pandas)."""
+    x = np.asarray(x, dtype=float)
+    out = np.full(len(x), np.nan)
+    if len(x) >= window:
+        out[window - 1:] = _windows(x, window).std(axis=1, ddof=ddof)
+    return out
+
+
+class EMA:
+    def __init__(self, span: int):
+        self.span = span
+        self._last = np.nan     # weighted mean after the last observation
+        self._gap = 0           # NaN rows seen since that observation
+
+    def update(self, x) -> np.ndarray:
+        x = np.asarray(x)
+        if len(x) == 0:
+            return np.zeros(0)
+        if np.isnan(self._last):
+            prefix = np.zeros(0)
+        else:
+            prefix = np.r_[self._last, np.full(self._gap, np.nan)]
+        buf = np.r_[prefix, x.astype(float)]
+        out = pd.Series(buf).ewm(span=self.span, adjust=False).mean().to_numpy()[len(prefix):]
+        seen = np.flatnonzero(~np.isnan(x))
+        if len(seen):
+            self._last = out[seen[-1]]
+            self._gap = len(x) - 1 - seen[-1]
+        else:
+            self._gap += len(x)
+        return out
+
+
+class _Rolling:
+    def __init__(self, window: int):
+        self.window = window
+        self._tail = np.zeros(0)
+
+    def _extend(self, x):
+        buf = np.r_[self._tail, np.asarray(x, dtype=float)]
+        skip = len(self._tail)
+        self._tail = buf[max(len(buf) - (self.window - 1), 0):] if self.window > 1 else np.zeros(0)
+        return buf, skip
+
+
+class RollingMean(_Rolling):
+    def update(self, x) -> np.ndarray:
+        buf, skip = self._extend(x)
+        return rolling_mean(buf, self.window)[skip:]
+
+
+class RollingStd(_Rolling):
+    def __init__(self, window: int, ddof: int = 1):
+        super().__init__(window)
+        self.ddof = ddof
+
+    def update(self, x) -> np.ndarray:
+        buf, skip = self._extend(x)
+        return rolling_std(buf, self.window, self.ddof)[skip:]
+
+
+class _Diff:
+    """x[t] - x[t-1] across chunks (NaN for the very first row), in the input dtype like Series.diff."""
+
+    def __init__(self):
+        self._prev = None
+
+    def update(self, x) -> np.ndarray:
+        x = np.asarray(x)
+        if len(x) == 0:
+            return np.zeros(0, dtype=x.dtype)
+        prev = np.array([np.nan], dtype=x.dtype) if self._prev is None else self._prev
+        self._prev = x[-1:].copy()
+        return np.diff(np.r_[prev, x])
+
+
+class MACD:
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._fast = EMA(fast)
+        self._slow = EMA(slow)
+        self._signal = EMA(signal)
+
+    def update(self, x):
+        """Returns (macd_line, signal_line, histogram) for the chunk."""
+        line = self._fast.update(x) - self._slow.update(x)
+        signal = self._signal.update(line)
+        return line, signal, line - signal
+
+
+class RSI:
+    """RSI with simple moving averages of gains and losses (as in compute_indicators)."""
+
+    def __init__(self, period: int = 14):
+        self._diff = _Diff()
+        self._gain = RollingMean(period)
+        self._loss = RollingMean(period)
+
+    def update(self, x) -> np.ndarray:
+        delta = self._diff.update(x)
+        gain = np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0))
+        loss = np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0))
+        avg_gain = self._gain.update(gain)
+        avg_loss = self._loss.update(loss)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = avg_gain / avg_loss
+            return 100 - (100 / (1 + rs))
+
+
+class ATR:
+    """Average true range over `period` rows (simple mean, as exit_and_stoploss.calculate_atr)."""
+
+    def __init__(self, period: int = 14):
+        self._prev_close = np.nan
+        self._mean = RollingMean(period)
+
+    def update(self, high, low, close) -> np.ndarray:
+        # ranges in the input dtype, as pandas does for float32 price columns
+        high, low, close = (np.asarray(a) for a in (high, low, close))
+        if len(close) == 0:
+            return np.zeros(0)
+        prev = np.r_[np.array([self._prev_close], dtype=close.dtype), close[:-1]]
+        self._prev_close = close[-1]
+        # max over the three ranges skipping NaN, like DataFrame.max(axis=1)
+        tr = np.fmax(np.fmax(high - low, np.abs(high - prev)), np.abs(low - prev))
+        return self._mean.update(tr)
+
+
+class BollingerBands:
+    def __init__(self, window: int = 20, num_std: float = 2.0):
+        self.num_std = num_std
+        self._mean = RollingMean(window)
+        self._std = RollingStd(window)
+
+    def update(self, x):
+        """Returns (lower, middle, upper) for the chunk."""
+        mid = self._mean.update(x)
+        std = self._std.update(x)
+        return mid - self.num_std * std, mid, mid + self.num_std * std
+
+
+class StrategyIndicators:
+    """The compute_indicators() set (MACD, EMA trend filter, RSI) computed chunk by chunk."""
+
+    def __init__(self, params: dict):
+        self._macd = MACD(params['ema_fast'], params['ema_slow'], params['signal'])
+        self._trend = EMA(params['ema_trend'])
+        self._rsi = RSI(params['rsi_period'])
+
+    def update(self, close) -> dict:
+        close = np.asarray(close)
+        line, signal, hist = self._macd.update(close)
+        return {
+            'macd_line': line,
+            'signal_line': signal,
+            'macd_hist': hist,
+            'ema200': self._trend.update(close),
+            'rsi': self._rsi.update(close),
+        }
+
+
+def iter_column_chunks(source, table_names, column, chunksize=None):
+    """
+    Yield (table_name, values) for one column over consecutive day tables, reading only that
+    column (memory-mapped for MarketDataStore). Tables without the column are skipped.
+    With chunksize, each table is further split into slices of at most chunksize rows.
+    """
+    for name in table_names:
+        df = source.read_table(name, columns=[column])
+        if column not in df.columns:
+            continue
+        values = df[column].to_numpy()
+        if not chunksize:
+            yield name, values
+            continue
+        for start in range(0, len(values), chunksize):
+            yield name, values[start:start + chunksize]
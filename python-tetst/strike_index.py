@@ -0,0 +1,194 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+UNDERLYING_CANDIDATES = ['BANKNIFTY', 'banknifty', 'underlying', 'spot', 'base_price', 'underlying_price']
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'strike_index_cache.json')
+
+_CALL_RE = re.compile(r'^C(\d+)$')
+_PUT_RE = re.compile(r'^P(\d+)$')
+
+
+def detect_underlying_column(df: pd.DataFrame):
+    """Return the BankNifty/underlying column of a wide option table, or None."""
+    for cand in UNDERLYING_CANDIDATES:
+        if cand in df.columns:
+            return cand
+    # fallback: first numeric non-option column
+    for c in df.columns:
+        if pd.api.types.is_numeric_dtype(df[c]) and not str(c).startswith(('C', 'P')):
+            return c
+    return None
+
+
+class StrikeIndex:
+    """
+    Schema descriptor of one wide option table (one row per timestamp, one column per strike).
+    Holds the underlying column plus sorted call/put strike arrays and their column positions,
+    and answers strike queries with binary search instead of scanning column names.
+    """
+
+    def __init__(self, columns, underlying_col=None):
+        self.columns = [str(c) for c in columns]
+        self.underlying_col = underlying_col
+        calls = []
+        puts = []
+        for pos, col in enumerate(self.columns):
+            m = _CALL_RE.match(col)
+            if m:
+                calls.append((int(m.group(1)), pos))
+                continue
+            m = _PUT_RE.match(col)
+            if m:
+                puts.append((int(m.group(1)), pos))
+        calls.sort()
+        puts.sort()
+        self.call_strikes = np.array([s for s, _ in calls], dtype=np.int64)
+        self.call_positions = np.array([p for _, p in calls], dtype=np.int64)
+        self.put_strikes = np.array([s for s, _ in puts], dtype=np.int64)
+        self.put_positions = np.array([p for _, p in puts], dtype=np.int64)
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame):
+        return cls(df.columns, detect_underlying_column(df))
+
+    # Scalar queries
+    def nearest_strike(self, base_price, kind='C'):
+        """Strike closest to base_price among calls ('C') or puts ('P'), or None."""
+        strikes = self.call_strikes if kind == 'C' else self.put_strikes
+        if len(strikes) == 0:
+            return None
+        i = int(np.searchsorted(strikes, base_price))
+        if i == 0:
+            return int(strikes[0])
+        if i == len(strikes):
+            return int(strikes[-1])
+        lo, hi = strikes[i - 1], strikes[i]
+        return int(lo if base_price - lo <= hi - base_price else hi)
+
+    def atm_strike(self, base_price):
+        """ATM strike: the call strike nearest to base_price (falls back to puts)."""
+        strike = self.nearest_strike(base_price, 'C')
+        if strike is None:
+            strike = self.nearest_strike(base_price, 'P')
+        return strike
+
+    def otm_call(self, base_price, n=1):
+        """Call strike n steps above base_price (n=1 is the first strike strictly above), or None."""
+        i = int(np.searchsorted(self.call_strikes, base_price, side='right')) + n - 1
+        if n < 1 or i >= len(self.call_strikes):
+            return None
+        return int(self.call_strikes[i])
+
+    def otm_put(self, base_price, n=1):
+        """Put strike n steps below base_price (n=1 is the first strike strictly below), or None."""
+        i = int(np.searchsorted(self.put_strikes, base_price, side='left')) - n
+        if n < 1 or i < 0:
+            return None
+        return int(self.put_strikes[i])
+
+    def select_otm_columns(self, base_price, n=1):
+        """Return ([call column], [put column]) n strikes OTM, matching select_option_columns."""
+        c_strike = self.otm_call(base_price, n)
+        p_strike = self.otm_put(base_price, n)
+        c_cols = [f'C{c_strike}'] if c_strike is not None else []
+        p_cols = [f'P{p_strike}'] if p_strike is not None else []
+        return c_cols, p_cols
+
+    # Vectorized queries
+    def _otm_call_idx(self, base_prices, n):
+        idx = np.searchsorted(self.call_strikes, np.asarray(base_prices, dtype=float), side='right') + n - 1
+        return idx, idx < len(self.call_strikes)
+
+    def _otm_put_idx(self, base_prices, n):
+        idx = np.searchsorted(self.put_strikes, np.asarray(base_prices, dtype=float), side='left') - n
+        return idx, idx >= 0
+
+    @staticmethod
+    def _take(values, idx, valid):
+        out = np.full(idx.shape, -1, dtype=np.int64)
+        out[valid] = values[idx[valid]]
+        return out
+
+    def otm_call_strikes(self, base_prices, n=1):
+        """Vectorized otm_call over an array of base prices. Missing strikes are returned as -1."""
+        idx, valid = self._otm_call_idx(base_prices, n)
+        return self._take(self.call_strikes, idx, valid)
+
+    def otm_put_strikes(self, base_prices, n=1):
+        """Vectorized otm_put over an array of base prices. Missing strikes are returned as -1."""
+        idx, valid = self._otm_put_idx(base_prices, n)
+        return self._take(self.put_strikes, idx, valid)
+
+    def otm_call_positions(self, base_prices, n=1):
+        """Column positions of the OTM call for each base price (-1 when none)."""
+        idx, valid = self._otm_call_idx(base_prices, n)
+        return self._take(self.call_positions, idx, valid)
+
+    def otm_put_positions(self, base_prices, n=1):
+        """Column positions of the OTM put for each base price (-1 when none)."""
+        idx, valid = self._otm_put_idx(base_prices, n)
+        return self._take(self.put_positions, idx, valid)
+
+    # Persistence
+    def to_dict(self):
+        return {
+            'columns': self.columns,
+            'underlying_col': self.underlying_col,
+            'call_strikes': self.call_strikes.tolist(),
+            'call_positions': self.call_positions.tolist(),
+            'put_strikes': self.put_strikes.tolist(),
+            'put_positions': self.put_positions.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Restore the stored arrays directly; no column-name parsing on reload
+        index = cls.__new__(cls)
+        index.columns = list(data['columns'])
+        index.underlying_col = data.get('underlying_col')
+        for key in ('call_strikes', 'call_positions', 'put_strikes', 'put_positions'):
+            setattr(index, key, np.array(data[key], dtype=np.int64))
+        return index
+
+
+class StrikeIndexCache:
+    """
+    In-memory cache of StrikeIndex per table, persisted to a JSON file so the
+    descriptors are built only once per table across runs.
+    An entry is rebuilt if the table's columns changed since it was stored.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self._indexes = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                self._indexes = {name: StrikeIndex.from_dict(d) for name, d in data.items()}
+            except (json.JSONDecodeError, KeyError, TypeError):
+                print(f"Strike index cache {path} is unreadable, rebuilding.")
+                self._indexes = {}
+
+    def get(self, table_name, df: pd.DataFrame) -> StrikeIndex:
+        index = self._indexes.get(table_name)
+        if index is None or index.columns != [str(c) for c in df.columns]:
+            index = StrikeIndex.from_df(df)
+            self._indexes[table_name] = index
+            self._dirty = True
+        return index
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return None
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({name: idx.to_dict() for name, idx in self._indexes.items()}, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        return self.path
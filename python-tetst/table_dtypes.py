@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+# Text columns with at most this share of distinct values are stored as categoricals
+CATEGORY_MAX_RATIO = 0.5
+# Columns matched exactly (strike lookups), always kept as float64
+EXACT_COLUMNS = {'strike'}
+
+
+def optimize_table_dtypes(df: pd.DataFrame, price_dtype='float64', categorical=True) -> pd.DataFrame:
+    """
+    Cast a wide option table to compact dtypes in place, once, right after loading.
+    - float price columns (C<strike>, P<strike>, underlying) -> price_dtype
+    - object columns holding only numbers (e.g. DECIMAL prices) -> price_dtype
+    - strike columns -> float64 whatever price_dtype is
+    - integer columns (counters, epoch times) -> left unchanged
+    - low-cardinality text columns -> category (if categorical=True)
+    Datetime and bool columns are left as they are. price_dtype=None keeps numeric dtypes.
+    """
+    for col in df.columns:
+        series = df[col]
+        col_dtype = np.float64 if str(col).lower() in EXACT_COLUMNS else price_dtype
+        if pd.api.types.is_datetime64_any_dtype(series) or pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            continue
+        if pd.api.types.is_float_dtype(series):
+            if col_dtype is not None and series.dtype != col_dtype:
+                df[col] = series.astype(col_dtype)
+            continue
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            numeric = pd.to_numeric(series, errors='coerce')
+            if numeric.notna().sum() == series.notna().sum() and series.notna().any():
+                df[col] = numeric.astype(col_dtype or np.float64)
+            elif categorical and series.nunique(dropna=True) <= CATEGORY_MAX_RATIO * max(len(series), 1):
+                df[col] = series.astype('category')
+    return df
+
+
+def as_price_series(series: pd.Series) -> pd.Series:
+    """Return series as floats, casting only if it is not a float column already."""
+    if pd.api.types.is_float_dtype(series):
+        return series
+    return series.astype(float)
@@ -0,0 +1,124 @@
+"""
+Higher-timeframe (HTF) resampling stage for the per-minute option tables.
+
+MultiTimeframe builds OHLC bars of every premium column for each requested bar size
+(e.g. 5 and 15 minutes) in one vectorized pass per table, computes indicators on those bars
+on demand, and maps them back onto the base rows without lookahead: base row i only sees
+HTF bars that had closed by the end of minute i. Bars and indicator series are cached, so
+every contract and every parameter set that asks for the same (timeframe, indicator) reuses
+the same work.
+
+    htf = MultiTimeframe(df)
+    ema200_15m = htf.ema('C48000', 15, 200)   # aligned with df's rows
+"""
+import numpy as np
+import pandas as pd
+
+TIME_CANDIDATES = ('time', 'timestamp', 'datetime', 'date_time', 'Time', 'Timestamp')
+
+
+def minute_offsets(df: pd.DataFrame, time_col=None) -> np.ndarray:
+    """
+    Minutes since the first row's minute for every row. Uses the table's time column when there
+    is one (so gaps are respected), otherwise assumes one row per minute.
+    """
+    if time_col is None:
+        time_col = next((c for c in TIME_CANDIDATES if c in df.columns), None)
+    if time_col is not None:
+        col = df[time_col]
+        if not pd.api.types.is_datetime64_any_dtype(col):
+            # 'HH:MM' / 'HH:MM:SS' text or full timestamps
+            col = pd.to_datetime(col.astype(str), format='mixed', errors='coerce')
+        if col.notna().all():
+            minutes = col.to_numpy(dtype='datetime64[m]').astype(np.int64)
+            return minutes - minutes[0]
+    return np.arange(len(df), dtype=np.int64)
+
+
+class Bars:
+    """OHLC bars of one timeframe for a set of columns, plus the base-row -> last closed bar map."""
+
+    def __init__(self, columns, open_, high, low, close, last_closed):
+        self.columns = {c: i for i, c in enumerate(columns)}
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.last_closed = last_closed  # per base row: index of the latest closed bar, -1 if none
+
+    def __len__(self):
+        return self.close.shape[0]
+
+    def to_base(self, values: np.ndarray) -> np.ndarray:
+        """Map one value per HTF bar onto the base rows (forward-filled, NaN before the first close)."""
+        out = np.take(np.asarray(values, dtype=float), np.maximum(self.last_closed, 0), axis=0)
+        out[self.last_closed < 0] = np.nan
+        return out
+
+
+def resample_ohlc(values: np.ndarray, offsets: np.ndarray, minutes: int, columns=None) -> Bars:
+    """
+    OHLC of `minutes`-minute bars for a (rows, n) matrix of per-minute prices.
+    Bar k covers offsets [k*minutes, (k+1)*minutes) and counts as closed at the end of its last
+    minute, so the close of minute offset t can use bars with (k+1)*minutes <= t+1.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    bins = offsets // minutes
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    ends = np.r_[starts[1:], len(bins)]
+    open_ = values[starts]
+    close = values[ends - 1]
+    high = np.fmax.reduceat(values, starts, axis=0)
+    low = np.fmin.reduceat(values, starts, axis=0)
+    bar_ids = bins[starts]
+    last_complete_bin = (offsets + 1) // minutes - 1
+    last_closed = np.searchsorted(bar_ids, last_complete_bin, side='right') - 1
+    return Bars(columns if columns is not None else range(values.shape[1]), open_, high, low, close, last_closed)
+
+
+class MultiTimeframe:
+    """
+    Per-table HTF stage. Bars for a timeframe are built for all premium columns the first time
+    any contract asks for that timeframe; indicators are computed per (column, timeframe, name).
+    """
+
+    def __init__(self, df: pd.DataFrame, columns=None, time_col=None):
+        if columns is None:
+            columns = [c for c in df.columns if str(c)[:1] in ('C', 'P') and str(c)[1:].isdigit()]
+        self.columns = list(columns)
+        self._df = df
+        self._offsets = minute_offsets(df, time_col)
+        self._matrix = None
+        self._bars = {}
+        self._cache = {}
+
+    def _values(self):
+        if self._matrix is None:
+            # carry the last quote over missing minutes so bar closes are real prices
+            self._matrix = self._df[self.columns].astype(float).ffill().to_numpy()
+        return self._matrix
+
+    def bars(self, minutes: int) -> Bars:
+        bars = self._bars.get(minutes)
+        if bars is None:
+            bars = self._bars[minutes] = resample_ohlc(self._values(), self._offsets, minutes, self.columns)
+        return bars
+
+    def indicator(self, column, minutes: int, name: str, func) -> np.ndarray:
+        """
+        func(htf_close: pd.Series) -> pd.Series computed on the column's HTF closes and mapped
+        back to base rows. Cached under (column, minutes, name).
+        """
+        key = (column, minutes, name)
+        out = self._cache.get(key)
+        if out is None:
+            bars = self.bars(minutes)
+            close = pd.Series(bars.close[:, bars.columns[column]])
+            out = self._cache[key] = bars.to_base(func(close).to_numpy(dtype=float))
+        return out
+
+    def ema(self, column, minutes: int, span: int) -> np.ndarray:
+        return self.indicator(column, minutes, f'ema{span}',
+                              lambda close: close.ewm(span=span, adjust=False).mean())
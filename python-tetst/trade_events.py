@@ -0,0 +1,363 @@
+"""
+Structured, level-gated, buffered trade event log.
+
+Strategy loops call emit() with an event code and numeric fields instead of formatting and
+printing a line per trade. When the log level is above the event's level, emit() returns
+before anything is built or formatted. Accepted events are appended to an in-memory buffer
+and handed to the sinks in batches, optionally on a background writer thread.
+
+Sinks:
+  ConsoleSink  renders lines like the old prints (the default, so interactive runs look the same)
+  JsonlSink    one JSON object per event
+  BinarySink   fixed-width records (EVENT_DTYPE) behind a small header, readable with np.memmap
+
+Render a saved log later with:
+    python trade_events.py events.bin            # or events.jsonl
+    python trade_events.py events.bin --contract C48000
+"""
+import atexit
+import contextlib
+import enum
+import json
+import logging
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Levels follow the logging module
+DEBUG, INFO, WARNING = logging.DEBUG, logging.INFO, logging.WARNING
+OFF = logging.CRITICAL + 10
+
+
+class EventCode(enum.IntEnum):
+    OPEN_LONG = 1
+    OPEN_SHORT = 2
+    EXIT_LONG = 3
+    EXIT_SHORT = 4
+    STILL_OPEN_LONG = 5
+    STILL_OPEN_SHORT = 6
+    ORDER_PLACE = 20
+    ORDER_MODIFY = 21
+    ORDER_CANCEL = 22
+
+
+class Reason(enum.IntEnum):
+    NONE = 0
+    REVERSAL = 1
+    TARGET_CROSSED_ENTRY = 2
+    TRAILING_PROFIT = 3
+    BB_UPPER_PROFIT = 4
+    BB_MID_STOP_LONG = 5
+    BB_LOWER_PROFIT = 6
+    BB_MID_STOP_SHORT = 7
+
+
+REASON_TEXT = {
+    Reason.TARGET_CROSSED_ENTRY: {EventCode.EXIT_LONG: 'Target <= entry (forced)',
+                                  EventCode.EXIT_SHORT: 'Target >= entry (forced)'},
+    Reason.TRAILING_PROFIT: 'Trailing profit booked',
+    Reason.BB_UPPER_PROFIT: 'Profit: Price crossed above upper BB',
+    Reason.BB_MID_STOP_LONG: 'Stop: Price crossed below middle BB',
+    Reason.BB_LOWER_PROFIT: 'Profit: Price crossed below lower BB',
+    Reason.BB_MID_STOP_SHORT: 'Stop: Price crossed above middle BB',
+}
+
+# Trade events are INFO, order events DEBUG (they used to be logged at DEBUG too)
+EVENT_LEVEL = {code: INFO for code in EventCode}
+EVENT_LEVEL.update({EventCode.ORDER_PLACE: DEBUG, EventCode.ORDER_MODIFY: DEBUG, EventCode.ORDER_CANCEL: DEBUG})
+
+FIELDS = ('ts_ns', 'code', 'reason', 'side', 'index', 'qty', 'price', 'entry', 'target', 'pnl',
+          'total_pnl', 'contract')
+EVENT_DTYPE = np.dtype([
+    ('ts_ns', '<i8'),
+    ('code', '<u2'),
+    ('reason', '<u2'),
+    ('side', 'i1'),            # +1 buy, -1 sell, 0 n/a (order events)
+    ('_pad', 'u1', 3),
+    ('index', '<i4'),          # row index in the table, -1 if n/a
+    ('qty', '<i4'),
+    ('price', '<f8'),
+    ('entry', '<f8'),
+    ('target', '<f8'),
+    ('pnl', '<f8'),
+    ('total_pnl', '<f8'),
+    ('contract', 'S40'),
+])
+MAGIC = b'OAEVNT01'
+HEADER_SIZE = 64
+_HEADER = struct.Struct('<8sII')  # magic, version, record size
+VERSION = 1
+NAN = float('nan')
+
+
+def _side_name(code):
+    return 'LONG' if code in (EventCode.OPEN_LONG, EventCode.EXIT_LONG, EventCode.STILL_OPEN_LONG) else 'SHORT'
+
+
+def render(event: dict) -> str:
+    """Human-readable line for one event (same wording as the prints it replaced)."""
+    code = EventCode(event['code'])
+    reason = Reason(event.get('reason', 0))
+    c = event['contract']
+    if code in (EventCode.OPEN_LONG, EventCode.OPEN_SHORT):
+        how = ' (reversal)' if reason == Reason.REVERSAL else ''
+        return (f"[{c}] {_side_name(code)} opened{how} at {event['entry']:.2f}, qty={event['qty']}, "
+                f"profit_target={event['target']:.2f}, total PNL={event['total_pnl']:.2f}")
+    if code in (EventCode.EXIT_LONG, EventCode.EXIT_SHORT):
+        if reason == Reason.REVERSAL:
+            return (f"[{c}] {_side_name(code)} EXIT (reversal) at {event['price']:.2f} (entry {event['entry']:.2f}) "
+                    f"| PNL={event['pnl']:.2f} | Total PNL={event['total_pnl']:.2f}")
+        text = REASON_TEXT.get(reason, reason.name)
+        if isinstance(text, dict):
+            text = text[code]
+        return (f"[{c}] {_side_name(code)} EXIT at {event['price']:.2f} (entry {event['entry']:.2f}) | {text} "
+                f"| Trade PNL={event['pnl']:.2f} | Total PNL={event['total_pnl']:.2f}")
+    if code in (EventCode.STILL_OPEN_LONG, EventCode.STILL_OPEN_SHORT):
+        return f"[{c}] {_side_name(code)} still open. Entry: {event['entry']:.2f}"
+    side = {1: 'BUY', -1: 'SELL'}.get(event.get('side', 0), '')
+    action = code.name.split('_', 1)[1].lower()
+    parts = [f"Order {action} {c}", side, f"qty={event['qty']}" if event['qty'] else '',
+             f"price={event['price']:.2f}" if event['price'] == event['price'] else '']
+    return ' '.join(p for p in parts if p)
+
+
+def _event_dict(rec) -> dict:
+    contract = rec[11]
+    return {
+        'ts_ns': int(rec[0]), 'code': int(rec[1]), 'reason': int(rec[2]), 'side': int(rec[3]),
+        'index': int(rec[4]), 'qty': int(rec[5]), 'price': float(rec[6]), 'entry': float(rec[7]),
+        'target': float(rec[8]), 'pnl': float(rec[9]), 'total_pnl': float(rec[10]),
+        'contract': contract.decode('utf-8', 'replace') if isinstance(contract, bytes) else contract,
+    }
+
+
+class ConsoleSink:
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write_batch(self, batch):
+        stream = self.stream or sys.stdout
+        stream.write(''.join(render(_event_dict(rec)) + '\n' for rec in batch))
+        stream.flush()
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write_batch(self, batch):
+        self._file.write(''.join(json.dumps(_event_dict(rec)) + '\n' for rec in batch))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BinarySink:
+    def __init__(self, path):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'ab')
+        if new:
+            self._file.write(_HEADER.pack(MAGIC, VERSION, EVENT_DTYPE.itemsize).ljust(HEADER_SIZE, b'\0'))
+
+    def write_batch(self, batch):
+        arr = np.zeros(len(batch), dtype=EVENT_DTYPE)
+        for name, column in zip(FIELDS, zip(*batch)):
+            if name == 'contract':
+                column = [c.encode('utf-8')[:40] for c in column]
+            arr[name] = column
+        self._file.write(arr.tobytes())
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def open_events(path) -> np.ndarray:
+    """Memory-map a BinarySink file as an EVENT_DTYPE array."""
+    with open(path, 'rb') as f:
+        magic, version, size = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC or size != EVENT_DTYPE.itemsize:
+        raise ValueError(f'{path} is not a version {VERSION} trade event log')
+    if os.path.getsize(path) == HEADER_SIZE:
+        return np.zeros(0, dtype=EVENT_DTYPE)
+    return np.memmap(path, dtype=EVENT_DTYPE, mode='r', offset=HEADER_SIZE)
+
+
+def read_events(path):
+    """Yield event dicts from a .jsonl or binary event log."""
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    for rec in open_events(path).tolist():
+        yield _event_dict(rec[:4] + rec[5:])  # drop _pad
+
+
+class EventLog:
+    """
+    level: events below it are dropped before any work is done (OFF drops everything)
+    sinks: objects with write_batch(list_of_tuples) and close()
+    buffer_size: events held before a batch is handed to the sinks
+    async_write: hand batches to a background thread instead of writing inline
+    """
+
+    def __init__(self, level=INFO, sinks=None, buffer_size=1024, async_write=False):
+        self.level = level
+        self.sinks = [ConsoleSink()] if sinks is None else list(sinks)
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._queue = None
+        self._writer = None
+        if async_write:
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._write_loop, name='trade-events', daemon=True)
+            self._writer.start()
+
+    def enabled_for(self, code) -> bool:
+        return EVENT_LEVEL[code] >= self.level
+
+    def emit(self, code, contract, price=NAN, entry=NAN, qty=0, target=NAN, pnl=NAN, total_pnl=NAN,
+             reason=Reason.NONE, index=-1, side=0) -> None:
+        if EVENT_LEVEL[code] < self.level:
+            return
+        rec = (time.time_ns(), int(code), int(reason), side, index, int(qty), price, entry,
+               NAN if target is None else target, pnl, total_pnl, str(contract))
+        with self._lock:
+            self._buffer.append(rec)
+            if len(self._buffer) < self.buffer_size:
+                return
+            batch, self._buffer = self._buffer, []
+        self._dispatch(batch)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._dispatch(batch)
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        for sink in self.sinks:
+            sink.close()
+
+    def _dispatch(self, batch):
+        if self._queue is not None:
+            self._queue.put(batch)
+        else:
+            self._write(batch)
+
+    def _write(self, batch):
+        for sink in self.sinks:
+            try:
+                sink.write_batch(batch)
+            except Exception:
+                logging.getLogger(__name__).exception('Trade event sink %r failed', sink)
+
+    def _write_loop(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                self._write(batch)
+            finally:
+                self._queue.task_done()
+
+
+def _level_from_env():
+    name = os.environ.get('OPTIONALGO_EVENT_LEVEL', 'INFO').upper()
+    if name == 'OFF':
+        return OFF
+    level = logging.getLevelName(name)
+    return level if isinstance(level, int) else INFO
+
+
+# Console output is written per event by default so it interleaves with other prints;
+# configure() a file sink and a larger buffer for sweeps
+_log = EventLog(level=_level_from_env(), buffer_size=1)
+atexit.register(lambda: _log.close())
+
+
+def configure(level=INFO, sinks=None, buffer_size=1024, async_write=False) -> EventLog:
+    """Replace the process-wide event log; the old one is flushed and closed."""
+    global _log
+    old = _log
+    _log = EventLog(level, sinks, buffer_size, async_write)
+    old.close()
+    return _log
+
+
+def get_log() -> EventLog:
+    return _log
+
+
+def set_level(level) -> None:
+    _log.level = level
+
+
+def enabled_for(code) -> bool:
+    return EVENT_LEVEL[code] >= _log.level
+
+
+@contextlib.contextmanager
+def at_level(level):
+    """Temporarily change the level, e.g. `with at_level(OFF):` around a parameter sweep."""
+    log = _log
+    old, log.level = log.level, level
+    try:
+        yield log
+    finally:
+        log.level = old
+
+
+def emit(code, contract, price=NAN, entry=NAN, qty=0, target=NAN, pnl=NAN, total_pnl=NAN,
+         reason=Reason.NONE, index=-1, side=0) -> None:
+    log = _log
+    if EVENT_LEVEL[code] < log.level:
+        return
+    log.emit(code, contract, price, entry, qty, target, pnl, total_pnl, reason, index, side)
+
+
+def flush() -> None:
+    _log.flush()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Render a trade event log as text')
+    parser.add_argument('path', help='.jsonl or binary event log')
+    parser.add_argument('--contract', help='only events whose contract contains this')
+    parser.add_argument('--code', action='append', help='only these event codes (e.g. EXIT_LONG)')
+    args = parser.parse_args(argv)
+    codes = {EventCode[c].value for c in args.code} if args.code else None
+    for ev in read_events(args.path):
+        if args.contract and args.contract not in ev['contract']:
+            continue
+        if codes and ev['code'] not in codes:
+            continue
+        ts = time.strftime('%H:%M:%S', time.localtime(ev['ts_ns'] / 1e9))
+        print(f"{ts} {render(ev)}")
+
+
+if __name__ == '__main__':
+    main()
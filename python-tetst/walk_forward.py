@@ -0,0 +1,186 @@
+"""
+Walk-forward optimization of the process_option_data strategy over the day tables.
+
+The ordered list of day tables is split into rolling folds of `train_size` tables followed
+by `test_size` tables. For each fold every parameter combination from the grid is scored on
+the train tables, the best one is re-run on the test tables, and both scores go into a
+fold-by-fold report. Folds run in a process pool. Each worker opens the data source itself
+(the columnar store is memory-mapped, so nothing is pickled across) and keeps loaded tables,
+selected contracts and indicator series cached for the folds it runs. With shared_memory=True
+the parent reads every table once into shared memory (see shared_tables.py) and the workers
+attach to it instead of each querying the database.
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from process_option_data import process_option_data, DEFAULT_PARAMS
+from strike_index import StrikeIndex
+from timeframes import MultiTimeframe
+import trade_events
+
+# Per-process caches, filled lazily inside each worker
+_source = None
+_tables = {}
+_contracts = {}
+_indicators = {}
+_htf = {}
+
+
+def param_grid(grid: dict) -> list[dict]:
+    """Expand {'rsi_upper': [60, 70], 'target_pct': [0.005, 0.01]} into a list of param dicts."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def rolling_folds(table_names, train_size, test_size, step=None):
+    """Return [(train_names, test_names), ...] rolling forward by `step` tables (default test_size)."""
+    step = step or test_size
+    folds = []
+    start = 0
+    while start + train_size + test_size <= len(table_names):
+        train = table_names[start:start + train_size]
+        test = table_names[start + train_size:start + train_size + test_size]
+        folds.append((list(train), list(test)))
+        start += step
+    return folds
+
+
+def _open_source(config):
+    if config.get('store_path'):
+        from market_store import MarketDataStore
+        return MarketDataStore(config)
+    from db_connector import DBConnector
+    return DBConnector(config)
+
+
+def _load(config, name):
+    global _source
+    if name not in _tables:
+        shared = config.get('shared_tables')
+        if shared and name in shared:
+            from shared_tables import attach_table
+            _tables[name] = attach_table(shared[name])
+            return _tables[name]
+        if _source is None:
+            _source = _open_source(config)
+        _tables[name] = _source.read_table(name)
+    return _tables[name]
+
+
+def _select_contracts(name, df):
+    """OTM call/put just around the underlying at row 30, as in OptionAlgoMain.run."""
+    if name not in _contracts:
+        index = StrikeIndex.from_df(df)
+        cols = []
+        if index.underlying_col is not None and len(df) >= 30:
+            c_cols, p_cols = index.select_otm_columns(float(df[index.underlying_col].iloc[29]))
+            cols = c_cols + p_cols
+        _contracts[name] = cols
+    return _contracts[name]
+
+
+def _htf_stage(name, df, cols):
+    # higher-timeframe bars are shared by every parameter set evaluated on the table
+    if name not in _htf:
+        _htf[name] = MultiTimeframe(df, columns=cols)
+    return _htf[name]
+
+
+def evaluate(config, table_names, params) -> float:
+    """Total PnL of the strategy with `params` over the given tables."""
+    total = 0.0
+    for name in table_names:
+        df = _load(config, name)
+        cols = _select_contracts(name, df)
+        if not cols:
+            continue
+        table_name_clean = name.strip()[:20] if isinstance(name, str) else name
+        # per-trade events are noise across a sweep
+        with trade_events.at_level(trade_events.OFF):
+            res = process_option_data(df, table_name_clean, cols, params=params,
+                                      save_details=False, indicator_cache=_indicators, cache_key=name,
+                                      htf=_htf_stage(name, df, cols))
+        total += float(res['PnL'].sum())
+    return total
+
+
+def run_fold(config, fold_no, train, test, grid):
+    """Optimize on `train`, evaluate the winner on `test`. Runs inside a worker process."""
+    scores = [(evaluate(config, train, params), i) for i, params in enumerate(grid)]
+    best_score, best_i = max(scores)
+    best = dict(DEFAULT_PARAMS, **grid[best_i])
+    test_pnl = evaluate(config, test, grid[best_i])
+    default_test_pnl = evaluate(config, test, {})
+    row = {
+        'fold': fold_no,
+        'train_start': train[0],
+        'train_end': train[-1],
+        'test_start': test[0],
+        'test_end': test[-1],
+        'train_pnl': best_score,
+        'test_pnl': test_pnl,
+        'default_test_pnl': default_test_pnl,
+    }
+    row.update({f'param_{k}': best[k] for k in grid[best_i]})
+    return row
+
+
+class WalkForwardRunner:
+    def __init__(self, config, grid: dict, train_size=20, test_size=5, step=None, workers=None,
+                 shared_memory=False):
+        self.config = config
+        self.shared_memory = shared_memory
+        self.grid = param_grid(grid)
+        self.train_size = train_size
+        self.test_size = test_size
+        self.step = step
+        self.workers = workers or os.cpu_count() or 1
+
+    def run(self) -> pd.DataFrame:
+        table_names = _open_source(self.config).list_tables()
+        folds = rolling_folds(table_names, self.train_size, self.test_size, self.step)
+        if not folds:
+            raise ValueError(f'Need at least {self.train_size + self.test_size} tables, found {len(table_names)}')
+        print(f"Walk-forward: {len(folds)} folds x {len(self.grid)} parameter sets on {self.workers} workers")
+        if self.workers <= 1:
+            rows = [run_fold(self.config, i, tr, te, self.grid) for i, (tr, te) in enumerate(folds)]
+        elif self.shared_memory:
+            from shared_tables import SharedTableSet, cleanup_orphans
+            cleanup_orphans()
+            used = sorted({n for tr, te in folds for n in tr + te}, key=table_names.index)
+            with SharedTableSet() as shared:
+                for name, df in _open_source(self.config).iter_tables(used):
+                    shared.publish(name, df)
+                print(f"Shared {len(used)} tables ({shared.nbytes() / 1e6:.1f} MB) with the workers")
+                rows = self._run_pool(folds, dict(self.config, shared_tables=shared.handles()))
+        else:
+            rows = self._run_pool(folds, self.config)
+        report = pd.DataFrame(rows)
+        print(report)
+        return report
+
+    def _run_pool(self, folds, config):
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(run_fold, config, i, tr, te, self.grid)
+                       for i, (tr, te) in enumerate(folds)]
+            return [f.result() for f in futures]
+
+
+if __name__ == "__main__":
+    from manage_reports import save_walk_forward_report
+    config = {
+        'user': 'root',
+        'password': 'hindus',
+        'host': 'localhost',
+        'database': 'market_data',
+    }
+    grid = {
+        'rsi_upper': [60, 70],
+        'rsi_lower': [30, 40],
+        'target_pct': [0.005, 0.01],
+    }
+    report = WalkForwardRunner(config, grid, train_size=20, test_size=5).run()
+    save_walk_forward_report(report)
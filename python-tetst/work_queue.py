@@ -0,0 +1,406 @@
+"""
+Durable work queue for running parameter sweeps on many worker processes and machines.
+
+A coordinator splits a sweep into (table, contract, params) units and enqueues them in a
+SQLite file; any number of workers, on this machine or on others that mount the same
+filesystem, claim units under a lease, run them with process_option_data and write the
+result back:
+
+    queue = WorkQueue('/shared/sweeps.db')
+    plan_sweep(queue, 'sweep-2024-06', config, grid={'rsi_upper': [60, 70]})
+    run_worker('/shared/sweeps.db', config)          # on every node, as many as it has cores
+    queue.results('sweep-2024-06')
+
+Claiming is one IMMEDIATE transaction, so a unit is handed to one worker at a time. A worker
+that dies stops renewing its lease and the unit is handed out again once the lease runs out;
+after max_attempts failures a unit is marked failed. Enqueueing and completing are
+idempotent: units are unique per (run_id, table, contract, params hash), and a result is
+only written while the unit is not done yet, so a unit finished twice by a worker whose lease
+expired keeps the first result (both are computed from the same data).
+
+Workers claim up to `batch` units of one table at a time and keep loaded tables, indicator
+series and higher-timeframe bars cached as the walk-forward workers do (see walk_forward.py).
+
+The queue uses WAL journaling by default, which needs every process on one host. On a
+network filesystem (NFS, SMB) pass wal=False to use the rollback journal, whose file locks
+work across machines.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from multiprocessing import Process
+from typing import Optional
+
+import pandas as pd
+
+from process_option_data import process_option_data, DEFAULT_PARAMS
+from run_journal import params_hash
+from strike_index import StrikeIndex
+import instrumentation
+import trade_events
+import walk_forward
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    contract TEXT NOT NULL,
+    params TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated REAL,
+    UNIQUE (run_id, table_name, contract, params_hash)
+);
+CREATE INDEX IF NOT EXISTS units_claim ON units (run_id, status, table_name);
+"""
+
+
+class WorkQueue:
+    def __init__(self, path: str, wal: bool = True, timeout: float = 60.0,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        # autocommit mode; transactions are opened explicitly where they matter
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()   # the lease renewal thread shares the connection
+        if wal:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL' if wal else 'PRAGMA synchronous=FULL')
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, sql, args=()):
+        with self._lock:
+            return self.conn.execute(sql, args).rowcount
+
+    def enqueue(self, run_id: str, units) -> int:
+        """Add (table, contract, params) units to run_id; units already queued are skipped. Returns rows added."""
+        rows = [(run_id, str(table), str(contract), json.dumps(params, sort_keys=True, default=str),
+                 params_hash(params), time.time())
+                for table, contract, params in units]
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO units (run_id, table_name, contract, params, params_hash, updated) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', rows)
+                added = self.conn.total_changes - before
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return added
+
+    def claim(self, worker: str, run_id: Optional[str] = None, limit: int = 1,
+              lease_s: float = DEFAULT_LEASE_SECONDS) -> list[dict]:
+        """
+        Lease up to `limit` runnable units (pending, or leased with an expired lease) of one
+        table to `worker`. Returns dicts with id, run_id, table, contract and params; [] when
+        nothing is runnable. Expired leases already at max_attempts are marked failed.
+        """
+        now = time.time()
+        run_filter, args = ('AND run_id = ?', (run_id,)) if run_id else ('', ())
+        runnable = (f"(status = '{PENDING}' OR (status = '{LEASED}' AND lease_until < ?)) "
+                    f"AND attempts < ? {run_filter}")
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                # a worker that died on the last attempt leaves a lease nobody may reclaim
+                self.conn.execute(
+                    f"UPDATE units SET status = '{FAILED}', error = 'lease expired', lease_until = NULL, updated = ? "
+                    f"WHERE status = '{LEASED}' AND lease_until < ? AND attempts >= ? {run_filter}",
+                    (now, now, self.max_attempts) + args)
+                first = self.conn.execute(
+                    f'SELECT run_id, table_name FROM units WHERE {runnable} ORDER BY id LIMIT 1',
+                    (now, self.max_attempts) + args).fetchone()
+                if first is None:
+                    self.conn.execute('COMMIT')
+                    return []
+                rows = self.conn.execute(
+                    f'SELECT id, run_id, table_name, contract, params FROM units '
+                    f'WHERE {runnable} AND run_id = ? AND table_name = ? ORDER BY id LIMIT ?',
+                    (now, self.max_attempts) + args + (first[0], first[1], limit)).fetchall()
+                self.conn.executemany(
+                    f"UPDATE units SET status = '{LEASED}', worker = ?, lease_until = ?, "
+                    f"attempts = attempts + 1, updated = ? WHERE id = ?",
+                    [(worker, now + lease_s, now, r[0]) for r in rows])
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return [{'id': r[0], 'run_id': r[1], 'table': r[2], 'contract': r[3], 'params': json.loads(r[4])}
+                for r in rows]
+
+    def renew(self, worker: str, unit_ids, lease_s: float = DEFAULT_LEASE_SECONDS) -> int:
+        """Extend the worker's leases on unit_ids; returns how many it still holds."""
+        ids = list(unit_ids)
+        if not ids:
+            return 0
+        marks = ','.join('?' * len(ids))
+        return self._write(
+            f"UPDATE units SET lease_until = ? WHERE status = '{LEASED}' AND worker = ? AND id IN ({marks})",
+            [time.time() + lease_s, worker] + ids)
+
+    def complete(self, unit_id: int, worker: str, result: dict) -> bool:
+        """Store a unit's result. False if it was already done (by another worker after a lease expiry)."""
+        return self._write(
+            f"UPDATE units SET status = '{DONE}', worker = ?, result = ?, error = NULL, lease_until = NULL, "
+            f"updated = ? WHERE id = ? AND status != '{DONE}'",
+            (worker, json.dumps(result, default=float), time.time(), unit_id)) == 1
+
+    def fail(self, unit_id: int, worker: str, error: str) -> None:
+        """Release a unit after an error; it is retried until max_attempts, then marked failed."""
+        self._write(
+            f"UPDATE units SET status = CASE WHEN attempts >= ? THEN '{FAILED}' ELSE '{PENDING}' END, "
+            f"error = ?, lease_until = NULL, updated = ? "
+            f"WHERE id = ? AND worker = ? AND status = '{LEASED}'",
+            (self.max_attempts, error, time.time(), unit_id, worker))
+
+    def release(self, worker: str, unit_ids) -> None:
+        """Hand units back without counting the attempt (worker shutting down)."""
+        ids = list(unit_ids)
+        if not ids:
+            return
+        marks = ','.join('?' * len(ids))
+        self._write(
+            f"UPDATE units SET status = '{PENDING}', attempts = MAX(attempts - 1, 0), lease_until = NULL "
+            f"WHERE status = '{LEASED}' AND worker = ? AND id IN ({marks})", [worker] + ids)
+
+    def retry_failed(self, run_id: str) -> int:
+        """Put a run's failed units back in the queue with a fresh attempt count."""
+        return self._write(
+            f"UPDATE units SET status = '{PENDING}', attempts = 0, error = NULL "
+            f"WHERE run_id = ? AND status = '{FAILED}'", (run_id,))
+
+    def progress(self, run_id: str) -> dict:
+        """
+        {'pending': n, 'leased': n, 'done': n, 'failed': n} for the run. Expired leases at
+        max_attempts count as failed even before the next claim() marks them.
+        """
+        counts = dict.fromkeys((PENDING, LEASED, DONE, FAILED), 0)
+        for status, n in self.conn.execute(
+                f"SELECT CASE WHEN status = '{LEASED}' AND lease_until < ? AND attempts >= ? "
+                f"THEN '{FAILED}' ELSE status END AS s, COUNT(*) FROM units WHERE run_id = ? GROUP BY s",
+                (time.time(), self.max_attempts, run_id)):
+            counts[status] = n
+        return counts
+
+    def is_finished(self, run_id: str) -> bool:
+        counts = self.progress(run_id)
+        return counts[PENDING] == 0 and counts[LEASED] == 0
+
+    def results(self, run_id: str) -> pd.DataFrame:
+        """One row per finished unit: table, contract, params_hash, the params and the result fields."""
+        rows = []
+        for table, contract, params, phash, result in self.conn.execute(
+                f"SELECT table_name, contract, params, params_hash, result FROM units "
+                f"WHERE run_id = ? AND status = '{DONE}' ORDER BY id", (run_id,)):
+            row = {'table': table, 'contract': contract, 'params_hash': phash}
+            row.update({f'param_{k}': v for k, v in json.loads(params).items()})
+            row.update(json.loads(result))
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def failures(self, run_id: str) -> pd.DataFrame:
+        return pd.read_sql_query(
+            f"SELECT id, table_name, contract, params, attempts, error FROM units "
+            f"WHERE run_id = ? AND status = '{FAILED}' ORDER BY id", self.conn, params=(run_id,))
+
+
+def select_contracts(df: pd.DataFrame) -> list[str]:
+    """OTM call/put just around the underlying at row 30, as in OptionAlgoMain.run."""
+    index = StrikeIndex.from_df(df)
+    if index.underlying_col is None or len(df) < 30:
+        return []
+    c_cols, p_cols = index.select_otm_columns(float(df[index.underlying_col].iloc[29]))
+    return c_cols + p_cols
+
+
+def plan_sweep(queue: WorkQueue, run_id: str, config: dict, grid: Optional[dict] = None,
+               table_names=None) -> int:
+    """
+    Enqueue one unit per (table, selected contract, parameter set) for run_id. The
+    coordinator streams each table once to select its contracts. grid is expanded with
+    walk_forward.param_grid ({} = the default params). Safe to call again: existing units are
+    kept. Returns the number of units added.
+    """
+    source = walk_forward._open_source(config)
+    if table_names is None:
+        table_names = source.list_tables()
+    params_list = walk_forward.param_grid(grid or {})
+    added = 0
+    for name, df in source.iter_tables(table_names):
+        contracts = select_contracts(df)
+        added += queue.enqueue(run_id, [(name, c, p) for c in contracts for p in params_list])
+    print(f"Queued {added} units for run {run_id} ({queue.progress(run_id)})")
+    return added
+
+
+def _run_unit(config, unit, trades=None) -> dict:
+    name = unit['table']
+    df = walk_forward._load(config, name)
+    table_name_clean = name.strip()[:20]
+    with trade_events.at_level(trade_events.OFF):
+        res = process_option_data(df, table_name_clean, [unit['contract']], params=unit['params'],
+                                  save_details=False, indicator_cache=walk_forward._indicators,
+                                  htf=walk_forward._htf_stage(name, df, [unit['contract']]), trades=trades,
+                                  cache_key=name)
+    return res.iloc[0].to_dict()
+
+
+def _record(store, config, unit, result, trades):
+    """Copy a finished unit into the results warehouse (results_store.py) under the queue's run_id."""
+    df = walk_forward._load(config, unit['table'])
+    underlying_col = StrikeIndex.from_df(df).underlying_col
+    underlying = float(df[underlying_col].iloc[29]) if underlying_col is not None and len(df) >= 30 else None
+    store.start_run('process_option_data', DEFAULT_PARAMS, run_id=unit['run_id'])
+    store.record_contract(unit['run_id'], unit['table'], unit['contract'], result['PnL'], trades=trades,
+                          underlying=underlying, params=unit['params'])
+
+
+def _forget_table(name):
+    """Drop a finished table from the per-process caches so a long-lived worker stays bounded."""
+    walk_forward._tables.pop(name, None)
+    walk_forward._htf.pop(name, None)
+    for key in [k for k in walk_forward._indicators if k[0] == name]:
+        del walk_forward._indicators[key]
+
+
+def run_worker(queue_path: str, config: dict, run_id: Optional[str] = None, worker_id: Optional[str] = None,
+               batch: int = 8, lease_s: float = DEFAULT_LEASE_SECONDS, poll_s: float = 2.0,
+               exit_when_idle: bool = True, wal: bool = True, results_db: Optional[str] = None) -> int:
+    """
+    Claim and run units until the queue has nothing runnable (or forever with
+    exit_when_idle=False, polling every poll_s). Leases are renewed in the background every
+    lease_s / 3 seconds while a batch runs. With results_db, each finished unit and its trades
+    are also written to that results warehouse. Returns the number of units this worker completed.
+    """
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+    queue = WorkQueue(queue_path, wal=wal)
+    store = None
+    if results_db:
+        from results_store import ResultsStore
+        store = ResultsStore(results_db)
+    held = set()
+    stop = threading.Event()
+
+    def _renew():
+        while not stop.wait(lease_s / 3):
+            try:
+                queue.renew(worker_id, list(held), lease_s)
+            except sqlite3.Error:
+                # a busy database delays one renewal; the lease has two more intervals left
+                instrumentation.inc('queue_renew_errors_total')
+
+    renewer = threading.Thread(target=_renew, name='lease-renewal', daemon=True)
+    renewer.start()
+    done = 0
+    current_table = None
+    try:
+        while True:
+            units = queue.claim(worker_id, run_id, limit=batch, lease_s=lease_s)
+            if not units:
+                if exit_when_idle:
+                    break
+                time.sleep(poll_s)
+                continue
+            if current_table is not None and units[0]['table'] != current_table:
+                _forget_table(current_table)
+            current_table = units[0]['table']
+            held.update(u['id'] for u in units)
+            for unit in units:
+                try:
+                    trades = [] if store is not None else None
+                    with instrumentation.timer('unit_seconds'):
+                        result = _run_unit(config, unit, trades)
+                    if store is not None:
+                        _record(store, config, unit, result, trades)
+                except Exception as e:
+                    queue.fail(unit['id'], worker_id, f'{type(e).__name__}: {e}')
+                    instrumentation.inc('units_failed_total')
+                else:
+                    if queue.complete(unit['id'], worker_id, result):
+                        done += 1
+                    instrumentation.inc('units_done_total')
+                held.discard(unit['id'])
+    finally:
+        stop.set()
+        queue.release(worker_id, held)
+        queue.close()
+        if store is not None:
+            store.close()
+    print(f"Worker {worker_id}: {done} units done")
+    return done
+
+
+def run_local(queue_path: str, config: dict, workers: Optional[int] = None, run_id: Optional[str] = None,
+              **kwargs) -> None:
+    """Start `workers` worker processes on this machine and wait for them to drain the queue."""
+    workers = workers or os.cpu_count() or 1
+    procs = [Process(target=run_worker, args=(queue_path, config, run_id), kwargs=kwargs, daemon=False)
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Distributed process_option_data sweeps')
+    parser.add_argument('command', choices=['plan', 'work', 'status', 'results'])
+    parser.add_argument('--queue', default='sweeps.db', help='queue file (on a shared filesystem for several machines)')
+    parser.add_argument('--run-id', default=None)
+    parser.add_argument('--workers', type=int, default=None, help='local worker processes for "work"')
+    parser.add_argument('--no-wal', action='store_true', help='rollback journal, for network filesystems')
+    parser.add_argument('--serve', action='store_true', help='keep polling for new units instead of exiting when idle')
+    parser.add_argument('--results-db', default=None, help='also write finished units to this results warehouse')
+    args = parser.parse_args()
+    config = {
+        'user': 'root',
+        'password': 'hindus',
+        'host': 'localhost',
+        'database': 'market_data',
+    }
+    grid = {
+        'rsi_upper': [60, 70],
+        'rsi_lower': [30, 40],
+        'target_pct': [0.005, 0.01],
+    }
+    if args.command == 'plan':
+        with WorkQueue(args.queue, wal=not args.no_wal) as q:
+            plan_sweep(q, args.run_id or time.strftime('sweep-%Y%m%d-%H%M%S'), config, grid)
+    elif args.command == 'work':
+        run_local(args.queue, config, args.workers, args.run_id, wal=not args.no_wal,
+                  exit_when_idle=not args.serve, results_db=args.results_db)
+    elif args.command == 'status':
+        with WorkQueue(args.queue, wal=not args.no_wal) as q:
+            print(q.progress(args.run_id))
+    else:
+        with WorkQueue(args.queue, wal=not args.no_wal) as q:
+            print(q.results(args.run_id))